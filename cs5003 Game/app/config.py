@@ -1,14 +1,117 @@
 # app/config.py
 
 import os
+import secrets
 
 # SQLite file (same directory as main.py):
 BASE_DIR = os.path.abspath(os.path.dirname(__file__) + "/..")
 # game_data.db file
 DB_FILE  = os.path.join(BASE_DIR, "app", "data", "game_data.db")
 
+#db connection pool (app/model/pool.py)
+DB_POOL_SIZE    = 8        #max open sqlite connections
+DB_POOL_TIMEOUT = 5.0      #secs to wait for a free connection
+DB_PRAGMAS      = (        #run once per new connection
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA temp_store = MEMORY",
+)
+
+#group-commit writer (app/model/write_queue.py)
+WRITE_QUEUE_BATCH_SIZE = 64      #max jobs per transaction
+WRITE_QUEUE_MAX_DELAY  = 0.005   #secs to wait for more jobs before committing
+WRITE_QUEUE_TIMEOUT    = 10.0    #secs a REST call waits for its commit
+WRITE_QUEUE_RETRY_AFTER = 5      #Retry-After on the 503 when that runs out
+
+#executors behind app/model/async_db.py (socket handlers, game timers)
+DB_READ_WORKERS   = 4      #reader threads (writes get one dedicated thread)
+DB_MAX_PENDING    = 256    #queued + running jobs before DAOBusy
+DB_SUBMIT_TIMEOUT = 2.0    #secs a caller waits for a free slot
+
+#decoded puzzle LRU (app/model/cache.py)
+PUZZLE_CACHE_MAX_BYTES   = 8 * 1024 * 1024   #approx. JSON size of cached puzzles
+PUZZLE_CACHE_MAX_ENTRIES = 512
+
+#bulk ingest (add_puzzles / POST /puzzles/bulk)
+PUZZLE_BULK_BATCH_SIZE = 500    #rows per executemany
+
+#soft-deleted puzzles (delete_puzzle(..., soft=True)) are reaped in the background
+PUZZLE_REAP_CHUNK    = 1000    #rows deleted per transaction
+PUZZLE_REAP_INTERVAL = 30.0    #secs between reaper passes
+
+#HTTP caching of puzzle reads (strong ETags, If-None-Match -> 304)
+PUZZLE_CACHE_CONTROL      = "public, max-age=300"   #GET /puzzle/<id>: content never changes, may be deleted
+PUZZLE_LIST_CACHE_CONTROL = "no-cache"              #GET /puzzles: always revalidate (a 304 is cheap)
+
+#JSON encoding for REST responses (app/server/json_provider.py)
+JSON_PROVIDER = None    #"orjson" or "stdlib"; None = orjson if installed
+
+#response compression (app/server/compression.py)
+COMPRESSION_MIN_BYTES = 1024                       #smaller bodies go out as-is
+COMPRESSION_ENCODINGS = ("zstd", "br", "gzip")     #preference; br/zstd need brotli/zstandard installed
+COMPRESSION_LEVELS    = {"gzip": 6, "br": 5, "zstd": 3}
+COMPRESSION_MIMETYPES = ("application/json", "application/x-ndjson",
+                         "text/html", "text/plain")
+
+#keyset pagination for list endpoints (?limit=&cursor=)
+PAGE_SIZE_DEFAULT = 50
+PAGE_SIZE_MAX     = 200
+STATS_PAGE_SIZE   = 20      #client stats tab: history rows per "Load more"
+
+#user search (GET /users/search?q=&mode=prefix|substring)
+USER_SEARCH_LIMIT         = 20     #default page size
+USER_SEARCH_LIMIT_MAX     = 100
+USER_SEARCH_CACHE_ENTRIES = 1024   #first pages of hot queries, cleared on signup
+USER_SEARCH_CACHE_BYTES   = 1024 * 1024
+
+#puzzle full-text search (GET /puzzles/search?q=)
+PUZZLE_SEARCH_LIMIT     = 20
+PUZZLE_SEARCH_LIMIT_MAX = 100
+
+#leaderboards (top-K endpoint)
+LEADERBOARD_LIMIT     = 10
+LEADERBOARD_LIMIT_MAX = 100
+
+#retention: old rows move to an attached archive db (app/model/archive.py)
+ARCHIVE_DB_FILE         = None     #None -> game_data_archive.db next to DB_FILE
+MESSAGE_RETENTION_DAYS  = 180      #messages older than this are archived (None = keep)
+ACTIVITY_RETENTION_DAYS = 90       #None = keep
+ARCHIVE_BATCH_SIZE      = 1000     #rows moved per transaction
+ARCHIVE_INTERVAL        = 3600.0   #secs between background passes
+
+#friend activity feed (fan-out on write, pull for high-fanout users)
+FEED_FANOUT_LIMIT      = 500   #friends above this -> readers pull instead
+FEED_BACKFILL_PER_USER = 200   #activities copied per inbox by backfill / new friendship
+
+#batch reads (GET /puzzles/batch?ids=, GET /bootstrap/<username>)
+PUZZLE_BATCH_MAX  = 100    #ids per batch request
+BOOTSTRAP_PUZZLES = 50     #first puzzle page in the bootstrap response
+BOOTSTRAP_FEED    = 20     #friend feed items in it
+
+#rate limiting (app/server/rate_limit.py; per-route/event limits in shared/protocols.py)
+RATE_LIMIT_ENABLED     = True
+RATE_LIMIT_IP_FACTOR   = 4        #an IP's bucket is this many users' worth (NAT, shared hosts)
+RATE_LIMIT_MAX_BUCKETS = 50_000   #idle (full) buckets are dropped past this
+
+#background jobs (app/server/jobs.py) - puzzle downloads via POST /download-puz
+DOWNLOAD_PUZ_URL     = "http://herbach.dnsalias.com/uc/uc230505.puz"
+DOWNLOAD_TIMEOUT     = 20.0    #secs per upstream request (connect / read)
+DOWNLOAD_WORKERS     = 2       #downloads running at once
+DOWNLOAD_MAX_PENDING = 20      #queued + running before new ones get 503
+JOB_HISTORY          = 200     #finished jobs whose status can still be read
+
+#server (python main.py server [--prod] [--async-mode M] [--workers N])
+SERVER_HOST          = "0.0.0.0"
+SERVER_PORT          = 5001
+SERVER_MODE          = os.environ.get("CROSSWORD_SERVER_MODE", "dev")   #"dev" (debug + reloader) or "prod"
+SERVER_ASYNC_MODE    = None     #prod: "eventlet", "gevent" or "threading"; None = first installed
+SERVER_WORKERS       = 100      #prod: connections served at once (green thread / thread pool size)
+SERVER_DRAIN_TIMEOUT = 320.0    #secs a shutdown waits for running games (one lasts 300s)
 
 #clients send REST & Socket.IO
 SERVER_URL = "http://127.0.0.1:5001"
 
+#signs the session cookie /login hands out (rate limits key on its user);
+#unset -> a fresh key per run, so restarts just mean logging in again
+SECRET_KEY = os.environ.get("CROSSWORD_SECRET_KEY") or secrets.token_hex(32)
+
 ## LACHLAN COMMENT: constants (i.e server port, secret keys etc.) -- put here :) ##
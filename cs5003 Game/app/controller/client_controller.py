@@ -3,19 +3,20 @@ Client controller for the Crossword app.
 Handles user interface flow, server comms, 
 and coords between views + model ops """
 
-import requests
 import socketio
 from tkinter import messagebox
 from app.utils.puzzle_downloader import download_and_save_puzzle
+from app.utils.http_session import http, cookie_header
 from app.model.db import get_last_inserted_puzzle_id
 
 
 # Model imports
 from app.model.db import (
     get_puzzles, get_puzzle, add_puzzle as db_add_puzzle, delete_puzzle,
-    submit_result, get_stats, get_active_games, rec_activity, get_friend_activities
+    search_puzzles,
+    submit_result, get_stats_page, get_active_games, rec_activity, get_friend_activities
 )
-from app.config import SERVER_URL
+from app.config import SERVER_URL, STATS_PAGE_SIZE
 from app.shared.protocols import ADD_PUZZLE_ENDPOINT as ADD_PUZZLE
 
 # View imports
@@ -45,7 +46,7 @@ def _on_login(root, username):
     # Try to connect to Socket.io server
     try:
         if not sio.connected:
-            sio.connect(SERVER_URL)
+            sio.connect(SERVER_URL, headers=cookie_header())   #login cookie: who we are
             print("Connected to Socket.io server")
     except Exception as e:
         print(f"Unable to connect to Socket.io server: {e}")
@@ -57,7 +58,7 @@ def _on_login(root, username):
     menu_view = MenuView(
         root, username,
         play_callback   = lambda: _choose_puzzle(root, username),
-        stats_callback  = lambda: get_stats(username),  # Return statistics data directly
+        stats_callback  = lambda cursor=None: get_stats_page(username, STATS_PAGE_SIZE, cursor),  # (rows, next cursor)
         add_callback    = lambda: _add_puzzle(root),    # Advanced editor
         quit_callback   = root.quit,
         nyt_callback    = lambda: _open_nyt_puzzle(root, username),  # Pass root and username 
@@ -91,14 +92,21 @@ def _choose_puzzle(root, username):
             else:
                 messagebox.showerror("Error", "Failed to delete puzzle.")
 
+    def _search(query):
+        # server-side full-text search; empty query -> full list again
+        if not query.strip():
+            return get_puzzles()
+        results, _ = search_puzzles(query, limit=100)
+        return [(r["id"], r["name"]) for r in results]
+
     #reuse helper in MenuView
-    MenuView.clear_and_show_puzzles(root, puzzles, _start, _delete)
+    MenuView.clear_and_show_puzzles(root, puzzles, _start, _delete, _search)
 
 
 def _show_stats(root, username):
     """Display the statistics screen with activity feed."""
     # Get statistics data
-    stats = get_stats(username)
+    stats = get_stats_page(username, STATS_PAGE_SIZE)
          
     # Get friend activity data
     activities = get_friend_activities(username)
@@ -112,7 +120,7 @@ def _show_stats(root, username):
     menu_view = MenuView(
         root, username,
         play_callback=lambda: _choose_puzzle(root, username),
-        stats_callback=lambda: stats,
+        stats_callback=lambda cursor=None: get_stats_page(username, STATS_PAGE_SIZE, cursor),
         add_callback=lambda: _add_puzzle(root),
         quit_callback=root.quit,
         nyt_callback=lambda: _open_nyt_puzzle(root, username),  # Pass root and username
@@ -126,7 +134,7 @@ def _add_puzzle(root):
     """launch adv. create, then POST puzzle to server."""
     def on_submit(name, grid, across, down, answers):
         try:
-            response = requests.post(
+            response = http.post(
                 SERVER_URL + ADD_PUZZLE,
                 json={
                     "name": name,
@@ -182,7 +190,7 @@ def _quick_create(root):
     """Create a simple puzzle in one step."""
     def on_submit(puzzle_data):
         try:
-            response = requests.post(
+            response = http.post(
                 SERVER_URL + ADD_PUZZLE,
                 json={
                     "name": puzzle_data["name"],
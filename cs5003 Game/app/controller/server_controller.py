@@ -27,47 +27,167 @@ https://www.youtube.com/watch?v=EgpLj86ZHFQ 'Please Learn How To Write Tests in
 
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, Response, current_app, request, jsonify, make_response, session
 from flask_socketio import SocketIO
 
-import requests
-import sqlite3
-from app.config import DB_FILE
+import json
+from concurrent.futures import TimeoutError as FutureTimeout
+from app.config import (
+    WRITE_QUEUE_TIMEOUT, WRITE_QUEUE_RETRY_AFTER, PAGE_SIZE_DEFAULT, PAGE_SIZE_MAX,
+    USER_SEARCH_LIMIT, USER_SEARCH_LIMIT_MAX,
+    PUZZLE_SEARCH_LIMIT, PUZZLE_SEARCH_LIMIT_MAX,
+    LEADERBOARD_LIMIT, LEADERBOARD_LIMIT_MAX,
+    PUZZLE_CACHE_CONTROL, PUZZLE_LIST_CACHE_CONTROL, PUZZLE_BATCH_MAX,
+    DOWNLOAD_PUZ_URL
+)
 
 #project modules
 from app.shared.protocols import (
     LOGIN_ENDPOINT, REGISTER_ENDPOINT,
     PUZZLES_ENDPOINT, PUZZLE_ENDPOINT,
-    ADD_PUZZLE, SUBMIT_RESULT, STATS_ENDPOINT,
+    RATINGS_ENDPOINT, TOP_RATED_ENDPOINT, SEARCH_PUZZLES_ENDPOINT,
+    ADD_PUZZLE, BULK_PUZZLES_ENDPOINT, PUZZLES_BATCH_ENDPOINT, BOOTSTRAP_ENDPOINT,
+    DOWNLOAD_PUZ_ENDPOINT, JOB_STATUS_ENDPOINT, JOBS_ENDPOINT,
+    SUBMIT_RESULT, STATS_ENDPOINT,
+    STATS_SUMMARY_ENDPOINT, LEADERBOARD_ENDPOINT, LEADERBOARD_RANK_ENDPOINT,
     # Social endpoints
     SEARCH_USERS_ENDPOINT, FRIEND_REQUEST_ENDPOINT,
     ACCEPT_FRIEND_ENDPOINT, REJECT_FRIEND_ENDPOINT,
     FRIENDS_LIST_ENDPOINT, MESSAGES_ENDPOINT,
-    SEND_MESSAGE_ENDPOINT, UNREAD_COUNT_ENDPOINT
+    SEND_MESSAGE_ENDPOINT, UNREAD_COUNT_ENDPOINT, MARK_READ_ENDPOINT,
+    SOCKET_EVENTS, unread_counts_message,
+    ACTIVITY_ENDPOINT, FRIEND_ACTIVITY_ENDPOINT, NEXT_CURSOR_HEADER,
+    DB_POOL_ENDPOINT, PUZZLE_CACHE_ENDPOINT, USER_SEARCH_CACHE_ENDPOINT,
+    ARCHIVE_ENDPOINT, COMPRESSION_ENDPOINT, RATE_LIMIT_ENDPOINT, READY_ENDPOINT
 )
 from app.model.db import (
-    init_db, create_user, verify_user,
-    get_puzzles, get_puzzle, add_puzzle,
-    submit_result, get_stats,
+    init_db, create_user, verify_user, search_users as db_search_users,
+    get_puzzles_page, add_puzzle, add_puzzles,
+    get_puzzle_etag, get_puzzle_wire, get_puzzle_wires, get_puzzle_catalog_version,
+    get_bootstrap,
+    search_puzzles as db_search_puzzles,
+    rate_puzzle, get_rating_summary, get_top_rated_puzzles,
+    get_puzzle_reviews_page,
+    get_stats_page, get_stat_summary, rec_activity_page, get_friend_activities_page,
+    get_leaderboard, get_leaderboard_rank,
+    # Group-commit writes
+    queue_result, queue_message,
     # Social DB functions
     send_friend_request, accept_friend_request,
     reject_friend_request, get_friends, get_friend_requests,
-    send_message, get_messages, get_unread_message_count
+    get_messages, get_messages_page, get_unread_breakdown, mark_messages_as_read,
+    # Connection pool
+    close_db_connection, pool_stats, start_puzzle_reaper, start_archiver,
+    puzzle_cache_stats, user_search_cache_stats, archive_stats
 )
+from app.model.paging import InvalidCursor, clamp_limit
+from app.model.leaderboard import METRICS as LEADERBOARD_METRICS
+from app.server.compression import init_compression, compression_stats
+from app.server.json_provider import init_json
+from app.server.rate_limit import init_rate_limits, rate_limit_stats
+from app.server.jobs import init_jobs, JobQueueFull
+from app.utils.puzzle_downloader import download_job
 
 from app.server.socket_controller import register_sockets
 
 
+#keyset pagination helpers
+def _page_args():
+    """(limit, cursor) from the ?limit=&cursor= query params"""
+    limit = clamp_limit(request.args.get("limit", type=int),
+                        PAGE_SIZE_DEFAULT, PAGE_SIZE_MAX)
+    return limit, request.args.get("cursor") or None
+
+#group-commit writes (queue_*)
+def _committed(future):
+    """
+    (value, None) once a queued write has committed, or (None, 503 response)
+    if the queue is too backed up to commit it within WRITE_QUEUE_TIMEOUT.
+    The write stays queued then and may still land - clients should check
+    before resending, not blindly retry
+    """
+    try:
+        return future.result(WRITE_QUEUE_TIMEOUT), None
+    except FutureTimeout:
+        response = jsonify({"status": "pending",
+                            "error": "Server busy; the write is queued and may still be saved"})
+        response.status_code = 503
+        response.headers["Retry-After"] = str(WRITE_QUEUE_RETRY_AFTER)
+        return None, response
+
+def _paged(items, next_cursor):
+    """JSON body; next-page cursor travels in a response header"""
+    response = jsonify(items)
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return response
+
+def _conditional(etag, cache_control, build):
+    """
+    304 (no body built) if If-None-Match already has etag, else build()'s
+    response; both carry the ETag and Cache-Control
+    (weak comparison, as RFC 7232 says: compressed copies carry W/ tags)
+    """
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = build()
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = cache_control
+    return response
+
+
+def _board_args():
+    """(puzzle_id or None, metric) from the query string; metric None if invalid"""
+    metric = request.args.get("metric", "score")
+    if metric not in LEADERBOARD_METRICS:
+        return None, None
+    return request.args.get("puzzle_id", type=int), metric
+
+
+#unread counters are pushed, clients don't poll
+def _push_unread(username):
+    """Emit username's current unread counts to their personal socket room"""
+    socketio = current_app.extensions.get("socketio")
+    if socketio is not None:
+        socketio.emit(SOCKET_EVENTS["UNREAD_COUNTS"],
+                      unread_counts_message(get_unread_breakdown(username)),
+                      room=username)
+
+
 #REST routes
 def register_routes(app: Flask) -> None:
     """Attach all Flask routes to *app* and make sure the DB exists once."""
     init_db()
 
+    #return each request's pooled db connection when its app context ends
+    app.teardown_appcontext(close_db_connection)
+
+    #orjson for jsonify when installed; gzip/br/zstd for large JSON bodies
+    init_json(app)
+    init_compression(app)
+
+    #token buckets per user/IP for the routes in REST_RATE_LIMITS (429 when empty)
+    init_rate_limits(app)
+
+    #bounded worker pool for puzzle downloads
+    jobs = init_jobs(app)
+
+    #purge soft-deleted puzzles / archive old rows in small chunks off the request path
+    if not app.testing:
+        start_puzzle_reaper()
+        start_archiver()
+
+    @app.errorhandler(InvalidCursor)
+    def invalid_cursor(e):
+        return jsonify({"error": str(e)}), 400
+
     #auth.
     @app.route(LOGIN_ENDPOINT, methods=["POST"])
     def login():
         data = request.json  # Get the JSON data from the request
         if verify_user(data["username"], data["password"]):
+            session["username"] = data["username"]     #signed: rate limits key on it
             return jsonify({"status": "success"}), 200
         return jsonify({"status": "fail", "message": "Invalid credentials"}), 401
 
@@ -82,77 +202,194 @@ def register_routes(app: Flask) -> None:
     def home():
         return "Flask is running!"
 
-    @app.route("/download-puz")
+    #slow upstream: download + parse + save run on the job pool, the
+    #request only queues it (poll JOB_STATUS_ENDPOINT for the puzzle id)
+    @app.route(DOWNLOAD_PUZ_ENDPOINT, methods=["GET", "POST"])
     def download_puz():
-        # Download puzzle
-        url = "http://herbach.dnsalias.com/uc/uc230505.puz"
-        filename = "daily.puz"
-        response = requests.get(url)
-        with open(filename, "wb") as f:
-            f.write(response.content)
-
-        import puz
-        # Read puzzle with puzpy
-        puzzle = puz.read(filename)
-        title = puzzle.title
-        author = puzzle.author
-        clues = "\n".join(puzzle.clues)
-
-        # Save to SQLite
-        conn = sqlite3.connect(DB_FILE)
-        c = conn.cursor()
-        c.execute("""
-            INSERT INTO puzzles (name, grid, clues_across, clues_down, answers)
-            VALUES (?, ?, ?, ?, ?)
-        """, (title, "", clues, "", ""))
-        conn.commit()
-        conn.close()
-
-        return f"""
-            ✅ Puzzle downloaded and saved to database!<br>
-            <strong>Title:</strong> {title}<br>
-            <strong>Author:</strong> {author}<br>
-            <strong>Clues saved:</strong> {len(puzzle.clues)}
-        """
+        try:
+            job_id = jobs.submit("download_puz", download_job, DOWNLOAD_PUZ_URL)
+        except JobQueueFull:
+            return jsonify({"error": "Too many downloads queued, try again later"}), 503
+        status_url = JOB_STATUS_ENDPOINT.format(job_id=job_id)
+        response = jsonify({"job_id": job_id, "status_url": status_url})
+        response.status_code = 202
+        response.headers["Location"] = status_url
+        return response
+
+    @app.route(JOB_STATUS_ENDPOINT.format(job_id="<job_id>"), methods=["GET"])
+    def job_status(job_id):
+        status = jobs.status(job_id)
+        if status is None:
+            return jsonify({"error": "Unknown job"}), 404
+        return jsonify(status)
 
     #puzzles
     @app.route(PUZZLES_ENDPOINT, methods=["GET"])
     def list_puzzles():
-        return jsonify(
-            [{"id": pid, "name": name} for pid, name in get_puzzles()]
+        limit, cursor = _page_args()
+
+        def build():
+            puzzles, next_cursor = get_puzzles_page(limit, cursor)
+            return _paged(
+                [{"id": pid, "name": name} for pid, name in puzzles], next_cursor
+            )
+        #any add/rename/delete bumps the catalog version, so it tags every page
+        return _conditional(f"catalog-{get_puzzle_catalog_version()}",
+                            PUZZLE_LIST_CACHE_CONTROL, build)
+
+    @app.route(PUZZLES_BATCH_ENDPOINT, methods=["GET"])
+    def batch_puzzles():
+        try:
+            ids = [int(i) for arg in request.args.getlist("ids")
+                   for i in arg.split(",") if i.strip()]
+        except ValueError:
+            return jsonify({"error": "ids must be comma-separated integers"}), 400
+        ids = list(dict.fromkeys(ids))
+        if not ids or len(ids) > PUZZLE_BATCH_MAX:
+            return jsonify({"error": f"give 1-{PUZZLE_BATCH_MAX} ids"}), 400
+
+        found = get_puzzle_wires(ids)
+        missing = [i for i in ids if i not in found]
+        #stored wire JSON spliced in as-is, in the order asked for
+        body = b'{"missing":%s,"puzzles":[%s]}' % (
+            json.dumps(missing, separators=(",", ":")).encode(),
+            b",".join(found[i].wire for i in ids if i in found),
         )
+        return Response(body, mimetype="application/json")
+
+    @app.route(SEARCH_PUZZLES_ENDPOINT, methods=["GET"])
+    def search_puzzles():
+        limit = clamp_limit(request.args.get("limit", type=int),
+                            PUZZLE_SEARCH_LIMIT, PUZZLE_SEARCH_LIMIT_MAX)
+        results, next_cursor = db_search_puzzles(request.args.get("q", ""), limit,
+                                                 request.args.get("cursor") or None)
+        return _paged({"results": results}, next_cursor)
 
     @app.route(PUZZLE_ENDPOINT.format(puzzle_id="<int:puzzle_id>"), methods=["GET"])
     def fetch_puzzle(puzzle_id):
-        p = get_puzzle(puzzle_id)
-        if not p:
+        etag = get_puzzle_etag(puzzle_id)
+        if etag is None:
             return jsonify({"error": "Not found"}), 404
-        return jsonify(p)
+        def build():
+            #stored wire JSON goes out as-is: no decode/re-encode
+            stored = get_puzzle_wire(puzzle_id)
+            if stored is None:          #deleted since the etag lookup
+                return make_response(jsonify({"error": "Not found"}), 404)
+            return Response(stored[0], mimetype="application/json")
+
+        #a matching If-None-Match never loads the puzzle
+        return _conditional(etag, PUZZLE_CACHE_CONTROL, build)
+
+    #ratings
+    @app.route(RATINGS_ENDPOINT.format(puzzle_id="<int:puzzle_id>"), methods=["GET"])
+    def puzzle_ratings(puzzle_id):
+        limit, cursor = _page_args()
+        reviews, next_cursor = get_puzzle_reviews_page(puzzle_id, limit, cursor)
+        return _paged({"summary": get_rating_summary(puzzle_id),
+                       "reviews": reviews}, next_cursor)
+
+    @app.route(RATINGS_ENDPOINT.format(puzzle_id="<int:puzzle_id>"), methods=["POST"])
+    def submit_rating(puzzle_id):
+        d = request.json
+        rating = d.get("rating")
+        if not isinstance(rating, int) or not 1 <= rating <= 5:
+            return jsonify({"error": "rating must be an integer 1-5"}), 400
+        rate_puzzle(puzzle_id, d["username"], rating, d.get("comment", ""))
+        return jsonify({"status": "success",
+                        "summary": get_rating_summary(puzzle_id)}), 201
+
+    @app.route(TOP_RATED_ENDPOINT, methods=["GET"])
+    def top_rated():
+        limit = clamp_limit(request.args.get("limit", type=int), 10, PAGE_SIZE_MAX)
+        min_ratings = request.args.get("min_ratings", default=1, type=int)
+        return jsonify(get_top_rated_puzzles(limit, min_ratings))
 
     @app.route(ADD_PUZZLE, methods=["POST"])
     def upload_puzzle():
         d = request.json
         add_puzzle(d["name"], d["grid"],
-                   d["clues_across"], d["clues_down"], d["answers"])
+                   d["clues_across"], d["clues_down"], d["answers"],
+                   d.get("author"))
         return jsonify({"status": "success"}), 201
 
+    @app.route(BULK_PUZZLES_ENDPOINT, methods=["POST"])
+    def bulk_upload_puzzles():
+        #one puzzle per line; the body is read line by line, never held whole
+        lines = (line for line in request.stream if line.strip())
+        results = add_puzzles(lines)
+        return Response((json.dumps(r) + "\n" for r in results),
+                        mimetype="application/x-ndjson")
+
     #results / stats
     @app.route(SUBMIT_RESULT, methods=["POST"])
     def result():
         d = request.json
-        submit_result(d["username"], d["puzzle_id"], d["score"], d["time"])
+        #batched with concurrent submissions; wait for our commit
+        _, busy = _committed(
+            queue_result(d["username"], d["puzzle_id"], d["score"], d["time"]))
+        if busy:
+            return busy
         return jsonify({"status": "success"}), 201
 
     @app.route(STATS_ENDPOINT.format(username="<username>"), methods=["GET"])
     def stats(username):
-        return jsonify(get_stats(username))
+        limit, cursor = _page_args()
+        return _paged(*get_stats_page(username, limit, cursor))
+
+    @app.route(STATS_SUMMARY_ENDPOINT.format(username="<username>"), methods=["GET"])
+    def stats_summary(username):
+        #one rollup row, maintained on every submit
+        summary = get_stat_summary(username)
+        if summary is None:
+            return jsonify({"error": "No results for user"}), 404
+        return jsonify(summary)
+
+    #leaderboards
+    @app.route(LEADERBOARD_ENDPOINT, methods=["GET"])
+    def leaderboard():
+        puzzle_id, metric = _board_args()
+        if metric is None:
+            return jsonify({"error": "metric must be score, time or solves"}), 400
+        limit = clamp_limit(request.args.get("limit", type=int),
+                            LEADERBOARD_LIMIT, LEADERBOARD_LIMIT_MAX)
+        return jsonify(get_leaderboard(puzzle_id, metric, limit))
+
+    @app.route(LEADERBOARD_RANK_ENDPOINT.format(username="<username>"), methods=["GET"])
+    def leaderboard_rank(username):
+        puzzle_id, metric = _board_args()
+        if metric is None:
+            return jsonify({"error": "metric must be score, time or solves"}), 400
+        position = get_leaderboard_rank(username, puzzle_id, metric)
+        if position is None:
+            return jsonify({"error": "Not ranked"}), 404
+        return jsonify(position)
+
+    @app.route(BOOTSTRAP_ENDPOINT.format(username="<username>"), methods=["GET"])
+    def bootstrap(username):
+        #menu, unread counts, friend requests and feed in one round trip
+        return jsonify(get_bootstrap(username))
+
+    @app.route(ACTIVITY_ENDPOINT, methods=["GET"])
+    def recent_activity():
+        limit, cursor = _page_args()
+        return _paged(*rec_activity_page(limit, cursor))
+
+    @app.route(FRIEND_ACTIVITY_ENDPOINT.format(username="<username>"), methods=["GET"])
+    def friend_activity(username):
+        limit, cursor = _page_args()
+        return _paged(*get_friend_activities_page(username, limit, cursor))
     
     # Social Features API Routes
     @app.route(SEARCH_USERS_ENDPOINT, methods=["GET"])
     def search_users():
         query = request.args.get("q", "")
-        users = []  # 这里应该有一个函数来搜索用户，但在db.py中似乎没有定义
-        return jsonify({"users": users})
+        limit = clamp_limit(request.args.get("limit", type=int),
+                            USER_SEARCH_LIMIT, USER_SEARCH_LIMIT_MAX)
+        substring = request.args.get("mode", "prefix") == "substring"
+        users, next_cursor = db_search_users(query, limit,
+                                             request.args.get("cursor") or None,
+                                             substring)
+        return _paged({"users": users}, next_cursor)
     
     @app.route(FRIEND_REQUEST_ENDPOINT, methods=["POST"])
     def friend_request():
@@ -194,14 +431,24 @@ def register_routes(app: Flask) -> None:
         if not current_user:
             return jsonify({"error": "Current user required"}), 400
         
-        messages = get_messages(current_user, username)
-        return jsonify(messages)
+        limit, cursor = _page_args()
+        #incremental sync: ?since_id= (new since last seen) / ?before_id= (older)
+        since_id = request.args.get("since_id", type=int)
+        before_id = request.args.get("before_id", type=int)
+        if since_id is not None or before_id is not None:
+            return jsonify(get_messages(current_user, username, limit,
+                                        since_id, before_id))
+        return _paged(*get_messages_page(current_user, username, limit, cursor))
     
     @app.route(SEND_MESSAGE_ENDPOINT, methods=["POST"])
     def handle_send_message():
         d = request.json
-        result = send_message(d["sender"], d["receiver"], d["content"])
+        result, busy = _committed(
+            queue_message(d["sender"], d["receiver"], d["content"]))
+        if busy:
+            return busy
         if result:
+            _push_unread(d["receiver"])
             return jsonify({"status": "success"}), 201
         return jsonify({"status": "failed", "message": "Failed to send message"}), 400
     
@@ -211,8 +458,53 @@ def register_routes(app: Flask) -> None:
         if not username:
             return jsonify({"error": "Username required"}), 400
         
-        count = get_unread_message_count(username)
-        return jsonify({"count": count})
+        by_sender = get_unread_breakdown(username)
+        return jsonify({"count": sum(by_sender.values()), "by_sender": by_sender})
+
+    @app.route(MARK_READ_ENDPOINT, methods=["POST"])
+    def mark_read():
+        d = request.json
+        marked = mark_messages_as_read(d["username"], d["sender"])
+        if marked:
+            _push_unread(d["username"])
+        return jsonify({"status": "success", "marked": marked})
+
+    #monitoring
+    @app.route(DB_POOL_ENDPOINT, methods=["GET"])
+    def db_pool():
+        return jsonify(pool_stats())
+
+    @app.route(PUZZLE_CACHE_ENDPOINT, methods=["GET"])
+    def puzzle_cache():
+        return jsonify(puzzle_cache_stats())
+
+    @app.route(USER_SEARCH_CACHE_ENDPOINT, methods=["GET"])
+    def user_search_cache():
+        return jsonify(user_search_cache_stats())
+
+    @app.route(ARCHIVE_ENDPOINT, methods=["GET"])
+    def archive_report():
+        return jsonify(archive_stats())
+
+    @app.route(COMPRESSION_ENDPOINT, methods=["GET"])
+    def compression_report():
+        return jsonify(compression_stats())
+
+    @app.route(RATE_LIMIT_ENDPOINT, methods=["GET"])
+    def rate_limit_report():
+        return jsonify(rate_limit_stats())
+
+    @app.route(JOBS_ENDPOINT, methods=["GET"])
+    def jobs_report():
+        return jsonify(jobs.stats())
+
+    @app.route(READY_ENDPOINT, methods=["GET"])
+    def readiness():
+        """for load balancers: stop sending players once a shutdown is draining"""
+        games = current_app.extensions.get("game_manager")
+        if games is not None and not games.accepting:
+            return jsonify({"ready": False, "reason": "draining"}), 503
+        return jsonify({"ready": True})
 
 ### NOTE for Ch-D
 # def _open_nyt_puzzle():
@@ -233,7 +525,8 @@ def create_app(testing: bool = False):
 
     socketio = SocketIO(app, cors_allowed_origins="*")
     register_routes(app)
-    register_sockets(socketio)
+    socket_manager = register_sockets(socketio)
+    app.extensions["game_manager"] = socket_manager.game_manager
     app.socketio = socketio        # let rest of code reach
 
     if testing:                   
@@ -0,0 +1,123 @@
+#/app/model/archive.py
+
+"""
+Cold storage for old messages and activities
+
+A pooled connection ATTACHes the archive file as schema `archive` the first
+time something on it needs archived rows (attach(), via db._with_archive),
+so most connections never open the file at all.
+move_batch() copies one bounded batch of expired rows over and deletes them
+from the live table in the same transaction; the hot tables and their
+indexes then only hold recent history. Readers look in the archive only
+when they page back (before_id / cursor) past the oldest live row: rows
+expire by timestamp alone, so everything archived is older than everything
+live and a first page never needs it.
+"""
+
+import os
+
+SCHEMA = "archive"
+
+#table -> (columns copied, expiry filter where ? is the cutoff timestamp)
+TABLES = {
+    "messages": ("id, sender, receiver, content, read, timestamp",
+                 "timestamp < ?"),
+    "activities": ("id, user, activity_type, related_id, details, timestamp",
+                   "timestamp < ?"),
+}
+
+
+def archive_path(db_file, archive_file=None):
+    """archive_file if set, else <db name>_archive<ext> next to db_file"""
+    if archive_file:
+        return archive_file
+    root, ext = os.path.splitext(db_file)
+    return f"{root}_archive{ext or '.db'}"
+
+
+def attach_sql(path):
+    return "ATTACH DATABASE '{}' AS {}".format(path.replace("'", "''"), SCHEMA)
+
+
+def attach(conn, path):
+    """
+    ATTACH the archive on a pooled conn unless it already is; returns conn
+    (ATTACH can't run inside a transaction, so call it before BEGIN)
+    """
+    if SCHEMA not in conn.attached:
+        conn.execute(attach_sql(path))
+        conn.attached.add(SCHEMA)
+    return conn
+
+
+def ensure_schema(conn):
+    """Create the archive tables if the file is new (idempotent, commits)"""
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {SCHEMA}.messages (
+            id INTEGER PRIMARY KEY,
+            sender TEXT NOT NULL,
+            receiver TEXT NOT NULL,
+            content TEXT NOT NULL,
+            read INTEGER,
+            timestamp DATETIME,
+            archived_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    #same shape as idx_messages_pair_id: page back through one conversation
+    conn.execute(f"""
+        CREATE INDEX IF NOT EXISTS {SCHEMA}.idx_archive_messages_pair_id
+        ON messages (sender, receiver, id)
+    """)
+    conn.execute(f"""
+        CREATE TABLE IF NOT EXISTS {SCHEMA}.activities (
+            id INTEGER PRIMARY KEY,
+            user TEXT NOT NULL,
+            activity_type TEXT NOT NULL,
+            related_id INTEGER,
+            details TEXT,
+            timestamp DATETIME,
+            archived_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.execute(f"""
+        CREATE INDEX IF NOT EXISTS {SCHEMA}.idx_archive_activities_user_time
+        ON activities (user, timestamp, id)
+    """)
+    #delete_puzzle cascade
+    conn.execute(f"""
+        CREATE INDEX IF NOT EXISTS {SCHEMA}.idx_archive_activities_completed_puzzle
+        ON activities (related_id) WHERE activity_type = 'completed_puzzle'
+    """)
+    conn.commit()
+
+
+def move_batch(conn, table, cutoff, batch_size):
+    """
+    Move up to batch_size rows of table older than cutoff into the archive
+    (oldest first, one transaction). Returns how many rows moved.
+    """
+    columns, expired = TABLES[table]
+    batch = f"""
+        SELECT id FROM main.{table} WHERE {expired}
+        ORDER BY timestamp, id LIMIT ?
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        #OR IGNORE: a row already copied by an interrupted pass is just deleted
+        conn.execute(f"""
+            INSERT OR IGNORE INTO {SCHEMA}.{table} ({columns})
+            SELECT {columns} FROM main.{table} WHERE id IN ({batch})
+        """, (cutoff, batch_size))
+        if table == "activities":
+            #inbox pointers to archived activities would only dangle
+            conn.execute(f"""
+                DELETE FROM main.feed_inbox WHERE activity_id IN ({batch})
+            """, (cutoff, batch_size))
+        moved = conn.execute(f"""
+            DELETE FROM main.{table} WHERE id IN ({batch})
+        """, (cutoff, batch_size)).rowcount
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return moved
@@ -0,0 +1,187 @@
+#/app/model/async_db.py
+
+"""
+Non-blocking data access for Socket.IO handlers and asyncio code
+
+Every public query/write of app/model/db.py is mirrored here as a coroutine
+with the same name and arguments; the blocking sqlite work runs on a
+dedicated, bounded executor instead of the caller's event loop / handler:
+
+    from app.model import async_db
+    puzzle = await async_db.get_puzzle(puzzle_id)
+
+Handlers that aren't coroutines (Flask-SocketIO threading/eventlet mode)
+use submit_read() / submit_write(), which return a concurrent Future right
+away, so timer ticks and broadcasts never wait on the database.
+
+The mirror is built from db's public functions: READ_FUNCTIONS are marked
+by hand, NOT_MIRRORED is plumbing with nothing to offload (connections,
+background threads, the write-behind queue_* calls that already return a
+Future, in-memory counters), and everything else is a write - so a new db
+function is mirrored (on the writer) without touching this file.
+
+Reads run on a small thread pool. Writes run on a single writer thread:
+SQLite serialises writers anyway, and FIFO order keeps dependent writes
+(create_game_session -> add_player_to_game -> update_game_status) in order.
+At most DB_MAX_PENDING jobs may be queued; beyond that DAOBusy is raised
+(after DB_SUBMIT_TIMEOUT secs) rather than growing the queue forever.
+
+Under eventlet/gevent (serving.monkey_patch) the executors' workers are
+green threads on the hub's own OS thread, where a blocking sqlite call
+would stall every greenlet. Each job then runs on the library's pool of
+native threads (eventlet.tpool / gevent's hub threadpool) while its green
+worker just waits, which keeps the single writer's FIFO order (the
+model's shared locks are native then too, see native.py).
+"""
+
+import asyncio
+import functools
+import inspect
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.config import DB_READ_WORKERS, DB_MAX_PENDING, DB_SUBMIT_TIMEOUT
+from app.model import db
+from app.model.native import GREEN
+
+
+class DAOBusy(Exception):
+    """Raised when the DB executors are saturated"""
+
+
+READ_FUNCTIONS = (
+    "verify_user", "search_users",
+    "get_puzzles", "get_puzzles_page", "get_puzzle", "get_puzzle_record",
+    "get_puzzle_etag", "get_puzzle_wire", "get_puzzle_wires",
+    "get_puzzle_catalog_version", "get_bootstrap",
+    "search_puzzles",
+    "get_last_inserted_puzzle_id",
+    "get_stats", "get_stats_page", "get_stat_summary",
+    "rec_activity", "rec_activity_page",
+    "get_active_games",
+    "get_friend_requests", "get_friends",
+    "get_messages", "get_messages_page", "get_unread_message_count",
+    "get_unread_breakdown",
+    "get_friend_activities", "get_friend_activities_page",
+    "get_rating_summary", "get_top_rated_puzzles",
+    "get_leaderboard", "get_leaderboard_rank",
+    "get_puzzle_reviews_page", "get_puzzle_ratings",
+    "get_puzzle_ratings_page",
+)
+
+NOT_MIRRORED = (
+    "init_db", "get_pool", "get_db_connection", "close_db_connection",
+    "db_connection", "pinned_connection",
+    "get_write_queue", "queue_result", "queue_activity", "queue_message",
+    "flush_writes",
+    "start_archiver", "start_puzzle_reaper",
+    "invalidate_puzzle", "format_activity_message",
+    "pool_stats", "puzzle_cache_stats", "user_search_cache_stats", "archive_stats",
+)
+
+
+def db_functions():
+    """names of the public functions defined in db.py (not imported there)"""
+    return sorted(name for name, obj in vars(db).items()
+                  if not name.startswith("_") and inspect.isfunction(obj)
+                  and obj.__module__ == db.__name__)
+
+
+WRITE_FUNCTIONS = tuple(name for name in db_functions()
+                        if name not in READ_FUNCTIONS and name not in NOT_MIRRORED)
+
+def _on_native_thread(fn):
+    """fn, made to run on a native OS thread when the workers are green"""
+    if GREEN == "eventlet":
+        from eventlet import tpool
+        return functools.partial(tpool.execute, fn)
+    if GREEN == "gevent":
+        import gevent
+        return lambda *args, **kwargs: gevent.get_hub().threadpool.apply(fn, args, kwargs)
+    return fn
+
+
+_readers = ThreadPoolExecutor(max_workers=DB_READ_WORKERS, thread_name_prefix="db-read")
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-write")
+_slots = threading.BoundedSemaphore(DB_MAX_PENDING)
+_stats = {"submitted": 0, "failed": 0, "rejected": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(key):
+    with _stats_lock:
+        _stats[key] += 1
+
+
+def _done(future):
+    _slots.release()
+    if future.exception() is not None:
+        _count("failed")
+        print(f"async_db job failed: {future.exception()!r}")
+
+
+def _submit(executor, fn, args, kwargs, blocking=True):
+    if not _slots.acquire(blocking, DB_SUBMIT_TIMEOUT if blocking else None):
+        _count("rejected")
+        raise DAOBusy(f"{DB_MAX_PENDING} database jobs already pending")
+    try:
+        future = executor.submit(_on_native_thread(fn), *args, **kwargs)
+    except Exception:
+        _slots.release()
+        raise
+    _count("submitted")
+    future.add_done_callback(_done)
+    return future
+
+
+def submit_read(fn, *args, **kwargs):
+    """Run a read on the reader pool; returns a concurrent Future"""
+    return _submit(_readers, fn, args, kwargs)
+
+
+def submit_write(fn, *args, **kwargs):
+    """Queue a write on the single writer thread; returns a concurrent Future"""
+    return _submit(_writer, fn, args, kwargs)
+
+
+async def _run(executor, fn, *args, **kwargs):
+    #never block the loop waiting for a slot: poll until the timeout instead
+    deadline = time.monotonic() + DB_SUBMIT_TIMEOUT
+    while True:
+        try:
+            future = _submit(executor, fn, args, kwargs, blocking=False)
+            break
+        except DAOBusy:
+            if time.monotonic() >= deadline:
+                raise
+            await asyncio.sleep(0.005)
+    return await asyncio.wrap_future(future)
+
+
+def _wrap(executor, fn):
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        return await _run(executor, fn, *args, **kwargs)
+    return wrapper
+
+
+for _name in READ_FUNCTIONS:
+    globals()[_name] = _wrap(_readers, getattr(db, _name))
+for _name in WRITE_FUNCTIONS:
+    globals()[_name] = _wrap(_writer, getattr(db, _name))
+
+__all__ = ["DAOBusy", "submit_read", "submit_write", "executor_stats",
+           "shutdown", *READ_FUNCTIONS, *WRITE_FUNCTIONS]
+
+
+def executor_stats():
+    """submitted / failed / rejected counters + where jobs run"""
+    with _stats_lock:
+        return dict(_stats, runs_on=f"{GREEN} native pool" if GREEN else "threads")
+
+
+def shutdown(wait=True):
+    """Stop both executors (waits for queued writes by default)"""
+    _readers.shutdown(wait=wait)
+    _writer.shutdown(wait=wait)
@@ -0,0 +1,101 @@
+#/app/model/cache.py
+
+"""
+Size-bounded in-process LRU cache
+
+Entries are charged by an approximate byte size supplied by the caller, and
+the least recently used ones are evicted once either max_bytes or
+max_entries is exceeded. Used in front of get_puzzle (puzzles are
+effectively immutable once added), invalidated by writers.
+
+Cached values are shared between callers - treat them as read-only.
+"""
+
+from collections import OrderedDict
+
+from app.model import native
+
+
+class ByteLRUCache:
+
+    def __init__(self, max_bytes, max_entries=None):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+
+        self._entries = OrderedDict()      #key -> (value, size)
+        self._bytes = 0
+        self._generation = 0               #bumped by every invalidation
+        self._lock = native.lock()
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "invalidations": 0,
+            "rejected": 0,
+        }
+
+    @property
+    def generation(self):
+        """
+        Read before loading a value, pass to put(); a put whose load raced
+        with an invalidation is dropped instead of caching stale data
+        """
+        return self._generation
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return default
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry[0]
+
+    def put(self, key, value, size, generation=None):
+        """Cache value charged at size bytes; returns False if not stored"""
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return False
+            if size > self.max_bytes:
+                self._stats["rejected"] += 1
+                return False
+
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (value, size)
+            self._bytes += size
+
+            while self._bytes > self.max_bytes or (
+                    self.max_entries is not None
+                    and len(self._entries) > self.max_entries):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self._stats["evictions"] += 1
+            return True
+
+    def invalidate(self, key):
+        with self._lock:
+            self._generation += 1
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._bytes -= entry[1]
+                self._stats["invalidations"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot.update(
+                entries=len(self._entries),
+                bytes=self._bytes,
+                max_bytes=self.max_bytes,
+                max_entries=self.max_entries,
+            )
+        return snapshot
@@ -5,23 +5,167 @@ This module manages SQLite database interactions for crossword puzzle app
 db setup, usr management, puzzle management, stats track, multiplayer functions
 """
 
+import atexit
 import sqlite3
 import json
+import re
+import threading
+import time
+from contextlib import contextmanager
 
-from app.config import DB_FILE
+from flask import g, has_app_context
+
+from app.config import (
+    DB_FILE, DB_POOL_SIZE, DB_POOL_TIMEOUT, DB_PRAGMAS,
+    WRITE_QUEUE_BATCH_SIZE, WRITE_QUEUE_MAX_DELAY,
+    PUZZLE_CACHE_MAX_BYTES, PUZZLE_CACHE_MAX_ENTRIES,
+    FEED_FANOUT_LIMIT, FEED_BACKFILL_PER_USER,
+    PUZZLE_BULK_BATCH_SIZE, PUZZLE_REAP_CHUNK, PUZZLE_REAP_INTERVAL,
+    USER_SEARCH_CACHE_ENTRIES, USER_SEARCH_CACHE_BYTES,
+    ARCHIVE_DB_FILE, MESSAGE_RETENTION_DAYS, ACTIVITY_RETENTION_DAYS,
+    ARCHIVE_BATCH_SIZE, ARCHIVE_INTERVAL,
+    BOOTSTRAP_PUZZLES, BOOTSTRAP_FEED
+)
+from app.model.pool import ConnectionPool
+from app.model.migrations import run_migrations
+from app.model.write_queue import WriteBehindQueue
+from app.model.puzzle_store import (
+    PuzzleRecord, StoredPuzzle, encode_puzzle, content_etag, build_wire, wire_json
+)
+from app.model.cache import ByteLRUCache
+from app.model.paging import InvalidCursor, decode_cursor, encode_cursor, split_page
+from app.model.leaderboard import GLOBAL, METRICS, RankIndex
+from app.model.rollups import upsert_rollup, rebuild_rollups
+from app.model import archive, native
+
+
+#shared pool (rebuilt if DB_FILE is repointed, e.g. by tests)
+_pool = None
+
+#connection shared by a pinned_connection() block, per thread
+_pinned = threading.local()
+
+#decoded puzzles keyed by id; invalidated by every puzzle write path
+_puzzle_cache = ByteLRUCache(PUZZLE_CACHE_MAX_BYTES, PUZZLE_CACHE_MAX_ENTRIES)
+
+#first pages of hot user searches; cleared whenever a user signs up
+_user_search_cache = ByteLRUCache(USER_SEARCH_CACHE_BYTES, USER_SEARCH_CACHE_ENTRIES)
+
+def get_pool():
+    """
+    Return the connection pool for the current DB_FILE
+    """
+    global _pool
+    if _pool is None or _pool.db_file != DB_FILE:
+        if _pool is not None:
+            _pool.close()
+        _puzzle_cache.clear()           #ids belong to the old database
+        _user_search_cache.clear()
+        _rank_index.drop()
+        _archived.clear()
+        _pool = ConnectionPool(
+            DB_FILE,
+            max_size=DB_POOL_SIZE,
+            timeout=DB_POOL_TIMEOUT,
+            pragmas=DB_PRAGMAS,
+        )
+    return _pool
+
+#old messages/activities live in the archive db, ATTACHed lazily per connection
+#table -> whether the archive holds any of its rows (checked once per db)
+_archived = {}
+
+def _with_archive(conn):
+    """ conn with the archive db attached (outside a transaction) """
+    return archive.attach(conn, archive.archive_path(DB_FILE, ARCHIVE_DB_FILE))
+
+def _archive_has(conn, table):
+    """ True if the archive holds rows of table (looked up once, then cached) """
+    if table not in _archived:
+        _archived[table] = _with_archive(conn).execute(
+            f"SELECT 1 FROM {archive.SCHEMA}.{table} LIMIT 1"
+        ).fetchone() is not None
+    return _archived[table]
+
+def pool_stats():
+    """
+    Usage counters for the connection pool (checkouts, reuse, waits...)
+    """
+    return get_pool().stats()
+
+
+#keyset sentinels: "before the first page" for DESC lists
+_MAX_ID = 2 ** 63 - 1
+_MAX_TS = "9999-12-31 23:59:59"
 
 
 #set up db connection
 def get_db_connection():
     """
-    Create and return SQLite connection
+    Check out a pooled SQLite connection; close() hands it back to the pool.
+
+    Inside a Flask app context (REST request or Socket.IO event) every call
+    shares one connection bound to that context, released at teardown even
+    if a caller forgot to close it.
+    """
+    pool = get_pool()
+    if not has_app_context():
+        conn = getattr(_pinned, "conn", None)
+        if conn is not None and conn._pool is pool:
+            return pool.retain(conn)
+        return pool.acquire()
+
+    conn = g.get("_db_conn")
+    if conn is None or conn._pool is not pool:
+        conn = pool.acquire()          #hold owned by the app context
+        g._db_conn = conn
+    return pool.retain(conn)
+
+def close_db_connection(exc=None):
+    """
+    Teardown hook: give the context-bound connection back to the pool
     """
-    conn = sqlite3.connect(DB_FILE, check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    return conn
+    conn = g.pop("_db_conn", None)
+    if conn is not None and conn._pool is not None:
+        conn._pool.release(conn, force=True)
+
+@contextmanager
+def db_connection():
+    """
+    `with db_connection() as conn:` - checkout that is always released.
+    An exception rolls back whatever it left uncommitted: the connection
+    may be shared (app context / pinned) and the next caller's
+    BEGIN IMMEDIATE would fail inside a still-open transaction
+    """
+    conn = get_db_connection()
+    try:
+        yield conn
+    except BaseException:
+        if conn.in_transaction:
+            conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+@contextmanager
+def pinned_connection():
+    """
+    `with pinned_connection():` - every db call in the block shares one
+    pooled connection, as calls inside a Flask app context already do
+    """
+    if has_app_context() or getattr(_pinned, "conn", None) is not None:
+        yield
+        return
+    conn = get_pool().acquire()
+    _pinned.conn = conn
+    try:
+        yield
+    finally:
+        _pinned.conn = None
+        conn.close()
 
 def init_db():
-    """ Init. all necessary tables if don't already exist: """
+    """ Init. all necessary tables if don't already exist, then migrate: """
     conn = get_db_connection()
     c = conn.cursor()
 
@@ -133,6 +277,12 @@ def init_db():
     """)
 
     conn.commit()
+
+    #bring older databases up to the current schema version (indexes etc.)
+    run_migrations(conn)
+    archive.ensure_schema(_with_archive(conn))
+    for table in archive.TABLES:
+        _archive_has(conn, table)       #readers know up front whether to look
     conn.close()
 
 
@@ -150,21 +300,101 @@ def create_user(username, password):
         )
         conn.commit()
     except sqlite3.IntegrityError:
+        conn.rollback()
         conn.close()
         return False
     conn.close()
+    _user_search_cache.clear()
     return True
 
 def verify_user(username, password):
     """
     Check credentials. Returns True if matching user is found.
     """
-    row = get_db_connection().execute(
-        "SELECT 1 FROM users WHERE username=? AND password=?",
-        (username, password)
-    ).fetchone()
+    with db_connection() as conn:
+        row = conn.execute(
+            "SELECT 1 FROM users WHERE username=? AND password=?",
+            (username, password)
+        ).fetchone()
     return bool(row)
 
+def _prefix_upper(prefix):
+    """smallest string sorting after every string that starts with prefix"""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+def _search_prefix(conn, query, limit, cursor):
+    after, = decode_cursor(cursor, 1) if cursor else ("",)
+    if not isinstance(after, str):
+        raise InvalidCursor("Cursor does not match this list")
+    rows = conn.execute("""
+        SELECT username FROM users
+        WHERE username COLLATE NOCASE >= ? AND username COLLATE NOCASE < ?
+          AND (username COLLATE NOCASE, username) > (?, ?)
+        ORDER BY username COLLATE NOCASE, username
+        LIMIT ?
+    """, (query, _prefix_upper(query), after, after, limit + 1)).fetchall()
+    return split_page(rows, limit, lambda r: (r["username"],))
+
+def _search_substring(conn, query, limit, cursor):
+    after, = decode_cursor(cursor, 1) if cursor else (0,)
+    if not isinstance(after, int):
+        raise InvalidCursor("Cursor does not match this list")
+    try:
+        rows = conn.execute("""
+            SELECT rowid AS id, username FROM users_fts
+            WHERE users_fts MATCH ? AND rowid > ?
+            ORDER BY rowid
+            LIMIT ?
+        """, ('"' + query.replace('"', '""') + '"', after, limit + 1)).fetchall()
+    except sqlite3.OperationalError as e:
+        if "no such table" not in str(e):
+            raise
+        #sqlite built without FTS5: same results from a scan
+        pattern = "%" + query.replace("\\", "\\\\").replace("%", "\\%") \
+                             .replace("_", "\\_") + "%"
+        rows = conn.execute("""
+            SELECT rowid AS id, username FROM users
+            WHERE username LIKE ? ESCAPE '\\' AND rowid > ?
+            ORDER BY rowid
+            LIMIT ?
+        """, (pattern, after, limit + 1)).fetchall()
+    return split_page(rows, limit, lambda r: (r["id"],))
+
+def search_users(query, limit=20, cursor=None, substring=False):
+    """
+    Usernames matching query, case-insensitive
+    prefix (default): alphabetical, a range scan on idx_users_username_nocase
+    substring=True: match anywhere via the users_fts trigram index, in
+    signup order (queries under 3 chars can't use trigrams -> prefix)
+    Returns (usernames, next cursor or None)
+    """
+    query = query.strip()
+    if not query:
+        return [], None
+    if substring and len(query) < 3:
+        substring = False
+
+    key = (query, substring, limit)
+    if cursor is None:
+        hit = _user_search_cache.get(key)
+        if hit is not None:
+            return hit
+
+    generation = _user_search_cache.generation
+    search = _search_substring if substring else _search_prefix
+    with db_connection() as conn:
+        rows, next_cursor = search(conn, query, limit, cursor)
+    result = ([r["username"] for r in rows], next_cursor)
+
+    if cursor is None:
+        size = sum(len(u) for u in result[0]) + len(query) + 64
+        _user_search_cache.put(key, result, size, generation)
+    return result
+
+def user_search_cache_stats():
+    """hit/miss counters for the user search cache"""
+    return _user_search_cache.stats()
+
 
 #puzzle Management
 
@@ -172,152 +402,701 @@ def get_puzzles():
     """
     Return list for all puzzles
     """
-    rows = get_db_connection().execute(
-        "SELECT id, name FROM puzzles"
-    ).fetchall()
+    with db_connection() as conn:
+        rows = conn.execute(
+            "SELECT id, name FROM puzzles WHERE deleted_at IS NULL"
+        ).fetchall()
     return [(r["id"], r["name"]) for r in rows]
 
-def get_puzzle(puzzle_id):
+def get_puzzles_page(limit=50, cursor=None):
     """
-    Load a single puzzle's full data by ID, or none if not found
+    One page of (id, name) tuples in id order
+    Returns (rows, next cursor or None)
+    """
+    after_id, = decode_cursor(cursor, 1) if cursor else (0,)
+    with db_connection() as conn:
+        rows = conn.execute("""
+            SELECT id, name FROM puzzles
+            WHERE id > ? AND deleted_at IS NULL
+            ORDER BY id
+            LIMIT ?
+        """, (after_id, limit + 1)).fetchall()
+    rows, next_cursor = split_page(rows, limit, lambda r: (r["id"],))
+    return [(r["id"], r["name"]) for r in rows], next_cursor
+
+def _fts_query(text):
+    """
+    Free text -> safe FTS5 query: every word must match, the last one as a
+    prefix (so results show up while typing); operators are never parsed
+    """
+    words = re.findall(r"\w+", text)
+    if not words:
+        return None
+    return " ".join(f'"{w}"' for w in words) + "*"
+
+def search_puzzles(query, limit=20, cursor=None):
+    """
+    Puzzles whose name, author or clues match query, best first
+    (bm25, name hits weigh most), each with a highlighted name and a
+    clue snippet. Returns (results, next cursor or None)
+    """
+    match = _fts_query(query)
+    if match is None:
+        return [], None
+    rank, after_id = decode_cursor(cursor, 2) if cursor else (float("-inf"), 0)
+
+    with db_connection() as conn:
+        try:
+            rows = conn.execute("""
+                SELECT * FROM (
+                    SELECT f.rowid AS id, p.author,
+                           bm25(puzzles_fts, 10.0, 5.0, 1.0) AS rank,
+                           highlight(puzzles_fts, 0, '[', ']') AS name,
+                           snippet(puzzles_fts, 2, '[', ']', '...', 12) AS snippet
+                    FROM puzzles_fts f
+                    JOIN puzzles p ON p.id = f.rowid
+                    WHERE puzzles_fts MATCH ? AND p.deleted_at IS NULL
+                )
+                WHERE (rank, id) > (?, ?)
+                ORDER BY rank, id
+                LIMIT ?
+            """, (match, rank, after_id, limit + 1)).fetchall()
+        except sqlite3.OperationalError as e:
+            if "no such table" not in str(e):
+                raise
+            #sqlite built without FTS5: names only, in id order
+            rows = conn.execute("""
+                SELECT id, author, 0.0 AS rank, name, '' AS snippet
+                FROM puzzles
+                WHERE name LIKE ? AND deleted_at IS NULL AND id > ?
+                ORDER BY id
+                LIMIT ?
+            """, ("%" + query.strip() + "%", after_id, limit + 1)).fetchall()
+
+    rows, next_cursor = split_page(rows, limit, lambda r: (r["rank"], r["id"]))
+    return [{
+        "id": r["id"],
+        "name": r["name"],
+        "author": r["author"],
+        "snippet": r["snippet"],
+        "rank": r["rank"],
+    } for r in rows], next_cursor
+
+#columns PuzzleRecord needs; never SELECT * so listing stays cheap
+_PUZZLE_COLUMNS = """
+    id, name, width, height, cells,
+    grid, clues_across, clues_down, answers, etag
+"""
+
+def _load_clues(conn, puzzle_id):
+    """
+    (direction, number, clue) rows for a packed puzzle, in stored order
+    """
+    return conn.execute("""
+        SELECT direction, number, clue
+        FROM puzzle_clues
+        WHERE puzzle_id=?
+        ORDER BY direction, position
+    """, (puzzle_id,)).fetchall()
+
+def get_puzzle_record(puzzle_id):
+    """
+    Lazily decoded PuzzleRecord, or None if not found.
+    id/name/width/height are free; grid, answers and clues decode on access.
     """
-    row = get_db_connection().execute(
-        "SELECT * FROM puzzles WHERE id=?", (puzzle_id,)
-    ).fetchone()
+    with db_connection() as conn:
+        row = conn.execute(f"""
+            SELECT {_PUZZLE_COLUMNS} FROM puzzles
+            WHERE id=? AND deleted_at IS NULL
+        """, (puzzle_id,)).fetchone()
     if not row:
         return None
 
-    return {
-        "id":           row["id"],
-        "name":         row["name"],
-        "grid":         json.loads(row["grid"]),
-        "clues_across": json.loads(row["clues_across"]),
-        "clues_down":   json.loads(row["clues_down"]),
-        "answers":      json.loads(row["answers"])
-    }
+    def clue_loader():
+        with db_connection() as conn:
+            return _load_clues(conn, puzzle_id)
+
+    return PuzzleRecord(row, clue_loader)
 
-def add_puzzle(name, grid, clues_across, clues_down, answers):
+def _stored_etag(conn, row):
     """
-    Insert new puzzle; JSON: grid/clues/answers for storing
+    row's etag; rows written by raw SQL (no etag yet) get one computed
+    from the stored content and saved
     """
-    conn = get_db_connection()
+    if row["etag"] is not None:
+        return row["etag"]
+    clues = conn.execute("""
+        SELECT direction, position, number, clue
+        FROM puzzle_clues WHERE puzzle_id=?
+    """, (row["id"],)).fetchall()
+    etag = content_etag(row["name"], row, clues)
+    conn.execute("UPDATE puzzles SET etag=? WHERE id=?", (etag, row["id"]))
+    conn.commit()
+    return etag
+
+def _stored_wire(conn, row):
+    """
+    row's wire JSON; rows without one (raw SQL inserts) get it built from
+    the stored columns and saved
+    """
+    if row["wire"] is not None:
+        return row["wire"]
+    clues = _load_clues(conn, row["id"]) if row["clues_across"] is None else []
+    wire = wire_json(PuzzleRecord(row, lambda: clues).to_dict())
+    conn.execute("UPDATE puzzles SET wire=? WHERE id=?", (wire, row["id"]))
+    conn.commit()
+    return wire
+
+def _load_puzzle_entry(puzzle_id):
+    """StoredPuzzle via the LRU, or None if not found"""
+    entry = _puzzle_cache.get(puzzle_id)
+    if entry is not None:
+        return entry
+
+    generation = _puzzle_cache.generation
+    with db_connection() as conn:
+        row = conn.execute(f"""
+            SELECT {_PUZZLE_COLUMNS}, wire FROM puzzles
+            WHERE id=? AND deleted_at IS NULL
+        """, (puzzle_id,)).fetchone()
+        if not row:
+            return None
+        entry = StoredPuzzle(_stored_wire(conn, row), _stored_etag(conn, row))
+
+    _puzzle_cache.put(puzzle_id, entry, len(entry.wire), generation)
+    return entry
+
+def get_puzzle_wires(puzzle_ids):
+    """
+    {id: StoredPuzzle} for the ids that exist (missing/deleted ones are
+    left out): cache hits first, then one SELECT for the rest
+    """
+    found, misses = {}, []
+    for puzzle_id in dict.fromkeys(puzzle_ids):
+        entry = _puzzle_cache.get(puzzle_id)
+        if entry is not None:
+            found[puzzle_id] = entry
+        else:
+            misses.append(puzzle_id)
+    if not misses:
+        return found
+
+    generation = _puzzle_cache.generation
+    with db_connection() as conn:
+        rows = conn.execute(f"""
+            SELECT {_PUZZLE_COLUMNS}, wire FROM puzzles
+            WHERE id IN ({",".join("?" * len(misses))}) AND deleted_at IS NULL
+        """, misses).fetchall()
+        for row in rows:
+            entry = StoredPuzzle(_stored_wire(conn, row), _stored_etag(conn, row))
+            _puzzle_cache.put(row["id"], entry, len(entry.wire), generation)
+            found[row["id"]] = entry
+    return found
+
+def get_puzzle(puzzle_id):
+    """
+    Load a single puzzle's full data by ID, or none if not found
+    Served from the in-process LRU after the first load (read-only!)
+    """
+    entry = _load_puzzle_entry(puzzle_id)
+    return entry.puzzle if entry else None
+
+def get_puzzle_wire(puzzle_id):
+    """
+    (JSON bytes, etag) of a puzzle exactly as GET /puzzle/<id> sends it,
+    or None if not found - stored pre-serialized, so never decoded/encoded
+    """
+    entry = _load_puzzle_entry(puzzle_id)
+    return (entry.wire, entry.etag) if entry else None
+
+def get_puzzle_etag(puzzle_id):
+    """
+    Strong ETag of a puzzle (content hash stored at write time), or None
+    if not found. Cached puzzles answer without touching the db
+    """
+    entry = _puzzle_cache.get(puzzle_id)
+    if entry is not None:
+        return entry.etag
+    with db_connection() as conn:
+        row = conn.execute(f"""
+            SELECT {_PUZZLE_COLUMNS} FROM puzzles
+            WHERE id=? AND deleted_at IS NULL
+        """, (puzzle_id,)).fetchone()
+        return _stored_etag(conn, row) if row else None
+
+def get_puzzle_catalog_version():
+    """
+    Counter bumped (by triggers) whenever a puzzle is added, renamed or
+    deleted - the ETag of the puzzle list
+    """
+    with db_connection() as conn:
+        return conn.execute(
+            "SELECT version FROM puzzle_catalog WHERE id = 1"
+        ).fetchone()[0]
+
+def invalidate_puzzle(puzzle_id):
+    """
+    Drop a puzzle from the cache; call after committing any edit/delete
+    """
+    _puzzle_cache.invalidate(puzzle_id)
+
+def puzzle_cache_stats():
+    """
+    hit/miss/eviction counters for the puzzle cache
+    """
+    return _puzzle_cache.stats()
+
+def _index_clue_text(conn, puzzle_ids):
+    """
+    Clue text of packed puzzles into puzzles_fts, one write per puzzle once
+    all its clue rows are in (a per-clue update rewrote the growing
+    document every time: quadratic in clues)
+    """
+    try:
+        conn.executemany("""
+            UPDATE puzzles_fts SET clues = (
+                SELECT group_concat(clue, ' ') FROM (
+                    SELECT clue FROM puzzle_clues WHERE puzzle_id = ?
+                    ORDER BY direction, position
+                )
+            )
+            WHERE rowid = ?
+        """, [(pid, pid) for pid in puzzle_ids])
+    except sqlite3.OperationalError as e:
+        if "no such table" not in str(e):
+            raise
+        #sqlite built without FTS5: nothing to index
+
+def _insert_puzzle(conn, name, grid, clues_across, clues_down, answers, author=None):
+    """ puzzle row (packed where possible) + clue rows on conn (no commit) """
+    columns, clues = encode_puzzle(grid, clues_across, clues_down, answers)
     cursor = conn.execute("""
-        INSERT INTO puzzles (name,grid,clues_across,clues_down,answers)
-        VALUES (?,?,?,?,?)
+        INSERT INTO puzzles (name, author, width, height, cells,
+                             grid, clues_across, clues_down, answers, etag)
+        VALUES (?,?,?,?,?,?,?,?,?,?)
     """, (
-        name,
-        json.dumps(grid),
-        json.dumps(clues_across),
-        json.dumps(clues_down),
-        json.dumps(answers),
+        name, author,
+        columns["width"], columns["height"], columns["cells"],
+        columns["grid"], columns["clues_across"],
+        columns["clues_down"], columns["answers"],
+        content_etag(name, columns, clues),
     ))
     puzzle_id = cursor.lastrowid
+    conn.execute("UPDATE puzzles SET wire=? WHERE id=?",
+                 (build_wire(puzzle_id, name, columns, clues), puzzle_id))
+    conn.executemany("""
+        INSERT INTO puzzle_clues (puzzle_id, direction, position, number, clue)
+        VALUES (?,?,?,?,?)
+    """, [(puzzle_id,) + clue for clue in clues])
+    if clues:
+        _index_clue_text(conn, [puzzle_id])
+    return puzzle_id
+
+def add_puzzle(name, grid, clues_across, clues_down, answers, author=None):
+    """
+    Insert new puzzle in the packed format (see puzzle_store.py)
+    Returns the new puzzle id
+    """
+    with db_connection() as conn:
+        puzzle_id = _insert_puzzle(conn, name, grid, clues_across, clues_down,
+                                   answers, author)
     
-    #record this activity if we know who created it
-    #info not currently passed to function; could be added in a future update :)
+        #record this activity if we know who created it
+        #info not currently passed to function; could be added in a future update :)
     
-    conn.commit()
-    conn.close()
-    return True
+        conn.commit()
+    return puzzle_id
+
+def _flush_puzzle_batch(conn, rows, clue_rows):
+    conn.executemany("""
+        INSERT INTO puzzles (id, name, author, width, height, cells,
+                             grid, clues_across, clues_down, answers, etag, wire)
+        VALUES (?,?,?,?,?,?,?,?,?,?,?,?)
+    """, rows)
+    conn.executemany("""
+        INSERT INTO puzzle_clues (puzzle_id, direction, position, number, clue)
+        VALUES (?,?,?,?,?)
+    """, clue_rows)
+    _index_clue_text(conn, dict.fromkeys(row[0] for row in clue_rows))
+
+def _puzzle_batch_rows(batch, next_id):
+    """(puzzle rows, clue rows) for batch items, ids counting up from next_id"""
+    rows, clue_rows = [], []
+    for index, name, author, columns, clues in batch:
+        rows.append((
+            next_id, name, author,
+            columns["width"], columns["height"], columns["cells"],
+            columns["grid"], columns["clues_across"],
+            columns["clues_down"], columns["answers"],
+            content_etag(name, columns, clues),
+            build_wire(next_id, name, columns, clues),
+        ))
+        clue_rows.extend((next_id,) + clue for clue in clues)
+        next_id += 1
+    return rows, clue_rows
+
+def _store_puzzle_batch(batch, results):
+    """
+    One write transaction for a parsed batch of
+    (index, name, author, columns, clues); fills in results[index].
+    If the batch insert fails it's redone an item at a time, each in its
+    own SAVEPOINT, so only the items that fail are reported as errors
+    """
+    with db_connection() as conn:
+        #write lock up front, so ids can be handed out here instead of
+        #one lastrowid round trip per row
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            first_id = conn.execute("""
+                SELECT MAX(COALESCE((SELECT MAX(id) FROM puzzles), 0),
+                           COALESCE((SELECT seq FROM sqlite_sequence
+                                     WHERE name = 'puzzles'), 0)) + 1
+            """).fetchone()[0]
+            errors = {}
+            conn.execute("SAVEPOINT puzzle_batch")
+            try:
+                _flush_puzzle_batch(conn, *_puzzle_batch_rows(batch, first_id))
+            except (sqlite3.Error, ValueError, TypeError):
+                conn.execute("ROLLBACK TO puzzle_batch")
+                for offset, item in enumerate(batch):
+                    conn.execute("SAVEPOINT puzzle_item")
+                    try:
+                        _flush_puzzle_batch(conn, *_puzzle_batch_rows([item], first_id + offset))
+                    except (sqlite3.Error, ValueError, TypeError) as e:
+                        conn.execute("ROLLBACK TO puzzle_item")
+                        errors[item[0]] = str(e)
+                    conn.execute("RELEASE puzzle_item")
+            conn.execute("RELEASE puzzle_batch")
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+
+    #failed items leave a gap in the ids, nothing else
+    for offset, item in enumerate(batch):
+        index = item[0]
+        if index in errors:
+            results[index] = {"index": index, "error": errors[index]}
+        else:
+            results[index] = {"index": index, "id": first_id + offset}
+
+def add_puzzles(puzzles, batch_size=PUZZLE_BULK_BATCH_SIZE):
+    """
+    Bulk insert: puzzles is any iterable of dicts (same keys as POST /puzzle)
+    or their JSON text, consumed lazily. Items are parsed outside any
+    transaction (a slow upload never holds the write lock) and fully
+    validated there; each batch_size valid ones then go in with executemany
+    and commit together.
+    Returns one {"index", "id"} or {"index", "error"} per item; bad items
+    (even ones only the insert rejects) are reported and skipped, they
+    don't abort the rest.
+    """
+    results, batch = [], []
+    for index, item in enumerate(puzzles):
+        try:
+            if isinstance(item, (str, bytes)):
+                item = json.loads(item)
+            name = item["name"]
+            if not isinstance(name, str) or not name:
+                raise ValueError("name must be a non-empty string")
+            author = item.get("author")
+            if author is not None and not isinstance(author, str):
+                raise ValueError("author must be a string")
+            columns, clues = encode_puzzle(
+                item["grid"], item["clues_across"],
+                item["clues_down"], item["answers"]
+            )
+        except KeyError as e:
+            results.append({"index": index, "error": f"missing field {e}"})
+            continue
+        except (ValueError, TypeError, AttributeError) as e:
+            results.append({"index": index, "error": str(e)})
+            continue
+
+        results.append(None)        #id filled in when its batch is stored
+        batch.append((index, name, author, columns, clues))
+        if len(batch) >= batch_size:
+            _store_puzzle_batch(batch, results)
+            batch = []
 
-def delete_puzzle(puzzle_id):
+    if batch:
+        _store_puzzle_batch(batch, results)
+    return results
+
+#dependent rows of a puzzle, children before parents:
+#(table, key to chunk on, filter where ? is the puzzle id). The key must be
+#unique per row or one chunk deletes every row sharing it: rowid, or the
+#primary key of WITHOUT ROWID tables
+_PUZZLE_DEPENDENTS = (
+    ("feed_inbox", "owner, timestamp, activity_id",
+     "activity_id IN (SELECT id FROM activities"
+     " WHERE related_id = ? AND activity_type = 'completed_puzzle')"),
+    ("activities", "rowid",
+     "related_id = ? AND activity_type = 'completed_puzzle'"),
+    ("archive.activities", "rowid",
+     "related_id = ? AND activity_type = 'completed_puzzle'"),
+    ("user_stats", "rowid", "puzzle_id = ?"),
+    ("game_players", "rowid",
+     "game_id IN (SELECT game_id FROM game_sessions WHERE puzzle_id = ?)"),
+    ("game_sessions", "rowid", "puzzle_id = ?"),
+    ("puzzle_ratings", "rowid", "puzzle_id = ?"),
+    ("puzzle_rating_summary", "rowid", "puzzle_id = ?"),
+    ("puzzle_clues", "direction, position", "puzzle_id = ?"),
+)
+
+def _puzzle_dependents(conn):
+    """ _PUZZLE_DEPENDENTS, less the archive table while it holds no activities """
+    if _archive_has(conn, "activities"):
+        _with_archive(conn)
+        return _PUZZLE_DEPENDENTS
+    return [d for d in _PUZZLE_DEPENDENTS if not d[0].startswith(archive.SCHEMA + ".")]
+
+def delete_puzzle(puzzle_id, soft=False):
     """
-    Delete a puzzle by ID
+    Delete a puzzle by ID along with everything that references it
+    soft=True only tombstones it (hidden from reads straight away) and
+    leaves the cleanup to reap_deleted_puzzles()
     Returns True if successful, False if no rows affected
     """
-    conn = get_db_connection()
-    
-    # Delete puzzle stats first (foreign key constraint)
-    conn.execute("DELETE FROM user_stats WHERE puzzle_id = ?", (puzzle_id,))
-    
-    # Delete activities related to this puzzle
-    conn.execute("DELETE FROM activities WHERE related_id = ? AND activity_type = 'completed_puzzle'", (puzzle_id,))
-    
-    # Delete game sessions for this puzzle
-    game_sessions = conn.execute(
-        "SELECT game_id FROM game_sessions WHERE puzzle_id = ?", 
-        (puzzle_id,)
-    ).fetchall()
-    
-    for session in game_sessions:
-        game_id = session["game_id"]
-        conn.execute("DELETE FROM game_players WHERE game_id = ?", (game_id,))
-    
-    conn.execute("DELETE FROM game_sessions WHERE puzzle_id = ?", (puzzle_id,))
-    
-    # Finally delete the puzzle itself
-    cursor = conn.execute("DELETE FROM puzzles WHERE id = ?", (puzzle_id,))
-    success = cursor.rowcount > 0
-    
-    conn.commit()
-    conn.close()
-    
+    with db_connection() as conn:
+        dependents = () if soft else _puzzle_dependents(conn)     #ATTACHes: before BEGIN
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if soft:
+                cursor = conn.execute("""
+                    UPDATE puzzles SET deleted_at = CURRENT_TIMESTAMP
+                    WHERE id = ? AND deleted_at IS NULL
+                """, (puzzle_id,))
+                #boards, ranks and rollups stop counting it now, not at reap time
+                if cursor.rowcount:
+                    _drop_puzzle_leaderboard(conn, puzzle_id)
+            else:
+                #one set-based delete per table, all or nothing
+                for table, _, where in dependents:
+                    conn.execute(f"DELETE FROM {table} WHERE {where}", (puzzle_id,))
+                _drop_puzzle_leaderboard(conn, puzzle_id)
+                cursor = conn.execute("DELETE FROM puzzles WHERE id = ?", (puzzle_id,))
+            success = cursor.rowcount > 0
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+    invalidate_puzzle(puzzle_id)
+    _rank_index.drop(puzzle_id, GLOBAL)
+
     return success
 
+def reap_deleted_puzzles(chunk_size=PUZZLE_REAP_CHUNK, max_chunks=None):
+    """
+    Purge tombstoned puzzles, at most chunk_size rows per transaction so
+    writers never wait long on a big cascade. Stops early after max_chunks
+    transactions (the next pass carries on). Returns (puzzles, rows) removed.
+    """
+    puzzles = rows = chunks = 0
+    with db_connection() as conn:
+        tombstones = [r["id"] for r in conn.execute(
+            "SELECT id FROM puzzles WHERE deleted_at IS NOT NULL ORDER BY id"
+        )]
+        dependents = _puzzle_dependents(conn)
+        for puzzle_id in tombstones:
+            for table, key, where in dependents:
+                while True:
+                    if max_chunks is not None and chunks >= max_chunks:
+                        return puzzles, rows
+                    deleted = conn.execute(f"""
+                        DELETE FROM {table} WHERE {where} AND ({key}) IN (
+                            SELECT {key} FROM {table} WHERE {where} LIMIT ?
+                        )
+                    """, (puzzle_id, puzzle_id, chunk_size)).rowcount
+                    conn.commit()
+                    #an empty table costs no chunk, so even max_chunks=1
+                    #passes get through to the rows still left
+                    chunks += deleted > 0
+                    rows += deleted
+                    if deleted < chunk_size:
+                        break
+            _drop_puzzle_leaderboard(conn, puzzle_id)
+            conn.execute(
+                "DELETE FROM puzzles WHERE id = ? AND deleted_at IS NOT NULL",
+                (puzzle_id,)
+            )
+            conn.commit()
+            _rank_index.drop(puzzle_id, GLOBAL)
+            puzzles += 1
+    return puzzles, rows
+
+_reaper = None
+
+def start_puzzle_reaper(interval=PUZZLE_REAP_INTERVAL):
+    """Run reap_deleted_puzzles() every interval secs on a daemon thread (once)"""
+    global _reaper
+    if _reaper is not None and _reaper.is_alive():
+        return _reaper
+
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                reap_deleted_puzzles()
+            except sqlite3.Error as e:
+                print(f"puzzle reaper: {e}")
+
+    _reaper = threading.Thread(target=run, name="puzzle-reaper", daemon=True)
+    _reaper.start()
+    return _reaper
+
 
 #stat. track
 
-def submit_result(username, puzzle_id, score, time_taken):
-    """ Record 1 completion of a puzzle by usr """
-    conn = get_db_connection()
+def _insert_result(conn, username, puzzle_id, score, time_taken):
+    """
+    user_stats row + completed_puzzle activity + leaderboard and rollup rows
+    on conn (no commit). Returns the leaderboard updates for _apply_leaderboard()
+    """
     conn.execute("""
         INSERT INTO user_stats (username,puzzle_id,score,time_taken)
         VALUES (?,?,?,?)
     """, (username, puzzle_id, score, time_taken))
     
-    puzzle_name = get_db_connection().execute(
+    puzzle_name = conn.execute(
         "SELECT name FROM puzzles WHERE id=?", (puzzle_id,)
     ).fetchone()["name"]
     
-    details = json.dumps({
+    details = {
         "puzzle_id": puzzle_id,
         "puzzle_name": puzzle_name,
         "score": score,
         "time_taken": time_taken
-    })
-    
-    conn.execute("""
+    }
+    _insert_activity(conn, username, "completed_puzzle", puzzle_id, details)
+    upsert_rollup(conn, username, score, time_taken)
+
+    return [
+        (scope, username, _upsert_leaderboard(conn, scope, username, score, time_taken))
+        for scope in (puzzle_id, GLOBAL)
+    ]
+
+def _insert_activity(conn, user, activity_type, related_id=None, details=None):
+    """ activity feed row on conn (no commit); returns activity id """
+    cursor = conn.execute("""
         INSERT INTO activities (user, activity_type, related_id, details)
-        VALUES (?, 'completed_puzzle', ?, ?)
-    """, (username, puzzle_id, details))
-    
-    conn.commit()
-    conn.close()
+        VALUES (?, ?, ?, ?)
+    """, (user, activity_type, related_id,
+          json.dumps(details) if details is not None else None))
+    activity_id = cursor.lastrowid
+    _fan_out_activity(conn, user, activity_id)
+    return activity_id
+
+def _insert_message(conn, sender, receiver, content):
+    """ message row + unread counter bump on conn (no commit); returns message id """
+    cursor = conn.execute("""
+        INSERT INTO messages (sender, receiver, content)
+        VALUES (?, ?, ?)
+    """, (sender, receiver, content))
+    conn.execute("""
+        INSERT INTO unread_counters (receiver, sender, unread)
+        VALUES (?, ?, 1)
+        ON CONFLICT (receiver, sender) DO UPDATE SET unread = unread + 1
+    """, (receiver, sender))
+    return cursor.lastrowid
+
+def submit_result(username, puzzle_id, score, time_taken):
+    """ Record 1 completion of a puzzle by usr """
+    with db_connection() as conn:
+        updates = _insert_result(conn, username, puzzle_id, score, time_taken)
+        conn.commit()
+    _apply_leaderboard(updates)
 
 def get_stats(username):
     """
     Fetch all stats for a given user, most recent first
     return list of tuples: puzzle_name, score, time_taken, timestamp
     """
-    rows = get_db_connection().execute("""
-        SELECT p.name, s.score, s.time_taken, s.timestamp
-        FROM user_stats s
-        JOIN puzzles p ON s.puzzle_id = p.id
-        WHERE s.username = ?
-        ORDER BY s.timestamp DESC
-    """, (username,)).fetchall()
+    with db_connection() as conn:
+        rows = conn.execute("""
+            SELECT p.name, s.score, s.time_taken, s.timestamp
+            FROM user_stats s
+            JOIN puzzles p ON s.puzzle_id = p.id
+            WHERE s.username = ? AND p.deleted_at IS NULL
+            ORDER BY s.timestamp DESC
+        """, (username,)).fetchall()
 
     return [
         (r["name"], r["score"], r["time_taken"], r["timestamp"])
         for r in rows
     ]
 
+def get_stats_page(username, limit=50, cursor=None):
+    """
+    One page of get_stats tuples, most recent first
+    Returns (rows, next cursor or None)
+    """
+    ts, sid = decode_cursor(cursor, 2) if cursor else (_MAX_TS, _MAX_ID)
+    with db_connection() as conn:
+        rows = conn.execute("""
+            SELECT s.id, p.name, s.score, s.time_taken, s.timestamp
+            FROM user_stats s
+            JOIN puzzles p ON s.puzzle_id = p.id
+            WHERE s.username = ? AND p.deleted_at IS NULL
+              AND (s.timestamp, s.id) < (?, ?)
+            ORDER BY s.timestamp DESC, s.id DESC
+            LIMIT ?
+        """, (username, ts, sid, limit + 1)).fetchall()
+    rows, next_cursor = split_page(rows, limit, lambda r: (r["timestamp"], r["id"]))
+    return [
+        (r["name"], r["score"], r["time_taken"], r["timestamp"])
+        for r in rows
+    ], next_cursor
+
+def get_stat_summary(username):
+    """
+    Rollup for one player (single-row read): solves, average/best score and
+    time, last played and day streaks. None if they've never finished one
+    """
+    with db_connection() as conn:
+        r = conn.execute("""
+            SELECT *,
+                   CASE WHEN streak_day >= date('now', '-1 day')
+                        THEN streak_current ELSE 0 END AS streak_live
+            FROM user_stat_rollups
+            WHERE username = ?
+        """, (username,)).fetchone()
+    if not r:
+        return None
+    return {
+        "username": username,
+        "solves": r["solves"],
+        "average_score": r["total_score"] / r["scored"] if r["scored"] else None,
+        "best_score": r["best_score"],
+        "average_time": r["total_time"] / r["timed"] if r["timed"] else None,
+        "best_time": r["best_time"],
+        "last_played": r["last_played"],
+        "current_streak": r["streak_live"],
+        "longest_streak": r["streak_best"],
+    }
+
+def rebuild_stat_rollups():
+    """ recompute every player's rollup from user_stats; returns rows written """
+    with db_connection() as conn:
+        rebuild_rollups(conn)
+        conn.commit()
+        return conn.execute("SELECT COUNT(*) FROM user_stat_rollups").fetchone()[0]
+
 def rec_activity(limit=50):
     """
     This will return the most recent puzzle completion with username, description and timestamp tuples.
     """
-    conn = get_db_connection()
-    rows = conn.execute("""
-        SELECT s.username,
-               p.name      AS puzzle_name,
-               s.time_taken,
-               s.timestamp
-        FROM user_stats s
-        JOIN puzzles p ON s.puzzle_id = p.id
-        ORDER BY s.timestamp DESC
-        LIMIT ?
-    """, (limit,)).fetchall()
-    conn.close()
+    with db_connection() as conn:
+        rows = conn.execute("""
+            SELECT s.username,
+                   p.name      AS puzzle_name,
+                   s.time_taken,
+                   s.timestamp
+            FROM user_stats s
+            JOIN puzzles p ON s.puzzle_id = p.id
+            ORDER BY s.timestamp DESC
+            LIMIT ?
+        """, (limit,)).fetchall()
 
     activity = []
     for r in rows:
@@ -329,19 +1108,106 @@ def rec_activity(limit=50):
     return activity
 
 
+def rec_activity_page(limit=50, cursor=None):
+    """
+    One page of rec_activity tuples, most recent first
+    Returns (rows, next cursor or None)
+    """
+    ts, sid = decode_cursor(cursor, 2) if cursor else (_MAX_TS, _MAX_ID)
+    with db_connection() as conn:
+        rows = conn.execute("""
+            SELECT s.id,
+                   s.username,
+                   p.name      AS puzzle_name,
+                   s.time_taken,
+                   s.timestamp
+            FROM user_stats s
+            JOIN puzzles p ON s.puzzle_id = p.id
+            WHERE (s.timestamp, s.id) < (?, ?)
+            ORDER BY s.timestamp DESC, s.id DESC
+            LIMIT ?
+        """, (ts, sid, limit + 1)).fetchall()
+    rows, next_cursor = split_page(rows, limit, lambda r: (r["timestamp"], r["id"]))
+
+    activity = []
+    for r in rows:
+        mins = r["time_taken"] // 60
+        secs = r["time_taken"] % 60
+        desc = f'solved "{r["puzzle_name"]}" in {mins}m{secs}s'
+        activity.append((r["username"], desc, r["timestamp"]))
+
+    return activity, next_cursor
+
+#write-behind (group commit) for hot write paths
+
+_write_queue = None
+
+def get_write_queue():
+    """
+    Shared WriteBehindQueue; started on first use
+    """
+    global _write_queue
+    if _write_queue is None:
+        _write_queue = WriteBehindQueue(
+            get_db_connection,
+            ops={
+                "submit_result": _insert_result,
+                "activity":      _insert_activity,
+                "message":       _insert_message,
+            },
+            batch_size=WRITE_QUEUE_BATCH_SIZE,
+            max_delay=WRITE_QUEUE_MAX_DELAY,
+        ).start()
+        atexit.register(_write_queue.stop)
+    return _write_queue
+
+def queue_result(username, puzzle_id, score, time_taken):
+    """
+    Queue submit_result; returns a Future resolved once committed
+    """
+    future = get_write_queue().submit(
+        "submit_result", username, puzzle_id, score, time_taken)
+    future.add_done_callback(_apply_committed_result)
+    return future
+
+def _apply_committed_result(future):
+    if future.exception() is None:
+        _apply_leaderboard(future.result())
+
+def queue_activity(user, activity_type, related_id=None, details=None):
+    """
+    Queue an activity feed insert; Future resolves to the activity id
+    """
+    return get_write_queue().submit(
+        "activity", user, activity_type, related_id, details)
+
+def queue_message(sender, receiver, content):
+    """
+    Queue a message insert; Future resolves to the message id
+    """
+    return get_write_queue().submit("message", sender, receiver, content)
+
+def flush_writes(timeout=None):
+    """
+    Wait until every queued write so far is committed (False on timeout)
+    """
+    if _write_queue is None:
+        return True
+    return _write_queue.flush(timeout)
+
+
 #multiplayer functions
 
 def create_game_session(game_id, puzzle_id):
     """
     create a new multiplayer session in the DB
     """
-    conn = get_db_connection()
-    conn.execute(
-        "INSERT INTO game_sessions (game_id, puzzle_id, status) VALUES (?, ?, ?)",
-        (game_id, puzzle_id, "active")
-    )
-    conn.commit()
-    conn.close()
+    with db_connection() as conn:
+        conn.execute(
+            "INSERT INTO game_sessions (game_id, puzzle_id, status) VALUES (?, ?, ?)",
+            (game_id, puzzle_id, "active")
+        )
+        conn.commit()
 
 def add_player_to_game(game_id, username):
     """
@@ -355,19 +1221,20 @@ def add_player_to_game(game_id, username):
         )
         conn.commit()
     except sqlite3.IntegrityError:
-        pass
+        conn.rollback()
     finally:
         conn.close()
 
 def get_active_games():
-    rows = get_db_connection().execute("""
-        SELECT g.game_id, p.name, COUNT(gp.username) AS players
-        FROM game_sessions g
-        JOIN puzzles p ON g.puzzle_id = p.id
-        LEFT JOIN game_players gp ON g.game_id = gp.game_id
-        WHERE g.status = 'active'
-        GROUP BY g.game_id
-    """).fetchall()
+    with db_connection() as conn:
+        rows = conn.execute("""
+            SELECT g.game_id, p.name, COUNT(gp.username) AS players
+            FROM game_sessions g
+            JOIN puzzles p ON g.puzzle_id = p.id
+            LEFT JOIN game_players gp ON g.game_id = gp.game_id
+            WHERE g.status = 'active'
+            GROUP BY g.game_id
+        """).fetchall()
 
     return [
         (r["game_id"], r["name"], r["players"])
@@ -378,13 +1245,12 @@ def update_game_status(game_id, status):
     """
     Change a game's status field (such as 'completed')
     """
-    conn = get_db_connection()
-    conn.execute(
-        "UPDATE game_sessions SET status = ? WHERE game_id = ?",
-        (status, game_id)
-    )
-    conn.commit()
-    conn.close()
+    with db_connection() as conn:
+        conn.execute(
+            "UPDATE game_sessions SET status = ? WHERE game_id = ?",
+            (status, game_id)
+        )
+        conn.commit()
 
 #社交功能
 
@@ -411,17 +1277,15 @@ def send_friend_request(from_user, to_user):
         """, (from_user, to_user))
         
         # Record this as an activity
-        details = json.dumps({"to_user": to_user})
-        conn.execute("""
-            INSERT INTO activities (user, activity_type, details)
-            VALUES (?, 'friend_request', ?)
-        """, (from_user, details))
+        _insert_activity(conn, from_user, "friend_request",
+                         details={"to_user": to_user})
         
         conn.commit()
         conn.close()
         return True
     except Exception as e:
         print(f"Error sending friend request: {e}")
+        conn.rollback()
         conn.close()
         return False
 
@@ -429,42 +1293,38 @@ def accept_friend_request(from_user, to_user):
     """
     Accept a friend request, updating status to "accepted" 
     """
-    conn = get_db_connection()
-    result = conn.execute("""
-        UPDATE friends 
-        SET status='accepted' 
-        WHERE user1=? AND user2=? AND status='pending'
-    """, (from_user, to_user)).rowcount
+    with db_connection() as conn:
+        result = conn.execute("""
+            UPDATE friends 
+            SET status='accepted' 
+            WHERE user1=? AND user2=? AND status='pending'
+        """, (from_user, to_user)).rowcount
     
-    if result > 0:
-        # Record this as an activity for both users
-        details_from = json.dumps({"friend": to_user})
-        details_to = json.dumps({"friend": from_user})
-        
-        conn.execute("""
-            INSERT INTO activities (user, activity_type, details)
-            VALUES (?, 'new_friend', ?)
-        """, (from_user, details_from))
-        
-        conn.execute("""
-            INSERT INTO activities (user, activity_type, details)
-            VALUES (?, 'new_friend', ?)
-        """, (to_user, details_to))
+        if result > 0:
+            #new friends see each other's recent history in their feeds
+            _seed_inbox(conn, from_user, to_user, FEED_BACKFILL_PER_USER)
+            _seed_inbox(conn, to_user, from_user, FEED_BACKFILL_PER_USER)
+
+            # Record this as an activity for both users
+            _insert_activity(conn, from_user, "new_friend",
+                             details={"friend": to_user})
+            _insert_activity(conn, to_user, "new_friend",
+                             details={"friend": from_user})
     
-    conn.commit()
-    conn.close()
+        conn.commit()
     return result > 0
 
 def get_friend_requests(username):
     """
     Get pending friend requests sent to the user
     """
-    rows = get_db_connection().execute("""
-        SELECT user1, created_at 
-        FROM friends 
-        WHERE user2=? AND status='pending'
-        ORDER BY created_at DESC
-    """, (username,)).fetchall()
+    with db_connection() as conn:
+        rows = conn.execute("""
+            SELECT user1, created_at 
+            FROM friends 
+            WHERE user2=? AND status='pending'
+            ORDER BY created_at DESC
+        """, (username,)).fetchall()
     
     return [(r["user1"], r["created_at"]) for r in rows]
 
@@ -472,15 +1332,16 @@ def get_friends(username):
     """
     Get all accepted friends for a user
     """
-    rows = get_db_connection().execute("""
-        SELECT 
-            CASE 
-                WHEN user1=? THEN user2 
-                ELSE user1 
-            END as friend
-        FROM friends 
-        WHERE (user1=? OR user2=?) AND status='accepted'
-    """, (username, username, username)).fetchall()
+    with db_connection() as conn:
+        rows = conn.execute("""
+            SELECT 
+                CASE 
+                    WHEN user1=? THEN user2 
+                    ELSE user1 
+                END as friend
+            FROM friends 
+            WHERE (user1=? OR user2=?) AND status='accepted'
+        """, (username, username, username)).fetchall()
     
     return [r["friend"] for r in rows]
 
@@ -488,121 +1349,339 @@ def send_message(sender, receiver, content):
     """
     Send a message, returns the message ID
     """
-    conn = get_db_connection()
-    cursor = conn.execute("""
-        INSERT INTO messages (sender, receiver, content)
-        VALUES (?, ?, ?)
-    """, (sender, receiver, content))
-    message_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
+    with db_connection() as conn:
+        message_id = _insert_message(conn, sender, receiver, content)
+        conn.commit()
     return message_id
 
-def get_messages(user1, user2, limit=50):
+def _message_rows(conn, user1, user2, limit, since_id=None, before_id=None):
     """
-    Get recent messages between two users
+    Up to limit messages between two users with since_id < id < before_id,
+    newest first. With since_id the oldest ones after it are taken, so
+    repeated calls walk forward without gaps.
+    Each direction is an index range scan (idx_messages_pair_id)
+    Paging back (before_id) past the oldest live message, the rest come
+    from the archive, which only holds older messages
     """
-    rows = get_db_connection().execute("""
-        SELECT id, sender, receiver, content, read, timestamp
-        FROM messages
-        WHERE (sender=? AND receiver=?) OR (sender=? AND receiver=?)
-        ORDER BY timestamp DESC
-        LIMIT ?
-    """, (user1, user2, user2, user1, limit)).fetchall()
-    
-    return [{
+    low = since_id if since_id is not None else 0
+    high = before_id if before_id is not None else _MAX_ID
+    order = "ASC" if since_id is not None else "DESC"
+
+    def query(schema):
+        return conn.execute(f"""
+            SELECT * FROM (
+                SELECT id, sender, receiver, content, read, timestamp
+                FROM {schema}.messages
+                WHERE sender=? AND receiver=? AND id > ? AND id < ?
+                ORDER BY id {order} LIMIT ?
+            )
+            UNION ALL
+            SELECT * FROM (
+                SELECT id, sender, receiver, content, read, timestamp
+                FROM {schema}.messages
+                WHERE sender=? AND receiver=? AND id > ? AND id < ?
+                ORDER BY id {order} LIMIT ?
+            )
+            ORDER BY id {order}
+            LIMIT ?
+        """, (user1, user2, low, high, limit,
+              user2, user1, low, high, limit,
+              limit)).fetchall()
+
+    rows = query("main")
+    if since_id is not None:
+        rows.reverse()
+    elif (len(rows) < limit and before_id is not None
+          and _archive_has(conn, "messages")):
+        if rows:
+            high = rows[-1]["id"]
+        _with_archive(conn)
+        rows += query(archive.SCHEMA)[:limit - len(rows)]
+    return rows
+
+def _message_dict(r):
+    return {
         "id": r["id"],
         "sender": r["sender"],
         "receiver": r["receiver"],
         "content": r["content"],
         "read": bool(r["read"]),
         "timestamp": r["timestamp"]
-    } for r in rows]
+    }
+
+def get_messages(user1, user2, limit=50, since_id=None, before_id=None):
+    """
+    Get recent messages between two users, newest first
+    since_id: only messages newer than this id (sync after a push)
+    before_id: only messages older than this id (page back through history)
+    """
+    with db_connection() as conn:
+        rows = _message_rows(conn, user1, user2, limit, since_id, before_id)
+    return [_message_dict(r) for r in rows]
+
+def get_messages_page(user1, user2, limit=50, cursor=None):
+    """
+    One page of messages between two users, newest first (by id)
+    The first page is live rows only; if those run out with messages in the
+    archive, its cursor carries on from there
+    Returns (messages, next cursor or None)
+    """
+    before_id, = decode_cursor(cursor, 1) if cursor else (None,)
+    with db_connection() as conn:
+        rows = _message_rows(conn, user1, user2, limit + 1, before_id=before_id)
+        rows, next_cursor = split_page(rows, limit, lambda r: (r["id"],))
+        if next_cursor is None and cursor is None and _archive_has(conn, "messages"):
+            next_cursor = encode_cursor(rows[-1]["id"] if rows else _MAX_ID)
+    return [_message_dict(r) for r in rows], next_cursor
 
 def mark_messages_as_read(receiver, sender):
     """
     Mark all messages from a specific sender as read
+    Returns how many were unread
     """
-    conn = get_db_connection()
-    conn.execute("""
-        UPDATE messages
-        SET read=1
-        WHERE sender=? AND receiver=? AND read=0
-    """, (sender, receiver))
-    conn.commit()
-    conn.close()
+    with db_connection() as conn:
+        marked = 0
+        schemas = ["main"]
+        if _archive_has(conn, "messages"):
+            _with_archive(conn)
+            schemas.append(archive.SCHEMA)
+        for schema in schemas:
+            marked += conn.execute(f"""
+                UPDATE {schema}.messages
+                SET read=1
+                WHERE sender=? AND receiver=? AND read=0
+            """, (sender, receiver)).rowcount
+        conn.execute(
+            "DELETE FROM unread_counters WHERE receiver=? AND sender=?",
+            (receiver, sender)
+        )
+        conn.commit()
+    return marked
 
 def get_unread_message_count(username):
     """
     Get the count of unread messages for a user
+    (sums the maintained per-sender counters, no scan of messages)
     """
-    row = get_db_connection().execute("""
-        SELECT COUNT(*) as count
-        FROM messages
-        WHERE receiver=? AND read=0
-    """, (username,)).fetchone()
+    with db_connection() as conn:
+        row = conn.execute("""
+            SELECT COALESCE(SUM(unread), 0) as count
+            FROM unread_counters
+            WHERE receiver=?
+        """, (username,)).fetchone()
     
     return row["count"] if row else 0
 
+def get_unread_breakdown(username):
+    """
+    Unread messages per conversation: {sender: count}
+    """
+    with db_connection() as conn:
+        rows = conn.execute("""
+            SELECT sender, unread
+            FROM unread_counters
+            WHERE receiver=?
+        """, (username,)).fetchall()
+    return {r["sender"]: r["unread"] for r in rows}
+
 def reject_friend_request(from_user, to_user):
     """
     Reject a friend request, deleting it from the database
     """
-    conn = get_db_connection()
-    result = conn.execute("""
-        DELETE FROM friends 
-        WHERE user1=? AND user2=? AND status='pending'
-    """, (from_user, to_user)).rowcount
-    conn.commit()
-    conn.close()
+    with db_connection() as conn:
+        result = conn.execute("""
+            DELETE FROM friends 
+            WHERE user1=? AND user2=? AND status='pending'
+        """, (from_user, to_user)).rowcount
+        conn.commit()
     return result > 0
 
 # Activity feed functions
+#
+# Fan-out on write: every activity is copied (as a pointer) into each
+# friend's feed_inbox row set when it is written, so reading a feed is one
+# index range scan instead of an IN (...) over every friend + big sort.
+# Users with more than FEED_FANOUT_LIMIT friends are flagged in
+# feed_pull_users and skipped at write time; their activities are pulled
+# and merged at read time instead (hybrid).
+
+#SQL: accepted friends of ? (both directions), index-backed on each side
+_FRIENDS_OF = """
+    SELECT user2 AS friend FROM friends WHERE user1=? AND status='accepted'
+    UNION
+    SELECT user1 AS friend FROM friends WHERE user2=? AND status='accepted'
+"""
+
+def _fan_out_activity(conn, user, activity_id):
+    """ push activity_id into each friend's inbox (no commit) """
+    if conn.execute("SELECT 1 FROM feed_pull_users WHERE user=?", (user,)).fetchone():
+        return
+    friend_count = conn.execute(
+        f"SELECT COUNT(*) FROM ({_FRIENDS_OF})", (user, user)
+    ).fetchone()[0]
+    if friend_count > FEED_FANOUT_LIMIT:
+        #too many inboxes to write; readers pull this user's activities
+        conn.execute("INSERT OR IGNORE INTO feed_pull_users (user) VALUES (?)", (user,))
+        return
+    conn.execute(f"""
+        INSERT OR IGNORE INTO feed_inbox (owner, timestamp, activity_id)
+        SELECT f.friend, a.timestamp, a.id
+        FROM activities a, ({_FRIENDS_OF}) f
+        WHERE a.id = ?
+    """, (user, user, activity_id))
+
+def _seed_inbox(conn, owner, friend, limit):
+    """ copy friend's latest activities into owner's inbox (no commit) """
+    conn.execute("""
+        INSERT OR IGNORE INTO feed_inbox (owner, timestamp, activity_id)
+        SELECT ?, timestamp, id
+        FROM activities
+        WHERE user = ? AND user NOT IN (SELECT user FROM feed_pull_users)
+        ORDER BY timestamp DESC, id DESC
+        LIMIT ?
+    """, (owner, friend, limit))
+
+def _activity_dict(row):
+    return {
+        "id": row["id"],
+        "user": row["user"],
+        "activity_type": row["activity_type"],
+        "related_id": row["related_id"],
+        "details": json.loads(row["details"]) if row["details"] else {},
+        "timestamp": row["timestamp"]
+    }
 
 def get_friend_activities(username, limit=20):
     """
     Get recent activities from a user's friends
     Returns a list of activity records ordered by time (newest first)
     """
-    conn = get_db_connection()
-    
-    # First get the user's friends
-    friends = get_friends(username)
-    
-    if not friends:
-        return []
-    
-    # Build a query with placeholders for all friends
-    placeholders = ','.join(['?'] * len(friends))
-    
-    # Get activities from these friends
-    query = f"""
-        SELECT a.id, a.user, a.activity_type, a.related_id, a.details, a.timestamp
-        FROM activities a
-        WHERE a.user IN ({placeholders})
-        ORDER BY a.timestamp DESC
-        LIMIT ?
+    return get_friend_activities_page(username, limit)[0]
+
+def get_friend_activities_page(username, limit=20, cursor=None):
     """
-    
-    # Add the limit parameter to the friends list
-    params = friends + [limit]
-    
-    rows = conn.execute(query, params).fetchall()
-    
-    activities = []
-    for row in rows:
-        activity = {
-            "id": row["id"],
-            "user": row["user"],
-            "activity_type": row["activity_type"],
-            "related_id": row["related_id"],
-            "details": json.loads(row["details"]) if row["details"] else {},
-            "timestamp": row["timestamp"]
+    One page of friend activities, newest first: inbox rows merged with
+    activities pulled from high-fanout friends. Paging on (cursor) past the
+    live ones, archived activities follow (everything archived is older);
+    a first page that runs out hands back a cursor into them instead.
+    Returns (activities, next cursor or None)
+    """
+    ts, aid = decode_cursor(cursor, 2) if cursor else (_MAX_TS, _MAX_ID)
+    with db_connection() as conn:
+        rows = conn.execute("""
+            SELECT a.id, a.user, a.activity_type, a.related_id, a.details, a.timestamp
+            FROM feed_inbox f
+            JOIN activities a ON a.id = f.activity_id
+            WHERE f.owner = ? AND (f.timestamp, f.activity_id) < (?, ?)
+            ORDER BY f.timestamp DESC, f.activity_id DESC
+            LIMIT ?
+        """, (username, ts, aid, limit + 1)).fetchall()
+
+        pulled = conn.execute(f"""
+            SELECT a.id, a.user, a.activity_type, a.related_id, a.details, a.timestamp
+            FROM activities a
+            WHERE a.user IN (
+                SELECT friend FROM ({_FRIENDS_OF})
+                WHERE friend IN (SELECT user FROM feed_pull_users)
+            )
+            AND (a.timestamp, a.id) < (?, ?)
+            ORDER BY a.timestamp DESC, a.id DESC
+            LIMIT ?
+        """, (username, username, ts, aid, limit + 1)).fetchall()
+
+    if pulled:
+        #dedupe (pre-flag activities may also sit in the inbox) and re-sort
+        merged = {r["id"]: r for r in rows}
+        merged.update((r["id"], r) for r in pulled)
+        rows = sorted(merged.values(),
+                      key=lambda r: (r["timestamp"], r["id"]), reverse=True)
+
+    if len(rows) <= limit:
+        with db_connection() as conn:
+            if rows:
+                ts, aid = rows[-1]["timestamp"], rows[-1]["id"]
+            if _archive_has(conn, "activities"):
+                if cursor is None:
+                    #first page is live only; its cursor leads into the archive
+                    return [_activity_dict(r) for r in rows], encode_cursor(ts, aid)
+                rows += _with_archive(conn).execute(f"""
+                    SELECT a.id, a.user, a.activity_type, a.related_id, a.details, a.timestamp
+                    FROM {archive.SCHEMA}.activities a
+                    WHERE a.user IN (SELECT friend FROM ({_FRIENDS_OF}))
+                    AND (a.timestamp, a.id) < (?, ?)
+                    ORDER BY a.timestamp DESC, a.id DESC
+                    LIMIT ?
+                """, (username, username, ts, aid, limit + 1 - len(rows))).fetchall()
+    rows, next_cursor = split_page(rows, limit, lambda r: (r["timestamp"], r["id"]))
+
+    return [_activity_dict(r) for r in rows], next_cursor
+
+def get_bootstrap(username, puzzle_limit=BOOTSTRAP_PUZZLES, feed_limit=BOOTSTRAP_FEED):
+    """
+    Everything the main menu needs after login, on one pooled connection:
+    active games, first page of puzzles, stat summary, friends, pending
+    friend requests, unread counts and the top of the friend feed
+    """
+    with pinned_connection():
+        puzzles, puzzles_cursor = get_puzzles_page(puzzle_limit)
+        feed, feed_cursor = get_friend_activities_page(username, feed_limit)
+        unread = get_unread_breakdown(username)
+        return {
+            "active_games": [
+                {"game_id": game_id, "name": name, "players": players}
+                for game_id, name, players in get_active_games()
+            ],
+            "puzzles": [{"id": pid, "name": name} for pid, name in puzzles],
+            "puzzles_cursor": puzzles_cursor,
+            "stats_summary": get_stat_summary(username),
+            "friends": get_friends(username),
+            "friend_requests": get_friend_requests(username),
+            "unread": {"count": sum(unread.values()), "by_sender": unread},
+            "feed": feed,
+            "feed_cursor": feed_cursor,
         }
-        activities.append(activity)
-    
-    conn.close()
-    return activities
+
+def backfill_feed_inboxes(per_user_limit=FEED_BACKFILL_PER_USER, batch_size=500):
+    """
+    Build inboxes for activities written before the feed existed.
+    Flags high-fanout users first, then seeds every user's inbox with their
+    friends' latest per_user_limit activities; commits every batch_size users.
+    Safe to re-run (INSERT OR IGNORE). Returns (users, inbox rows added).
+    """
+    users = inserted = 0
+    with db_connection() as conn:
+        conn.execute(f"""
+            INSERT OR IGNORE INTO feed_pull_users (user)
+            SELECT u.username FROM users u
+            WHERE (SELECT COUNT(*) FROM friends
+                   WHERE (user1 = u.username OR user2 = u.username)
+                     AND status = 'accepted') > ?
+        """, (FEED_FANOUT_LIMIT,))
+        conn.commit()
+
+        last = ""
+        while True:
+            batch = [r["username"] for r in conn.execute(
+                "SELECT username FROM users WHERE username > ? ORDER BY username LIMIT ?",
+                (last, batch_size))]
+            if not batch:
+                break
+            for owner in batch:
+                before = conn.total_changes
+                conn.execute(f"""
+                    INSERT OR IGNORE INTO feed_inbox (owner, timestamp, activity_id)
+                    SELECT ?, a.timestamp, a.id
+                    FROM activities a
+                    WHERE a.user IN (SELECT friend FROM ({_FRIENDS_OF}))
+                      AND a.user NOT IN (SELECT user FROM feed_pull_users)
+                    ORDER BY a.timestamp DESC, a.id DESC
+                    LIMIT ?
+                """, (owner, owner, owner, per_user_limit))
+                inserted += conn.total_changes - before
+            conn.commit()
+            users += len(batch)
+            last = batch[-1]
+    return users, inserted
 
 def format_activity_message(activity):
     """
@@ -632,72 +1711,311 @@ def format_activity_message(activity):
 
 
 
+#retention
+# Messages older than MESSAGE_RETENTION_DAYS and activities older than
+# ACTIVITY_RETENTION_DAYS move to the attached archive db in bounded batches
+# (app/model/archive.py); page-back reads above fall through to it.
+
+_archive_totals = {"runs": 0, "messages": 0, "activities": 0, "seconds": 0.0,
+                   "last_run": None}
+_archive_lock = native.lock()
+
+def archive_expired(message_days=MESSAGE_RETENTION_DAYS,
+                    activity_days=ACTIVITY_RETENTION_DAYS,
+                    batch_size=ARCHIVE_BATCH_SIZE, max_batches=None):
+    """
+    Move expired rows to the archive, batch_size rows per transaction so
+    writers never wait long. Stops early after max_batches transactions
+    (the next pass carries on). days=None keeps that table forever.
+    Returns {"messages": moved, "activities": moved, "seconds": elapsed}
+    """
+    start = time.perf_counter()
+    moved = {"messages": 0, "activities": 0}
+    batches = 0
+    with db_connection() as conn:
+        _with_archive(conn)
+        for table, days in (("messages", message_days), ("activities", activity_days)):
+            if days is None:
+                continue
+            cutoff = conn.execute(
+                "SELECT datetime('now', ?)", (f"-{days} days",)
+            ).fetchone()[0]
+            while max_batches is None or batches < max_batches:
+                count = archive.move_batch(conn, table, cutoff, batch_size)
+                batches += 1
+                moved[table] += count
+                if count:
+                    _archived[table] = True
+                if count < batch_size:
+                    break
+    report = dict(moved, seconds=round(time.perf_counter() - start, 3))
+
+    with _archive_lock:
+        _archive_totals["runs"] += 1
+        _archive_totals["messages"] += moved["messages"]
+        _archive_totals["activities"] += moved["activities"]
+        _archive_totals["seconds"] += report["seconds"]
+        _archive_totals["last_run"] = report
+    return report
+
+def archive_stats():
+    """ totals across archive_expired() runs in this process + the last run """
+    with _archive_lock:
+        return dict(_archive_totals)
+
+_archiver = None
+
+def start_archiver(interval=ARCHIVE_INTERVAL):
+    """Run archive_expired() every interval secs on a daemon thread (once)"""
+    global _archiver
+    if _archiver is not None and _archiver.is_alive():
+        return _archiver
+
+    def run():
+        while True:
+            time.sleep(interval)
+            try:
+                report = archive_expired()
+                if report["messages"] or report["activities"]:
+                    print(f"archiver: {report}")
+            except sqlite3.Error as e:
+                print(f"archiver: {e}")
+
+    _archiver = threading.Thread(target=run, name="archiver", daemon=True)
+    _archiver.start()
+    return _archiver
+
+
 #functions for ratings
 def rate_puzzle(puzzle_id, username, rating, comment=""):
-    """Rate a puzzle from 1-5 stars with optional comment."""
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    
-    #check usr has already rated this puzzle
-    c.execute('''SELECT id FROM puzzle_ratings 
-                 WHERE puzzle_id = ? AND username = ?''', 
-              (puzzle_id, username))
-    existing = c.fetchone()
+    """Rate a puzzle from 1-5 stars with optional comment.
+    puzzle_rating_summary (count/sum/avg) is updated in the same transaction."""
+    with db_connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            #check usr has already rated this puzzle
+            existing = conn.execute('''SELECT rating FROM puzzle_ratings 
+                                        WHERE puzzle_id = ? AND username = ?''', 
+                                    (puzzle_id, username)).fetchone()
     
-    if existing:
-        # Update existing rating
-        c.execute('''UPDATE puzzle_ratings 
-                     SET rating = ?, comment = ?, timestamp = CURRENT_TIMESTAMP 
-                     WHERE puzzle_id = ? AND username = ?''', 
-                  (rating, comment, puzzle_id, username))
-    else:
-        # Insert new rating
-        c.execute('''INSERT INTO puzzle_ratings 
-                     (puzzle_id, username, rating, comment)
-                     VALUES (?, ?, ?, ?)''', 
-                  (puzzle_id, username, rating, comment))
-    
-    conn.commit()
-    conn.close()
+            if existing:
+                # Update existing rating
+                conn.execute('''UPDATE puzzle_ratings 
+                                SET rating = ?, comment = ?, timestamp = CURRENT_TIMESTAMP 
+                                WHERE puzzle_id = ? AND username = ?''', 
+                             (rating, comment, puzzle_id, username))
+                count_delta, sum_delta = 0, rating - existing["rating"]
+            else:
+                # Insert new rating
+                conn.execute('''INSERT INTO puzzle_ratings 
+                                (puzzle_id, username, rating, comment)
+                                VALUES (?, ?, ?, ?)''', 
+                             (puzzle_id, username, rating, comment))
+                count_delta, sum_delta = 1, rating
+
+            #maintained aggregates
+            conn.execute('''INSERT INTO puzzle_rating_summary
+                            (puzzle_id, rating_count, rating_sum)
+                            VALUES (?, ?, ?)
+                            ON CONFLICT(puzzle_id) DO UPDATE SET
+                                rating_count = rating_count + excluded.rating_count,
+                                rating_sum   = rating_sum + excluded.rating_sum''',
+                         (puzzle_id, count_delta, sum_delta))
+            conn.execute('''UPDATE puzzle_rating_summary
+                            SET rating_avg = CAST(rating_sum AS REAL) / rating_count
+                            WHERE puzzle_id = ? AND rating_count > 0''',
+                         (puzzle_id,))
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
     return True
 
-def get_puzzle_ratings(puzzle_id):
-    """ratings for puzzle"""
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    
-    c.execute('''SELECT username, rating, comment, timestamp 
-                 FROM puzzle_ratings 
-                 WHERE puzzle_id = ?
-                 ORDER BY timestamp DESC''', 
-              (puzzle_id,))
-    ratings = c.fetchall()
-    
-    #ave. rating
-    c.execute('''SELECT AVG(rating) FROM puzzle_ratings 
-                 WHERE puzzle_id = ?''', 
-              (puzzle_id,))
-    avg_rating = c.fetchone()[0]
-    
-    conn.close()
+def get_rating_summary(puzzle_id):
+    """count + average rating from the maintained aggregate (single row read)"""
+    with db_connection() as conn:
+        row = conn.execute('''SELECT rating_count, rating_avg
+                               FROM puzzle_rating_summary
+                               WHERE puzzle_id = ?''', 
+                            (puzzle_id,)).fetchone()
+    if not row:
+        return {"count": 0, "average": 0}
+    return {"count": row["rating_count"], "average": row["rating_avg"]}
+
+def get_top_rated_puzzles(limit=10, min_ratings=1):
+    """
+    Highest average rated puzzles (ties: more ratings first)
+    Walks idx_rating_summary_top, no scan of puzzle_ratings
+    """
+    with db_connection() as conn:
+        rows = conn.execute('''SELECT s.puzzle_id, p.name, s.rating_avg, s.rating_count
+                                FROM puzzle_rating_summary s
+                                JOIN puzzles p ON p.id = s.puzzle_id
+                                WHERE s.rating_count >= ? AND p.deleted_at IS NULL
+                                ORDER BY s.rating_avg DESC, s.rating_count DESC
+                                LIMIT ?''', 
+                             (min_ratings, limit)).fetchall()
+    return [{
+        "id": r["puzzle_id"],
+        "name": r["name"],
+        "average": r["rating_avg"],
+        "count": r["rating_count"]
+    } for r in rows]
+
+def get_puzzle_reviews_page(puzzle_id, limit=50, cursor=None):
+    """
+    One page of (username, rating, comment, timestamp) reviews, newest first
+    Returns (reviews, next cursor or None)
+    """
+    ts, rid = decode_cursor(cursor, 2) if cursor else (_MAX_TS, _MAX_ID)
+    with db_connection() as conn:
+        rows = conn.execute('''SELECT id, username, rating, comment, timestamp 
+                                FROM puzzle_ratings 
+                                WHERE puzzle_id = ? AND (timestamp, id) < (?, ?)
+                                ORDER BY timestamp DESC, id DESC
+                                LIMIT ?''', 
+                             (puzzle_id, ts, rid, limit + 1)).fetchall()
+    rows, next_cursor = split_page(rows, limit, lambda r: (r["timestamp"], r["id"]))
+    return [
+        (r["username"], r["rating"], r["comment"], r["timestamp"]) for r in rows
+    ], next_cursor
+
+def get_puzzle_ratings(puzzle_id, limit=50):
+    """ratings for puzzle: summary + the newest page of reviews"""
+    ratings, _ = get_puzzle_ratings_page(puzzle_id, limit)
+    return ratings
+
+def get_puzzle_ratings_page(puzzle_id, limit=50, cursor=None):
+    """
+    ratings for puzzle: summary + first (or cursor) page of reviews
+    Returns (ratings, next cursor or None)
+    """
+    ratings, next_cursor = get_puzzle_reviews_page(puzzle_id, limit, cursor)
+    summary = get_rating_summary(puzzle_id)
     
     return {
         "ratings": ratings,
-        "average": avg_rating or 0,
-        "count": len(ratings)
+        "average": summary["average"] or 0,
+        "count": summary["count"],
+    }, next_cursor
+
+
+#leaderboards
+# `leaderboard` holds one summary row per (puzzle, player) plus a global row
+# per player (scope 0), upserted by every result; top-K reads walk its
+# indexes and rank lookups go through the in-memory RankIndex.
+
+_LEADERBOARD_COLUMNS = "username, best_score, best_time, solves"
+
+def _entry(row):
+    return {
+        "best_score": row["best_score"],
+        "best_time": row["best_time"],
+        "solves": row["solves"],
     }
 
+def _upsert_leaderboard(conn, scope, username, score, time_taken):
+    """ fold one result into a summary row (no commit); returns the new row """
+    conn.execute("""
+        INSERT INTO leaderboard (scope, username, best_score, best_time, solves)
+        VALUES (?, ?, ?, ?, 1)
+        ON CONFLICT (scope, username) DO UPDATE SET
+            best_score = CASE WHEN best_score >= excluded.best_score
+                              OR excluded.best_score IS NULL
+                         THEN best_score ELSE excluded.best_score END,
+            best_time = CASE WHEN best_time <= excluded.best_time
+                             OR excluded.best_time IS NULL
+                        THEN best_time ELSE excluded.best_time END,
+            solves = solves + 1
+    """, (scope, username, score, time_taken))
+    return _entry(conn.execute(f"""
+        SELECT {_LEADERBOARD_COLUMNS} FROM leaderboard
+        WHERE scope = ? AND username = ?
+    """, (scope, username)).fetchone())
+
+def _drop_puzzle_leaderboard(conn, puzzle_id):
+    """
+    Remove a deleted puzzle's board and recompute its players' global rows
+    and stats rollups from their remaining results (no commit; run once the
+    puzzle is tombstoned or its user_stats rows are gone)
+    """
+    players = [r["username"] for r in conn.execute(
+        "SELECT username FROM leaderboard WHERE scope = ?", (puzzle_id,)
+    )]
+    conn.execute("DELETE FROM leaderboard WHERE scope = ?", (puzzle_id,))
+    for i in range(0, len(players), 500):
+        chunk = players[i:i + 500]
+        marks = ",".join("?" * len(chunk))
+        conn.execute(
+            f"DELETE FROM leaderboard WHERE scope = 0 AND username IN ({marks})", chunk
+        )
+        conn.execute(f"""
+            INSERT INTO leaderboard (scope, username, best_score, best_time, solves)
+            SELECT 0, username, MAX(score), MIN(time_taken), COUNT(*)
+            FROM user_stats
+            WHERE username IN ({marks}) AND puzzle_id NOT IN (
+                SELECT id FROM puzzles WHERE deleted_at IS NOT NULL)
+            GROUP BY username
+        """, chunk)
+    rebuild_rollups(conn, players)
+
+def _load_leaderboard_scope(scope):
+    with db_connection() as conn:
+        rows = conn.execute(
+            f"SELECT {_LEADERBOARD_COLUMNS} FROM leaderboard WHERE scope = ?",
+            (scope,)
+        ).fetchall()
+    return {r["username"]: _entry(r) for r in rows}
+
+_rank_index = RankIndex(_load_leaderboard_scope)
+
+def _apply_leaderboard(updates):
+    """ feed committed summary rows to the rank index """
+    for scope, username, entry in updates or ():
+        _rank_index.apply(scope, username, entry)
+
+def get_leaderboard(puzzle_id=None, metric="score", limit=10):
+    """
+    Top limit players for one puzzle (or overall when puzzle_id is None)
+    metric: "score" (best score), "time" (fastest time) or "solves"
+    """
+    column, order, _ = METRICS[metric]
+    with db_connection() as conn:
+        rows = conn.execute(f"""
+            SELECT {_LEADERBOARD_COLUMNS} FROM leaderboard
+            WHERE scope = ? AND {column} IS NOT NULL
+            ORDER BY {order}
+            LIMIT ?
+        """, (puzzle_id or GLOBAL, limit)).fetchall()
+
+    board, rank, previous = [], 0, None
+    key = METRICS[metric][2]
+    for position, r in enumerate(rows, start=1):
+        entry = _entry(r)
+        if key(entry) != previous:                 #ties share a rank
+            rank, previous = position, key(entry)
+        board.append(dict(entry, username=r["username"], rank=rank))
+    return board
+
+def get_leaderboard_rank(username, puzzle_id=None, metric="score"):
+    """
+    username's position on a board: {"rank", "of"} or None if not ranked
+    (O(log n) via the rank index)
+    """
+    found = _rank_index.rank(puzzle_id or GLOBAL, username, metric)
+    if found is None:
+        return None
+    rank, total = found
+    return {"rank": rank, "of": total}
 
 def get_last_inserted_puzzle_id():
     """
     ID of the most recent puzzle in db"""
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    
-    c.execute("SELECT id FROM puzzles ORDER BY id DESC LIMIT 1")
-    result = c.fetchone()
+    with db_connection() as conn:
+        c = conn.cursor()
     
-    conn.close()
+        c.execute("SELECT id FROM puzzles ORDER BY id DESC LIMIT 1")
+        result = c.fetchone()
     
     return result[0] if result else None
 
@@ -0,0 +1,104 @@
+#/app/model/leaderboard.py
+
+"""
+In-memory rank index over the `leaderboard` summary table
+
+The table (maintained by db._insert_result) answers top-K straight off its
+indexes; "what's my position" would need a COUNT(*) over everyone ahead of
+you, so ranks come from here instead: one sorted key list per
+(scope, metric), loaded from the table the first time a scope is asked for,
+then kept current from the rows each submit writes.
+Rank lookups are a bisect, O(log n).
+
+scope is a puzzle id, or 0 for the global board.
+"""
+
+from bisect import bisect_left, insort
+
+from app.model import native
+
+GLOBAL = 0
+
+#metric -> (column that must be set, ORDER BY for top-K, python sort key)
+METRICS = {
+    "score":  ("best_score", "best_score DESC, best_time, username",
+               lambda e: (-e["best_score"], e["best_time"] if e["best_time"] is not None
+                          else float("inf"))),
+    "time":   ("best_time", "best_time, best_score DESC, username",
+               lambda e: (e["best_time"], -(e["best_score"] or 0))),
+    "solves": ("solves", "solves DESC, username",
+               lambda e: (-e["solves"],)),
+}
+
+
+def merge(old, new):
+    """Entries only ever improve, so applying updates in any order is safe"""
+    if old is None:
+        return dict(new)
+
+    def best(a, b, pick):
+        if a is None or b is None:
+            return b if a is None else a
+        return pick(a, b)
+
+    return {
+        "best_score": best(old["best_score"], new["best_score"], max),
+        "best_time": best(old["best_time"], new["best_time"], min),
+        "solves": max(old["solves"], new["solves"]),
+    }
+
+
+class RankIndex:
+
+    def __init__(self, loader):
+        """loader(scope) -> {username: entry} read from the summary table"""
+        self._loader = loader
+        self._scopes = {}            #scope -> (entries, {metric: sorted keys})
+        self._lock = native.lock()
+
+    def _load(self, scope):
+        loaded = self._scopes.get(scope)
+        if loaded is None:
+            entries = self._loader(scope)
+            keys = {}
+            for metric, (column, _, key) in METRICS.items():
+                keys[metric] = sorted(
+                    key(e) for e in entries.values() if e[column] is not None
+                )
+            loaded = self._scopes[scope] = (entries, keys)
+        return loaded
+
+    def rank(self, scope, username, metric):
+        """(1-based rank, players ranked) or None if username isn't ranked"""
+        column, _, key = METRICS[metric]
+        with self._lock:
+            entries, keys = self._load(scope)
+            entry = entries.get(username)
+            if entry is None or entry[column] is None:
+                return None
+            ordered = keys[metric]
+            return bisect_left(ordered, key(entry)) + 1, len(ordered)
+
+    def apply(self, scope, username, entry):
+        """Fold a freshly written summary row into a loaded scope"""
+        with self._lock:
+            loaded = self._scopes.get(scope)
+            if loaded is None:
+                return                    #not loaded yet: the loader will see it
+            entries, keys = loaded
+            old = entries.get(username)
+            new = entries[username] = merge(old, entry)
+            for metric, (column, _, key) in METRICS.items():
+                ordered = keys[metric]
+                if old is not None and old[column] is not None:
+                    del ordered[bisect_left(ordered, key(old))]
+                if new[column] is not None:
+                    insort(ordered, key(new))
+
+    def drop(self, *scopes):
+        """Forget scopes (all if none given); they reload on next use"""
+        with self._lock:
+            if not scopes:
+                self._scopes.clear()
+            for scope in scopes:
+                self._scopes.pop(scope, None)
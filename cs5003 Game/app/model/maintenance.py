@@ -0,0 +1,85 @@
+#/app/model/maintenance.py
+
+"""
+Offline maintenance commands for the crossword db
+
+    python -m app.model.maintenance migrate
+    python -m app.model.maintenance backfill-feed [--per-user N] [--batch N]
+    python -m app.model.maintenance reap-puzzles [--chunk N]
+    python -m app.model.maintenance rebuild-stats
+    python -m app.model.maintenance archive [--message-days N] [--activity-days N] [--batch N]
+
+Every command runs init_db() first so the schema is current.
+"""
+
+import argparse
+import time
+
+from app.model import db
+from app.model.migrations import get_schema_version
+
+
+def _migrate(args):
+    with db.db_connection() as conn:
+        return f"schema at version {get_schema_version(conn)}"
+
+
+def _backfill_feed(args):
+    users, rows = db.backfill_feed_inboxes(args.per_user, args.batch)
+    return f"seeded {rows} inbox rows for {users} users"
+
+
+def _reap_puzzles(args):
+    puzzles, rows = db.reap_deleted_puzzles(args.chunk)
+    return f"purged {puzzles} deleted puzzles ({rows} dependent rows)"
+
+
+def _rebuild_stats(args):
+    return f"rebuilt {db.rebuild_stat_rollups()} stats rollups"
+
+
+def _archive(args):
+    report = db.archive_expired(args.message_days, args.activity_days, args.batch)
+    return (f"archived {report['messages']} messages and "
+            f"{report['activities']} activities")
+
+
+COMMANDS = {
+    "migrate":       _migrate,
+    "backfill-feed": _backfill_feed,
+    "reap-puzzles":  _reap_puzzles,
+    "rebuild-stats": _rebuild_stats,
+    "archive":       _archive,
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.model.maintenance")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    sub.add_parser("migrate", help="apply pending schema migrations")
+
+    feed = sub.add_parser("backfill-feed", help="build friend feed inboxes")
+    feed.add_argument("--per-user", type=int, default=db.FEED_BACKFILL_PER_USER)
+    feed.add_argument("--batch", type=int, default=500)
+
+    reap = sub.add_parser("reap-puzzles", help="purge soft-deleted puzzles now")
+    reap.add_argument("--chunk", type=int, default=db.PUZZLE_REAP_CHUNK)
+
+    sub.add_parser("rebuild-stats", help="recompute per-user stats rollups")
+
+    arch = sub.add_parser("archive", help="move expired messages/activities to the archive db")
+    arch.add_argument("--message-days", type=int, default=db.MESSAGE_RETENTION_DAYS)
+    arch.add_argument("--activity-days", type=int, default=db.ACTIVITY_RETENTION_DAYS)
+    arch.add_argument("--batch", type=int, default=db.ARCHIVE_BATCH_SIZE)
+
+    args = parser.parse_args(argv)
+
+    db.init_db()
+    start = time.perf_counter()
+    result = COMMANDS[args.command](args)
+    print(f"{args.command}: {result} ({time.perf_counter() - start:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+#/app/model/native.py
+
+"""
+Locks for model state that green threads and native ones both touch
+
+Under eventlet/gevent (serving.monkey_patch) threading.Lock & co. are
+green: a contended acquire parks the greenlet on its hub, and a native
+thread (async_db runs sqlite work on the library's pool of real threads)
+can neither park there nor wake a greenlet parked there. So when a green
+library has patched threading:
+
+    lock()        the original OS-level lock (critical sections here are
+                  short and never yield, so a green caller waits briefly)
+    condition()   that lock, with wait() polling via time.sleep - green
+                  or native, whichever the caller is - rather than parking
+
+Unpatched, both are the plain threading versions.
+"""
+
+import sys
+import threading
+import time
+
+
+def green_library():
+    """"eventlet" / "gevent" if that library has monkey patched threading, else None"""
+    if "eventlet" in sys.modules:
+        from eventlet import patcher
+        if patcher.is_monkey_patched("thread"):
+            return "eventlet"
+    if "gevent" in sys.modules:
+        from gevent import monkey
+        if monkey.is_module_patched("threading"):
+            return "gevent"
+    return None
+
+
+#patching happens before the app is imported (main.py), so once is enough
+GREEN = green_library()
+
+
+def _original_lock():
+    if GREEN == "eventlet":
+        from eventlet import patcher
+        return patcher.original("_thread").allocate_lock()
+    from gevent import monkey
+    return monkey.get_original("_thread", "allocate_lock")()
+
+
+class PollingCondition:
+    """threading.Condition stand-in on a native lock; notify is implied"""
+
+    interval = 0.005
+
+    def __init__(self):
+        self._lock = _original_lock()
+
+    def __enter__(self):
+        self._lock.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self._lock.release()
+
+    def wait(self, timeout=None):
+        self._lock.release()
+        try:
+            time.sleep(self.interval if timeout is None else min(timeout, self.interval))
+        finally:
+            self._lock.acquire()
+        return True
+
+    def notify(self, n=1):
+        pass
+
+    def notify_all(self):
+        pass
+
+
+def lock():
+    return _original_lock() if GREEN else threading.Lock()
+
+
+def condition():
+    return PollingCondition() if GREEN else threading.Condition()
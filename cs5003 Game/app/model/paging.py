@@ -0,0 +1,58 @@
+#/app/model/paging.py
+
+"""
+Keyset (cursor) pagination helpers
+
+A cursor is the sort key of the last row a client has seen, encoded as an
+opaque url-safe token. The next page is fetched with `WHERE key < cursor`
+(or `>` for ascending lists) instead of OFFSET, so every page costs the same
+index seek however deep the client pages, and rows inserted meanwhile never
+shift or duplicate entries.
+
+Page queries fetch limit + 1 rows; split_page() trims the extra row and
+turns the last kept row's key into the `next` token.
+"""
+
+import base64
+import binascii
+import json
+
+
+class InvalidCursor(ValueError):
+    """Cursor token was malformed or doesn't match the list it was used on"""
+
+
+def encode_cursor(*key):
+    """sort key values -> opaque token"""
+    raw = json.dumps(list(key), separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token, arity):
+    """token -> tuple of `arity` key values (raises InvalidCursor)"""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, binascii.Error, UnicodeError):
+        raise InvalidCursor("Malformed cursor")
+    if not isinstance(key, list) or len(key) != arity:
+        raise InvalidCursor("Cursor does not match this list")
+    return tuple(key)
+
+
+def clamp_limit(limit, default, maximum):
+    """Page size from user input, bounded to 1..maximum"""
+    if limit is None:
+        return default
+    return max(1, min(int(limit), maximum))
+
+
+def split_page(rows, limit, key):
+    """
+    rows fetched with LIMIT limit + 1 -> (page rows, next token or None)
+    key: row -> tuple of sort key values
+    """
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(*key(rows[-1]))
@@ -0,0 +1,185 @@
+#/app/model/pool.py
+
+"""
+Bounded SQLite connection pool used by app/model/db.py
+
+Connections are opened once and handed back out on later calls instead of
+paying connect + pragma setup on every REST call. A connection checked out
+from the pool is a PooledConnection: calling close() on it returns it to the
+pool rather than closing the file handle, so existing `conn.close()` call
+sites keep working unchanged.
+"""
+
+import sqlite3
+import time
+from collections import deque
+
+from app.model import native
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection could be checked out before the timeout"""
+
+
+class PooledConnection(sqlite3.Connection):
+    """
+    sqlite3 connection that knows which pool it belongs to.
+    holds = number of open checkouts (scoped callers can share 1 conn)
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._pool = None
+        self._holds = 0
+        self.attached = set()           #schemas ATTACHed on this handle so far
+
+    def close(self):
+        """Give the connection back to its pool (real close if unpooled)"""
+        if self._pool is None:
+            super().close()
+            return
+        self._pool.release(self)
+
+    def _close_handle(self):
+        """Actually close the underlying sqlite handle"""
+        self._pool = None
+        super().close()
+
+
+class ConnectionPool:
+    """
+    Fixed-capacity pool of sqlite connections for one database file
+
+    acquire() reuses an idle connection, opens a new one while below
+    max_size, otherwise blocks up to `timeout` secs for a release.
+    """
+
+    def __init__(self, db_file, max_size=8, timeout=5.0, pragmas=()):
+        self.db_file = db_file
+        self.max_size = max_size
+        self.timeout = timeout
+        self.pragmas = tuple(pragmas)
+
+        self._idle = deque()
+        self._open = 0                  #connections currently open (idle + in use)
+        self._closed = False
+        self._cond = native.condition()     #async_db's native threads use it too
+
+        #usage counters
+        self._stats = {
+            "created": 0,
+            "reused": 0,
+            "checkouts": 0,
+            "releases": 0,
+            "waits": 0,
+            "timeouts": 0,
+            "peak_in_use": 0,
+        }
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.db_file,
+            check_same_thread=False,
+            factory=PooledConnection,
+        )
+        conn.row_factory = sqlite3.Row
+        for pragma in self.pragmas:
+            conn.execute(pragma)
+        conn._pool = self
+        return conn
+
+    def acquire(self):
+        """Check out a connection (caller must close() / release it)"""
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            if self._closed:
+                raise PoolTimeout("Connection pool is closed")
+
+            waited = False
+            while not self._idle and self._open >= self.max_size:
+                if not waited:
+                    self._stats["waits"] += 1
+                    waited = True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    raise PoolTimeout(
+                        f"No free connection after {self.timeout}s "
+                        f"(max_size={self.max_size})"
+                    )
+                self._cond.wait(remaining)
+
+            if self._idle:
+                conn = self._idle.pop()
+                self._stats["reused"] += 1
+            else:
+                #reserve slot before connecting so we never overshoot max_size
+                self._open += 1
+                try:
+                    conn = self._connect()
+                except Exception:
+                    self._open -= 1
+                    self._cond.notify()
+                    raise
+                self._stats["created"] += 1
+
+            conn._holds = 1
+            self._stats["checkouts"] += 1
+            in_use = self._open - len(self._idle)
+            if in_use > self._stats["peak_in_use"]:
+                self._stats["peak_in_use"] = in_use
+            return conn
+
+    def retain(self, conn):
+        """Add another hold on an already checked-out connection"""
+        with self._cond:
+            conn._holds += 1
+        return conn
+
+    def release(self, conn, force=False):
+        """
+        Drop one hold on conn; once nothing holds it, roll back any
+        uncommitted work and put it back on the idle list.
+        force=True drops every hold (used at end of request/task scope).
+        """
+        with self._cond:
+            if conn._holds <= 0:
+                return
+            conn._holds = 0 if force else conn._holds - 1
+            if conn._holds > 0:
+                return
+            self._stats["releases"] += 1
+
+            if conn.in_transaction:
+                try:
+                    conn.rollback()
+                except sqlite3.Error:
+                    pass
+
+            if self._closed:
+                self._open -= 1
+                conn._close_handle()
+            else:
+                self._idle.append(conn)
+            self._cond.notify()
+
+    def close(self):
+        """Close idle connections; in-use ones are closed when released"""
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                self._idle.pop()._close_handle()
+                self._open -= 1
+            self._cond.notify_all()
+
+    def stats(self):
+        """Snapshot of pool usage counters"""
+        with self._cond:
+            snapshot = dict(self._stats)
+            snapshot.update(
+                max_size=self.max_size,
+                open=self._open,
+                idle=len(self._idle),
+                in_use=self._open - len(self._idle),
+            )
+        return snapshot
@@ -0,0 +1,260 @@
+#/app/model/puzzle_store.py
+
+"""
+Compact puzzle storage format
+
+Puzzles used to be stored as four JSON strings (grid, clues_across,
+clues_down, answers) that were all decoded on every fetch. The packed format
+keeps:
+
+    width, height   grid dimensions
+    cells           1 byte per cell, row-major; 0 = block / empty cell
+    puzzle_clues    one row per clue (direction, position, number, clue)
+
+`answers` is not stored when it just repeats the grid letters - it is
+derived from `cells` on demand. Anything that doesn't fit the packed format
+(ragged grids, multi-letter cells, answers that disagree with the grid,
+non-dict clues) falls back to the old JSON column for that field only.
+
+PuzzleRecord wraps a fetched row and only decodes a field when it is
+accessed, so metadata paths (id / name / size) never touch the grid.
+
+content_etag() hashes the stored form once at write time (puzzles.etag), so
+conditional GETs can be answered without rebuilding the JSON.
+
+wire_json() is the finished GET /puzzle/<id> body; it's stored too
+(puzzles.wire) so a cold read is one SELECT and no decode/encode at all.
+"""
+
+import hashlib
+import json
+from functools import cached_property
+
+ACROSS = "A"
+DOWN = "D"
+
+
+#grid packing
+
+def pack_grid(grid):
+    """
+    list-of-rows grid -> (width, height, cells bytes)
+    None if the grid can't be packed (ragged rows / multi-char cells)
+    """
+    if not isinstance(grid, list):
+        return None
+    height = len(grid)
+    width = len(grid[0]) if height else 0
+    cells = bytearray()
+    for row in grid:
+        if not isinstance(row, list) or len(row) != width:
+            return None
+        for cell in row:
+            if cell == "":
+                cells.append(0)
+            elif isinstance(cell, str) and len(cell) == 1 and 0 < ord(cell) < 256:
+                cells.append(ord(cell))
+            else:
+                return None
+    return width, height, bytes(cells)
+
+
+def unpack_grid(width, height, cells):
+    """cells bytes -> list-of-rows grid ("" for empty cells)"""
+    text = cells.decode("latin-1")
+    return [
+        ["" if ch == "\x00" else ch for ch in text[i * width:(i + 1) * width]]
+        for i in range(height)
+    ]
+
+
+def derive_answers(width, cells):
+    """answers dict {"(i,j)": letter} for every non-empty cell"""
+    answers = {}
+    for idx, code in enumerate(cells):
+        if code:
+            i, j = divmod(idx, width)
+            answers[f"({i},{j})"] = chr(code)
+    return answers
+
+
+#clue tables
+
+def clue_rows(clues_across, clues_down):
+    """
+    (direction, position, number, clue) rows, or None if either clue
+    set isn't a plain dict of text clues (legacy puzzles stored free text;
+    numbers, lists... only round-trip through the JSON columns)
+    """
+    if not isinstance(clues_across, dict) or not isinstance(clues_down, dict):
+        return None
+    rows = []
+    for direction, clues in ((ACROSS, clues_across), (DOWN, clues_down)):
+        for position, (number, clue) in enumerate(clues.items()):
+            if clue is not None and not isinstance(clue, str):
+                return None
+            rows.append((direction, position, str(number), clue))
+    return rows
+
+
+def split_clue_rows(rows):
+    """(direction, number, clue) rows ordered by position -> (across, down)"""
+    across, down = {}, {}
+    for direction, number, clue in rows:
+        (across if direction == ACROSS else down)[number] = clue
+    return across, down
+
+
+#whole puzzle
+
+def encode_puzzle(grid, clues_across, clues_down, answers):
+    """
+    Split a puzzle into puzzles-table column values + puzzle_clues rows.
+
+    Returns (columns, clues) where columns has width, height, cells, grid,
+    clues_across, clues_down, answers (JSON text only for fields that fell
+    back to the legacy format) and clues is a list of clue rows.
+    """
+    columns = {
+        "width": None, "height": None, "cells": None,
+        "grid": None, "clues_across": None, "clues_down": None, "answers": None,
+    }
+
+    packed = pack_grid(grid)
+    if packed is None:
+        columns["grid"] = json.dumps(grid)
+        columns["answers"] = json.dumps(answers)
+    else:
+        width, height, cells = packed
+        columns.update(width=width, height=height, cells=cells)
+        #only drop answers the decoder rebuilds exactly, keys included:
+        #"r,c" keyed ones (simple creator) must come back as saved
+        if answers != derive_answers(width, cells):
+            columns["answers"] = json.dumps(answers)
+
+    rows = clue_rows(clues_across, clues_down)
+    if rows is None:
+        rows = []
+        columns["clues_across"] = json.dumps(clues_across)
+        columns["clues_down"] = json.dumps(clues_down)
+
+    return columns, rows
+
+
+def content_etag(name, columns, clue_rows):
+    """
+    Strong ETag for a stored puzzle: hash of every column (+ clue row)
+    get_puzzle's response is built from, so equal hash -> equal JSON.
+    columns as returned by encode_puzzle (or a puzzles row); clue_rows
+    are (direction, position, number, clue)
+    """
+    cells = columns["cells"]
+    content = [
+        name, columns["width"], columns["height"],
+        cells.hex() if cells is not None else None,
+        columns["grid"], columns["clues_across"],
+        columns["clues_down"], columns["answers"],
+        sorted([d, p, str(n), str(c)] for d, p, n, c in clue_rows),
+    ]
+    return hashlib.blake2b(json.dumps(content).encode(), digest_size=16).hexdigest()
+
+
+def _as_stored(clue):
+    """a clue as sqlite hands it back (TEXT affinity turns numbers into text)"""
+    if isinstance(clue, bool):
+        return str(int(clue))
+    if isinstance(clue, (int, float)):
+        return str(clue)
+    return clue
+
+
+def wire_json(puzzle):
+    """to_dict() puzzle -> response body bytes (compact, sorted like jsonify)"""
+    return json.dumps(puzzle, sort_keys=True, separators=(",", ":")).encode()
+
+
+def build_wire(puzzle_id, name, columns, clue_rows):
+    """
+    wire_json of a puzzle about to be stored, straight from encode_puzzle's
+    output - no need to read the rows back
+    """
+    row = dict(columns, id=puzzle_id, name=name)
+    stored = [(d, n, _as_stored(c)) for d, _, n, c in
+              sorted(clue_rows, key=lambda r: (r[0], r[1]))]
+    return wire_json(PuzzleRecord(row, lambda: stored).to_dict())
+
+
+class PuzzleRecord:
+    """
+    Lazily decoded puzzle row
+
+    row:         sqlite3.Row with id, name, width, height, cells, grid,
+                 clues_across, clues_down, answers
+    clue_loader: callable -> (direction, number, clue) rows; only called
+                 the first time clues are needed
+    """
+
+    def __init__(self, row, clue_loader):
+        self.id = row["id"]
+        self.name = row["name"]
+        self.width = row["width"]
+        self.height = row["height"]
+        self._row = row
+        self._clue_loader = clue_loader
+
+    @property
+    def packed(self):
+        return self._row["cells"] is not None
+
+    @cached_property
+    def grid(self):
+        if self.packed:
+            return unpack_grid(self.width, self.height, self._row["cells"])
+        return json.loads(self._row["grid"])
+
+    @cached_property
+    def answers(self):
+        if self._row["answers"] is not None:
+            return json.loads(self._row["answers"])
+        return derive_answers(self.width, self._row["cells"])
+
+    @cached_property
+    def _clues(self):
+        if self._row["clues_across"] is not None:
+            return (json.loads(self._row["clues_across"]),
+                    json.loads(self._row["clues_down"]))
+        return split_clue_rows(self._clue_loader())
+
+    @property
+    def clues_across(self):
+        return self._clues[0]
+
+    @property
+    def clues_down(self):
+        return self._clues[1]
+
+    def to_dict(self):
+        """Wire/API shape used by get_puzzle"""
+        return {
+            "id":           self.id,
+            "name":         self.name,
+            "grid":         self.grid,
+            "clues_across": self.clues_across,
+            "clues_down":   self.clues_down,
+            "answers":      self.answers
+        }
+
+
+class StoredPuzzle:
+    """
+    Puzzle cache entry: wire bytes + etag as stored; the dict get_puzzle
+    returns is decoded from the wire the first time someone asks for it
+    """
+
+    def __init__(self, wire, etag):
+        self.wire = wire
+        self.etag = etag
+
+    @cached_property
+    def puzzle(self):
+        return json.loads(self.wire)
@@ -0,0 +1,131 @@
+#/app/model/rollups.py
+
+"""
+Per-user statistics rollups (`user_stat_rollups`)
+
+upsert_rollup() folds one result into the player's row inside the
+submit_result transaction, so a stats summary is a single-row read instead
+of an aggregate over the player's whole history. rebuild_rollups()
+recomputes rows from user_stats (migration backfill, after puzzle deletes,
+and `python -m app.model.maintenance rebuild-stats`); results on deleted
+(tombstoned, not yet reaped) puzzles don't count.
+
+Streaks count consecutive UTC days with at least one completion.
+"""
+
+#streak_current after playing on excluded.streak_day (SET sees the old row)
+_NEXT_STREAK = """
+    CASE WHEN streak_day = excluded.streak_day THEN streak_current
+         WHEN streak_day = date(excluded.streak_day, '-1 day') THEN streak_current + 1
+         ELSE 1 END
+"""
+
+_UPSERT = f"""
+    INSERT INTO user_stat_rollups (
+        username, solves, scored, total_score, best_score,
+        timed, total_time, best_time,
+        last_played, streak_day, streak_current, streak_best
+    )
+    VALUES (?, 1, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP, date('now'), 1, 1)
+    ON CONFLICT (username) DO UPDATE SET
+        solves = solves + 1,
+        scored = scored + excluded.scored,
+        total_score = total_score + excluded.total_score,
+        best_score = CASE WHEN best_score >= excluded.best_score
+                          OR excluded.best_score IS NULL
+                     THEN best_score ELSE excluded.best_score END,
+        timed = timed + excluded.timed,
+        total_time = total_time + excluded.total_time,
+        best_time = CASE WHEN best_time <= excluded.best_time
+                         OR excluded.best_time IS NULL
+                    THEN best_time ELSE excluded.best_time END,
+        last_played = excluded.last_played,
+        streak_current = {_NEXT_STREAK},
+        streak_best = MAX(streak_best, {_NEXT_STREAK}),
+        streak_day = excluded.streak_day
+"""
+
+#whole rows from user_stats; {players} filters to a set of usernames
+_REBUILD = """
+    WITH stats AS (
+        SELECT * FROM user_stats
+        WHERE puzzle_id NOT IN (SELECT id FROM puzzles WHERE deleted_at IS NOT NULL)
+        {players}
+    ),
+    days AS (
+        SELECT DISTINCT username, date(timestamp) AS day FROM stats
+    ),
+    runs AS (
+        SELECT username, day,
+               julianday(day) - ROW_NUMBER() OVER (
+                   PARTITION BY username ORDER BY day) AS run
+        FROM days
+    ),
+    streaks AS (
+        SELECT username, COUNT(*) AS length, MAX(day) AS last_day
+        FROM runs
+        GROUP BY username, run
+    ),
+    streak_summary AS (
+        SELECT username,
+               MAX(length) AS best,
+               MAX(last_day) AS last_day,
+               (SELECT s2.length FROM streaks s2
+                WHERE s2.username = s.username
+                ORDER BY s2.last_day DESC LIMIT 1) AS current
+        FROM streaks s
+        GROUP BY username
+    )
+    INSERT OR REPLACE INTO user_stat_rollups (
+        username, solves, scored, total_score, best_score,
+        timed, total_time, best_time,
+        last_played, streak_day, streak_current, streak_best
+    )
+    SELECT a.username, a.solves, a.scored, a.total_score, a.best_score,
+           a.timed, a.total_time, a.best_time,
+           a.last_played, z.last_day, z.current, z.best
+    FROM (
+        SELECT username,
+               COUNT(*) AS solves,
+               COUNT(score) AS scored,
+               COALESCE(SUM(score), 0) AS total_score,
+               MAX(score) AS best_score,
+               COUNT(time_taken) AS timed,
+               COALESCE(SUM(time_taken), 0) AS total_time,
+               MIN(time_taken) AS best_time,
+               MAX(timestamp) AS last_played
+        FROM stats
+        GROUP BY username
+    ) a
+    JOIN streak_summary z ON z.username = a.username
+"""
+
+
+def upsert_rollup(conn, username, score, time_taken):
+    """Fold one result into username's rollup row (no commit)"""
+    conn.execute(_UPSERT, (
+        username,
+        int(score is not None), score or 0, score,
+        int(time_taken is not None), time_taken or 0, time_taken,
+    ))
+
+
+def rebuild_rollups(conn, usernames=None):
+    """
+    Recompute rollup rows from user_stats (no commit): every player, or just
+    the given ones (players with no results left lose their row)
+    """
+    if usernames is None:
+        conn.execute("DELETE FROM user_stat_rollups")
+        conn.execute(_REBUILD.format(players=""))
+        return
+    usernames = list(usernames)
+    for i in range(0, len(usernames), 500):
+        chunk = usernames[i:i + 500]
+        marks = ",".join("?" * len(chunk))
+        conn.execute(
+            f"DELETE FROM user_stat_rollups WHERE username IN ({marks})", chunk
+        )
+        conn.execute(
+            _REBUILD.format(players=f"AND username IN ({marks})"), chunk
+        )
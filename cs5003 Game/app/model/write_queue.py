@@ -0,0 +1,169 @@
+#/app/model/write_queue.py
+
+"""
+Group-commit write-behind queue for SQLite
+
+A single background writer thread drains queued write jobs and applies them
+in one transaction per batch, so a burst of submissions (e.g. every player
+finishing a timed game in the same second) costs one commit instead of one
+per call and writers stop fighting over SQLite's lock.
+
+Each submitted job returns a concurrent.futures.Future that resolves once its
+batch has committed; callers needing durability wait on it (or on flush()),
+fire-and-forget callers can ignore it. A failing job is rolled back to its own
+savepoint and only its future gets the exception.
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+from app.model import native
+
+_STOP = object()
+_BARRIER = "__barrier__"
+
+
+class WriteBehindQueue:
+    """
+    connect: callable returning a db connection (closed after each batch)
+    ops:     dict op name -> fn(conn, *args); must not commit themselves
+    """
+
+    def __init__(self, connect, ops, batch_size=64, max_delay=0.005):
+        self._connect = connect
+        self._ops = dict(ops)
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = native.lock()
+        self._stats = {
+            "queued": 0,
+            "committed": 0,
+            "failed": 0,
+            "batches": 0,
+            "largest_batch": 0,
+        }
+
+    def start(self):
+        """Start the writer thread (no-op if already running)"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="db-write-behind", daemon=True
+                )
+                self._thread.start()
+        return self
+
+    def submit(self, op, *args):
+        """Queue a write; returns a Future with the op's return value"""
+        if op not in self._ops:
+            raise ValueError(f"Unknown write op: {op}")
+        future = Future()
+        with self._lock:
+            self._stats["queued"] += 1
+        self._queue.put((op, args, future))
+        return future
+
+    def flush(self, timeout=None):
+        """
+        Block until every write queued before this call has committed.
+        Returns False if the timeout expired first.
+        """
+        barrier = Future()
+        self._queue.put((_BARRIER, (), barrier))
+        try:
+            barrier.result(timeout)
+        except FutureTimeout:
+            return False
+        return True
+
+    def stop(self, timeout=None):
+        """Flush outstanding writes and stop the writer thread"""
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        self._queue.put(_STOP)
+        thread.join(timeout)
+
+    def stats(self):
+        with self._lock:
+            snapshot = dict(self._stats)
+        snapshot["pending"] = self._queue.qsize()
+        return snapshot
+
+    #writer thread
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+
+            #gather whatever else arrives within max_delay (group commit)
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    if remaining > 0:
+                        nxt = self._queue.get(timeout=remaining)
+                    else:
+                        nxt = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if nxt is _STOP:
+                    stopping = True
+                    break
+                batch.append(nxt)
+
+            self._write_batch(batch)
+
+    def _write_batch(self, batch):
+        results = []
+        conn = None
+        try:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            for op, args, future in batch:
+                if op == _BARRIER:
+                    results.append((op, future, True, None))
+                    continue
+                conn.execute("SAVEPOINT write_job")
+                try:
+                    value = self._ops[op](conn, *args)
+                    conn.execute("RELEASE write_job")
+                    results.append((op, future, value, None))
+                except Exception as e:
+                    conn.execute("ROLLBACK TO write_job")
+                    conn.execute("RELEASE write_job")
+                    results.append((op, future, None, e))
+            conn.commit()
+        except Exception as e:
+            #whole batch lost (e.g. db locked past busy_timeout)
+            if conn is not None and conn.in_transaction:
+                conn.rollback()
+            results = [(op, future, None, e) for op, _, future in batch]
+        finally:
+            if conn is not None:
+                conn.close()
+
+        committed = failed = 0
+        for op, future, value, error in results:
+            if error is None:
+                future.set_result(value)
+                committed += op != _BARRIER
+            else:
+                future.set_exception(error)
+                failed += op != _BARRIER
+
+        with self._lock:
+            self._stats["batches"] += 1
+            self._stats["committed"] += committed
+            self._stats["failed"] += failed
+            if len(batch) > self._stats["largest_batch"]:
+                self._stats["largest_batch"] = len(batch)
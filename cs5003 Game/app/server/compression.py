@@ -0,0 +1,175 @@
+# app/server/compression.py
+
+"""
+Response compression for the REST API
+
+init_compression(app) adds an after_request hook that compresses a response
+when the client's Accept-Encoding allows it, its mimetype is in
+COMPRESSION_MIMETYPES and its body is at least COMPRESSION_MIN_BYTES.
+Streamed responses (e.g. POST /puzzles/bulk) are compressed chunk by chunk
+with a sync flush, so each result still reaches the client as it is made.
+
+gzip is always available; br (brotli) and zstd (zstandard) are used when
+their packages are installed. Preference order is COMPRESSION_ENCODINGS.
+
+Socket.IO traffic never gets here: its middleware sits in front of Flask.
+
+A compressed response is a different representation, so a strong ETag is
+downgraded to weak (W/"...") - If-None-Match uses weak comparison, so
+revalidation still gets its 304.
+"""
+
+import threading
+import zlib
+
+from flask import request
+
+from app.config import (
+    COMPRESSION_MIN_BYTES, COMPRESSION_LEVELS,
+    COMPRESSION_ENCODINGS, COMPRESSION_MIMETYPES
+)
+
+
+class _Gzip:
+    def __init__(self):
+        #wbits 31 -> gzip header + trailer
+        self._z = zlib.compressobj(COMPRESSION_LEVELS["gzip"], zlib.DEFLATED, 31)
+
+    def feed(self, chunk):
+        return self._z.compress(chunk) + self._z.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._z.flush()
+
+
+#encoding -> streaming compressor class; optional ones only if installed
+_CODECS = {"gzip": _Gzip}
+
+try:
+    import brotli
+
+    class _Brotli:
+        def __init__(self):
+            self._c = brotli.Compressor(quality=COMPRESSION_LEVELS["br"])
+
+        def feed(self, chunk):
+            return self._c.process(chunk) + self._c.flush()
+
+        def finish(self):
+            return self._c.finish()
+
+    _CODECS["br"] = _Brotli
+except ImportError:
+    pass
+
+try:
+    import zstandard
+
+    class _Zstd:
+        def __init__(self):
+            self._c = zstandard.ZstdCompressor(
+                level=COMPRESSION_LEVELS["zstd"]
+            ).compressobj()
+
+        def feed(self, chunk):
+            return self._c.compress(chunk) + self._c.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+        def finish(self):
+            return self._c.flush()
+
+    _CODECS["zstd"] = _Zstd
+except ImportError:
+    pass
+
+#only configured encodings that could be loaded, in preference order
+AVAILABLE = [name for name in COMPRESSION_ENCODINGS if name in _CODECS]
+
+_stats = {
+    "compressed": 0,
+    "streamed": 0,
+    "skipped_small": 0,
+    "skipped_not_accepted": 0,
+    "bytes_in": 0,          #original size of compressed bodies
+    "bytes_out": 0,         #what was actually sent for them
+    "by_encoding": {name: 0 for name in AVAILABLE},
+}
+_stats_lock = threading.Lock()
+
+
+def compression_stats():
+    """counters + bytes_saved (bytes_in - bytes_out)"""
+    with _stats_lock:
+        stats = dict(_stats, by_encoding=dict(_stats["by_encoding"]))
+    stats["bytes_saved"] = stats["bytes_in"] - stats["bytes_out"]
+    stats["available"] = list(AVAILABLE)
+    return stats
+
+
+def _count(encoding=None, bytes_in=0, bytes_out=0, **counters):
+    with _stats_lock:
+        for key, n in counters.items():
+            _stats[key] += n
+        if encoding is not None:
+            _stats["by_encoding"][encoding] += 1
+        _stats["bytes_in"] += bytes_in
+        _stats["bytes_out"] += bytes_out
+
+
+def _stream(codec, chunks):
+    """compress an iterable body as it is produced"""
+    size_in = size_out = 0
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode("utf-8")
+        size_in += len(chunk)
+        out = codec.feed(chunk)
+        size_out += len(out)
+        yield out
+    out = codec.finish()
+    _count(bytes_in=size_in, bytes_out=size_out + len(out))
+    yield out
+
+
+def _compress(response):
+    if (response.status_code < 200 or response.status_code in (204, 304)
+            or response.direct_passthrough
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESSION_MIMETYPES):
+        return response
+
+    if not response.is_streamed:
+        size = response.calculate_content_length()
+        if size is None or size < COMPRESSION_MIN_BYTES:
+            _count(skipped_small=1)
+            return response
+
+    #compressible: caches must key on Accept-Encoding whatever we pick here
+    response.vary.add("Accept-Encoding")
+    encoding = request.accept_encodings.best_match(AVAILABLE)
+    if encoding is None:
+        _count(skipped_not_accepted=1)
+        return response
+    codec = _CODECS[encoding]()
+
+    if response.is_streamed:
+        response.response = _stream(codec, response.response)
+        response.headers.pop("Content-Length", None)
+        _count(encoding, streamed=1)
+    else:
+        body = response.get_data()
+        packed = codec.feed(body) + codec.finish()
+        if len(packed) >= len(body):
+            return response
+        response.set_data(packed)
+        _count(encoding, compressed=1, bytes_in=len(body), bytes_out=len(packed))
+
+    response.headers["Content-Encoding"] = encoding
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_compression(app):
+    """compress eligible responses of app (see module docstring)"""
+    app.after_request(_compress)
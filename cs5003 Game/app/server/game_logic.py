@@ -5,13 +5,15 @@ import time
 import uuid
 
 from flask_socketio import SocketIO
-from app.model.db import create_game_session, update_game_status
+from app.model import async_db
+from app.model.db import create_game_session, add_player_to_game, update_game_status
 from app.shared.protocols import SOCKET_EVENTS 
 
 class GameManager:
     def __init__(self):
         self.socketio     = None      # set in run_server()
         self.active_games = {}
+        self.accepting    = True      # False once a shutdown starts draining
         self.lock         = threading.Lock()
 
     def bind(self, socketio: SocketIO):
@@ -19,16 +21,19 @@ class GameManager:
         self.socketio = socketio
 
     def create_new_game(self, data):
+        """new game id, or None while the server is shutting down"""
         game_id   = str(uuid.uuid4())
         puzzle_id = data["puzzle_id"]
 
         with self.lock:
+            if not self.accepting:
+                return None
             self.active_games[game_id] = {
                 "players": [], "time_left": 300, "active": True
             }
 
         #go to DB
-        create_game_session(game_id, puzzle_id)
+        async_db.submit_write(create_game_session, game_id, puzzle_id)
         #start timer task on SocketIO’s event loop
         self.socketio.start_background_task(self._game_loop, game_id)
         return game_id
@@ -37,8 +42,7 @@ class GameManager:
         with self.lock:
             self.active_games[game_id]["players"].append(username)
         #also record in DB
-        from app.model.db import add_player_to_game
-        add_player_to_game(game_id, username)
+        async_db.submit_write(add_player_to_game, game_id, username)
 
     def _game_loop(self, game_id):
         """Emits timer ticks until time runs out."""
@@ -47,7 +51,7 @@ class GameManager:
             with self.lock:
                 game = self.active_games.get(game_id)
                 if not game or not game["active"]:
-                    break
+                    return      # ended by drain(), which records it
                 game["time_left"] -= 1
                 t = game["time_left"]
 
@@ -70,4 +74,33 @@ class GameManager:
                 break
 
         # mark session completed in DB
-        update_game_status(game_id, "completed")
+        async_db.submit_write(update_game_status, game_id, "completed")
+
+    def running_games(self):
+        with self.lock:
+            return sum(1 for g in self.active_games.values() if g["active"])
+
+    def drain(self, timeout):
+        """
+        Refuse new games, give running ones up to timeout secs to finish,
+        then end the rest (game_over "server_shutdown"). Returns how many
+        were cut short
+        """
+        with self.lock:
+            self.accepting = False
+        deadline = time.monotonic() + timeout
+        while self.running_games() and time.monotonic() < deadline:
+            self.socketio.sleep(0.5)
+
+        with self.lock:
+            cut = [gid for gid, g in self.active_games.items() if g["active"]]
+            for gid in cut:
+                self.active_games[gid]["active"] = False
+        for gid in cut:
+            self.socketio.emit(
+                SOCKET_EVENTS["GAME_OVER"],
+                {"reason": "server_shutdown"},
+                room=gid
+            )
+            async_db.submit_write(update_game_status, gid, "completed")
+        return len(cut)
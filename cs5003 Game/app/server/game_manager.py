@@ -9,7 +9,8 @@ import threading
 import time
 import uuid
 from flask_socketio import SocketIO
-from app.model.db import create_game_session, update_game_status
+from app.model import async_db
+from app.model.db import create_game_session, add_player_to_game, update_game_status
 from app.shared.protocols import SOCKET_EVENTS
 
 class GameManager:
@@ -40,7 +41,7 @@ class GameManager:
             }
         
         # Record in database
-        create_game_session(game_id, puzzle_id)
+        async_db.submit_write(create_game_session, game_id, puzzle_id)
         
         # Start timer task on SocketIO's event loop
         self.socketio.start_background_task(self._game_loop, game_id)
@@ -52,8 +53,7 @@ class GameManager:
             self.active_games[game_id]["players"].append(username)
             
         # Also record in DB
-        from app.model.db import add_player_to_game
-        add_player_to_game(game_id, username)
+        async_db.submit_write(add_player_to_game, game_id, username)
     
     def _game_loop(self, game_id):
         """timer ticks until time runs out"""
@@ -84,4 +84,4 @@ class GameManager:
                 break
 
         #mark sesh completed in db
-        update_game_status(game_id, "completed")
\ No newline at end of file
+        async_db.submit_write(update_game_status, game_id, "completed")
\ No newline at end of file
@@ -0,0 +1,109 @@
+# app/server/jobs.py
+
+"""
+Background jobs for slow work that shouldn't hold a request worker
+(puzzle downloads: POST /download-puz -> GET /jobs/<id>)
+
+JobQueue runs jobs on a fixed pool of `workers` threads. At most
+`max_pending` may be queued or running; submit() raises JobQueueFull past
+that and the route answers 503 instead of piling up more work.
+
+A job function gets a progress(step) callback and returns a JSON-able
+result. Its status moves queued -> running -> done / failed:
+
+    {"id", "kind", "state", "progress", "result", "error",
+     "created", "started", "finished"}
+
+Status lives in memory (one server process, see serving.py); the newest
+`history` finished jobs stay readable, older ones are forgotten.
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from app.config import DOWNLOAD_WORKERS, DOWNLOAD_MAX_PENDING, JOB_HISTORY
+
+#app.extensions key
+EXTENSION = "jobs"
+
+
+class JobQueueFull(Exception):
+    """Raised by submit() when max_pending jobs are already waiting/running"""
+
+
+class JobQueue:
+    def __init__(self, workers=DOWNLOAD_WORKERS, max_pending=DOWNLOAD_MAX_PENDING,
+                 history=JOB_HISTORY):
+        self.max_pending = max_pending
+        self.history = history
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self._jobs = OrderedDict()       #id -> status dict, oldest first
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._stats = {"submitted": 0, "done": 0, "failed": 0, "rejected": 0}
+
+    def submit(self, kind, fn, *args, **kwargs):
+        """queue fn(*args, progress=..., **kwargs); returns the job id"""
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._stats["rejected"] += 1
+                raise JobQueueFull(f"{self.max_pending} jobs already pending")
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = {
+                "id": job_id, "kind": kind, "state": "queued", "progress": None,
+                "result": None, "error": None,
+                "created": time.time(), "started": None, "finished": None,
+            }
+            self._pending += 1
+            self._stats["submitted"] += 1
+        self._executor.submit(self._run, job_id, fn, args, kwargs)
+        return job_id
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            self._jobs[job_id].update(fields)
+
+    def _run(self, job_id, fn, args, kwargs):
+        self._update(job_id, state="running", started=time.time())
+        try:
+            result = fn(*args, progress=lambda step: self._update(job_id, progress=step),
+                        **kwargs)
+        except Exception as e:
+            outcome = {"state": "failed", "error": str(e) or type(e).__name__}
+        else:
+            outcome = {"state": "done", "result": result}
+        with self._lock:
+            self._jobs[job_id].update(outcome, finished=time.time())
+            self._pending -= 1
+            self._stats[outcome["state"]] += 1
+            self._forget_old()
+
+    def _forget_old(self):
+        finished = [job_id for job_id, job in self._jobs.items()
+                    if job["finished"] is not None]
+        for job_id in finished[:max(0, len(finished) - self.history)]:
+            del self._jobs[job_id]
+
+    def status(self, job_id):
+        """copy of a job's status, or None if unknown / forgotten"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job is not None else None
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, pending=self._pending, tracked=len(self._jobs),
+                        max_pending=self.max_pending)
+
+    def shutdown(self, wait=False):
+        """stop taking jobs; queued ones are cancelled unless wait"""
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
+
+
+def init_jobs(app, **kwargs):
+    """give app a JobQueue (app.extensions["jobs"])"""
+    jobs = app.extensions[EXTENSION] = JobQueue(**kwargs)
+    return jobs
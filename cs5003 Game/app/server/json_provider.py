@@ -0,0 +1,80 @@
+# app/server/json_provider.py
+
+"""
+Pluggable JSON encoding for the REST API
+
+init_json(app) swaps Flask's json provider (what jsonify / request.json use)
+for OrjsonProvider when orjson is installed, else keeps the stdlib one.
+JSON_PROVIDER in config forces either ("orjson" / "stdlib").
+
+Output matches the default provider: sorted keys, compact unless debug,
+datetimes as HTTP dates, dataclasses as dicts - those types are passed
+through to Flask's own `default` instead of orjson's native encoding.
+Calls that ask for stdlib-only options (indent, ...) fall back to stdlib.
+
+GET /puzzle/<id> skips encoding altogether: it sends the stored wire JSON
+(puzzles.wire, see db.get_puzzle_wire).
+"""
+
+from flask.json.provider import DefaultJSONProvider
+
+from app.config import JSON_PROVIDER
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+PROVIDERS = ("orjson", "stdlib")
+
+
+if orjson is not None:
+
+    class OrjsonProvider(DefaultJSONProvider):
+        """DefaultJSONProvider with orjson doing the encoding/decoding"""
+
+        options = (orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+                   | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS)
+
+        def _pretty(self):
+            #same rule as DefaultJSONProvider.response
+            return (self.compact is None and self._app.debug) or self.compact is False
+
+        def dumps(self, obj, **kwargs):
+            #separators only ever ask for the compact form orjson writes anyway
+            if kwargs.keys() - {"separators"}:
+                return super().dumps(obj, **kwargs)
+            return orjson.dumps(obj, default=self.default, option=self.options).decode()
+
+        def loads(self, s, **kwargs):
+            if kwargs:
+                return super().loads(s, **kwargs)
+            return orjson.loads(s)
+
+        def response(self, *args, **kwargs):
+            if self._pretty():
+                return super().response(*args, **kwargs)
+            obj = self._prepare_response_obj(args, kwargs)
+            #bytes straight into the body, no str round trip
+            body = orjson.dumps(obj, default=self.default,
+                                option=self.options | orjson.OPT_APPEND_NEWLINE)
+            return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def pick_provider(preferred=None):
+    """preferred if given (ImportError if it's orjson and that's missing), else the fastest installed"""
+    if preferred is not None:
+        if preferred not in PROVIDERS:
+            raise ValueError(f"json provider must be one of {', '.join(PROVIDERS)}")
+        if preferred == "orjson" and orjson is None:
+            raise ImportError("orjson is not installed")
+        return preferred
+    return "orjson" if orjson is not None else "stdlib"
+
+
+def init_json(app, preferred=JSON_PROVIDER):
+    """install the picked provider on app; returns its name"""
+    name = pick_provider(preferred)
+    if name == "orjson":
+        app.json = OrjsonProvider(app)
+    return name
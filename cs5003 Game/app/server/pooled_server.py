@@ -0,0 +1,39 @@
+# app/server/pooled_server.py
+
+"""
+Threaded werkzeug server with a bounded worker pool (serving.serve() in
+threading mode); werkzeug's own threaded server starts a thread per
+connection with no upper limit
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.serving import BaseWSGIServer
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """werkzeug server handing each connection to a fixed-size thread pool"""
+
+    multithread = True
+
+    def __init__(self, host, port, app, workers):
+        #before super(): a failed bind calls server_close() from there
+        self.workers = workers
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="http")
+        super().__init__(host, port, app)
+
+    def process_request(self, request, client_address):
+        self._pool.submit(self._handle, request, client_address)
+
+    def _handle(self, request, client_address):
+        #as socketserver.ThreadingMixIn.process_request_thread
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self._pool.shutdown(wait=False)
@@ -0,0 +1,201 @@
+# app/server/rate_limit.py
+
+"""
+Token-bucket rate limiting for REST routes and Socket.IO events
+
+Limits live in shared/protocols.py (REST_RATE_LIMITS by endpoint,
+SOCKET_RATE_LIMITS by event name) as (tokens per second, burst). Buckets
+are only keyed on what the client can't just make up - the signed session
+cookie /login sets, and the IP address:
+
+    REST     signed in: that user at that IP, so players behind one NAT
+             each get their own bucket. Anonymous: the IP alone
+             (RATE_LIMIT_IP_FACTOR x the listed limit, an IP may be
+             several players)
+    sockets  the user the handshake's session cookie verified (bound by
+             identify_session() in the 'authenticate' handler) plus the
+             looser IP bucket; sockets without a login only use the IP one
+
+never on a username in the payload. Any bucket empty -> the call is rejected:
+
+    REST     429 {"error": ...} with Retry-After, before the view runs
+    sockets  event dropped (handler never runs)
+
+Buckets are in memory, per app (one process serves everything anyway, see
+serving.py). rate_limit_stats() counts rejections per route/event.
+"""
+
+import functools
+import math
+import re
+import threading
+import time
+
+from flask import current_app, jsonify, request, session
+
+from app.config import RATE_LIMIT_ENABLED, RATE_LIMIT_IP_FACTOR, RATE_LIMIT_MAX_BUCKETS
+from app.shared.protocols import REST_RATE_LIMITS, SOCKET_RATE_LIMITS
+
+#app.extensions key
+EXTENSION = "rate_limiter"
+
+
+class TokenBucketLimiter:
+    """Buckets keyed by (route/event, "user"/"ip", who); thread-safe"""
+
+    def __init__(self, ip_factor=RATE_LIMIT_IP_FACTOR,
+                 max_buckets=RATE_LIMIT_MAX_BUCKETS, clock=time.monotonic):
+        self.ip_factor = ip_factor
+        self.max_buckets = max_buckets
+        self._clock = clock
+        self._buckets = {}      #key -> [tokens, last refill, rate, burst]
+        self._sessions = {}     #socket sid -> username it authenticated as
+        self._lock = threading.Lock()
+        self._stats = {"allowed": 0, "rejected": 0, "pruned": 0, "by_name": {}}
+
+    def _bucket(self, key, rate, burst, now):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_buckets:
+                self._prune(now)
+            bucket = self._buckets[key] = [float(burst), now, rate, burst]
+        else:
+            bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+        return bucket
+
+    def _prune(self, now):
+        #a bucket that has refilled completely holds no state worth keeping
+        full = [key for key, (tokens, last, rate, burst) in self._buckets.items()
+                if tokens + (now - last) * rate >= burst]
+        for key in full:
+            del self._buckets[key]
+        self._stats["pruned"] += len(full)
+
+    def hit(self, name, limit, user=None, ip=None):
+        """
+        Take a token for one call to name (limit = (rate, burst)).
+        Returns 0 if allowed, else seconds until it would be
+        """
+        rate, burst = limit
+        now = self._clock()
+        with self._lock:
+            buckets = []
+            if user is not None:
+                buckets.append(self._bucket((name, "user", user), rate, burst, now))
+            if ip is not None or user is None:
+                factor = self.ip_factor
+                buckets.append(self._bucket((name, "ip", ip), rate * factor,
+                                            burst * factor, now))
+
+            #all or nothing: a rejected call costs no bucket anything
+            short = [b for b in buckets if b[0] < 1]
+            if short:
+                self._stats["rejected"] += 1
+                by_name = self._stats["by_name"]
+                by_name[name] = by_name.get(name, 0) + 1
+                return max((1 - b[0]) / b[2] for b in short)
+            for b in buckets:
+                b[0] -= 1
+            self._stats["allowed"] += 1
+            return 0
+
+    def identify(self, sid, username):
+        with self._lock:
+            self._sessions[sid] = username
+
+    def forget(self, sid):
+        with self._lock:
+            self._sessions.pop(sid, None)
+
+    def user_of(self, sid):
+        with self._lock:
+            return self._sessions.get(sid)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, by_name=dict(self._stats["by_name"]),
+                        buckets=len(self._buckets), sessions=len(self._sessions),
+                        enabled=True)
+
+
+def _rule_name(rule):
+    """flask rule -> protocols.py form: /stats/<username> -> /stats/{username}"""
+    return re.sub(r"<(?:[^:<>]+:)?([^<>]+)>", r"{\1}", rule)
+
+
+def _check_request():
+    limiter = current_app.extensions.get(EXTENSION)
+    if limiter is None or request.url_rule is None:
+        return None
+    name = _rule_name(request.url_rule.rule)
+    limit = REST_RATE_LIMITS.get(name)
+    if limit is None:
+        return None
+
+    #any username in the body is just a claim; the session cookie isn't
+    user = session.get("username")
+    if user is not None:
+        wait = limiter.hit(name, limit, user=(user, request.remote_addr))
+    else:
+        wait = limiter.hit(name, limit, ip=request.remote_addr)
+    if not wait:
+        return None
+    response = jsonify({"error": "Too many requests, slow down"})
+    response.status_code = 429
+    response.headers["Retry-After"] = str(math.ceil(wait))
+    return response
+
+
+def limit_event(event):
+    """
+    Decorator for Socket.IO handlers: drop the event when its connection
+    is over SOCKET_RATE_LIMITS[event] (looked up per call, unlisted = no limit)
+    """
+    def wrap(handler):
+        @functools.wraps(handler)
+        def limited(*args):
+            limit = SOCKET_RATE_LIMITS.get(event)
+            limiter = current_app.extensions.get(EXTENSION)
+            if limit is not None and limiter is not None:
+                user = limiter.user_of(request.sid)
+                if limiter.hit(event, limit, user, request.remote_addr):
+                    return None
+            return handler(*args)
+        return limited
+    return wrap
+
+
+def identify_session():
+    """
+    socket handlers: this connection (request.sid) is the user its
+    handshake's session cookie logged in as, from now on.
+    Returns that username, or None for a connection without a login
+    """
+    username = session.get("username")
+    limiter = current_app.extensions.get(EXTENSION)
+    if limiter is not None and username is not None:
+        limiter.identify(request.sid, username)
+    return username
+
+
+def forget_session():
+    """socket handlers: this connection (request.sid) has gone"""
+    limiter = current_app.extensions.get(EXTENSION)
+    if limiter is not None:
+        limiter.forget(request.sid)
+
+
+def rate_limit_stats(app=None):
+    """rejection counters of app's limiter (current app by default)"""
+    limiter = (app or current_app).extensions.get(EXTENSION)
+    return limiter.stats() if limiter is not None else {"enabled": False}
+
+
+def init_rate_limits(app, enabled=RATE_LIMIT_ENABLED):
+    """give app a limiter and check REST_RATE_LIMITS before every request"""
+    if not enabled:
+        return None
+    limiter = app.extensions[EXTENSION] = TokenBucketLimiter()
+    app.before_request(_check_request)
+    return limiter
@@ -0,0 +1,136 @@
+# app/server/serving.py
+
+"""
+Production serving for `python main.py server --prod`
+
+The dev server (debug, reloader) is for laptops. --prod turns debug off and
+serves on an async worker model:
+
+    eventlet / gevent   green threads, at most `workers` connections at once
+    threading           werkzeug server on a fixed pool of `workers` threads
+
+Every open Socket.IO websocket holds a worker for as long as it's open, so
+size workers to concurrent players plus headroom for REST calls. It's one
+process only: games live in GameManager's memory.
+
+SIGTERM / SIGINT starts a drain in a background task: new games are
+refused (GET /health/ready answers 503), running ones get up to the drain
+timeout to finish, the rest are ended, then the server stops, flushes
+queued db writes and exits. A second signal exits at once.
+
+Imports stay stdlib-light here: main.py loads this before monkey patching.
+"""
+
+import importlib
+import os
+import signal
+
+#preference order when no mode is configured
+ASYNC_MODES = ("eventlet", "gevent", "threading")
+
+
+def pick_async_mode(preferred=None):
+    """
+    preferred if given (ImportError if it isn't installed), else the first
+    installed entry of ASYNC_MODES
+    """
+    if preferred is not None:
+        if preferred not in ASYNC_MODES:
+            raise ValueError(f"async mode must be one of {', '.join(ASYNC_MODES)}")
+        if preferred != "threading":
+            importlib.import_module(preferred)
+        return preferred
+    for mode in ASYNC_MODES[:-1]:
+        try:
+            importlib.import_module(mode)
+        except ImportError:
+            continue
+        return mode
+    return "threading"
+
+
+def monkey_patch(async_mode):
+    """green the stdlib for eventlet/gevent; call before importing the app"""
+    if async_mode == "eventlet":
+        import eventlet
+        eventlet.monkey_patch()
+    elif async_mode == "gevent":
+        from gevent import monkey
+        monkey.patch_all()
+
+
+def describe(async_mode, workers):
+    """concurrency model line for the startup banner"""
+    return {
+        "eventlet":  f"eventlet green threads, max {workers} connections",
+        "gevent":    f"gevent green threads, pool of {workers}",
+        "threading": f"threads, pool of {workers}",
+    }[async_mode]
+
+
+def banner(mode, async_mode, host, port, workers=None):
+    if mode == "dev":
+        model = f"{async_mode} (dev server, debug + reloader on)"
+    else:
+        model = f"{describe(async_mode, workers)}, debug off"
+    return f"Crossword server [{mode}] on http://{host}:{port} - {model}"
+
+
+def serve(app, socketio, game_manager, host, port, workers, drain_timeout,
+          on_exit=None):
+    """
+    Run the production server until SIGTERM/SIGINT, then drain games.
+    on_exit() runs last (flush db writes etc.)
+    """
+    async_mode = socketio.async_mode
+    server = None
+    if async_mode == "threading":
+        from app.server.pooled_server import PooledWSGIServer
+        #app.wsgi_app is already wrapped by the Socket.IO middleware
+        server = PooledWSGIServer(host, port, app, workers)
+
+    def exit_now(signum, frame):
+        raise SystemExit(0)         #unwinds out of the accept loop
+
+    def drain_then_stop():
+        print(f"Shutting down: waiting up to {drain_timeout:.0f}s for "
+              f"{game_manager.running_games()} running games")
+        cut = game_manager.drain(drain_timeout)
+        if cut:
+            print(f"Ended {cut} games early")
+        if server is not None:
+            server.shutdown()       #serve_forever() returns
+        elif async_mode == "gevent":
+            socketio.stop()
+        else:
+            #eventlet's server only stops by unwinding the main greenlet,
+            #which a signal handler does
+            signal.signal(signal.SIGTERM, exit_now)
+            os.kill(os.getpid(), signal.SIGTERM)
+
+    def stop(signum, frame):
+        #a second signal kills immediately
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        #the drain sleeps for up to drain_timeout: never in here, where it
+        #would block the accept loop (and the whole hub under eventlet/gevent)
+        socketio.start_background_task(drain_then_stop)
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        if server is not None:
+            try:
+                server.serve_forever()
+            finally:
+                server.server_close()
+        elif async_mode == "eventlet":
+            socketio.run(app, host=host, port=port, debug=False,
+                         use_reloader=False, log_output=False, max_size=workers)
+        else:
+            from gevent.pool import Pool
+            socketio.run(app, host=host, port=port, debug=False,
+                         use_reloader=False, log_output=False, spawn=Pool(workers))
+    finally:
+        if on_exit is not None:
+            on_exit()
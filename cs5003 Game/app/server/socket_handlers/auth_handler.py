@@ -2,7 +2,10 @@
 
 from flask_socketio import join_room
 from flask import request
-from app.shared.protocols import SOCKET_EVENTS
+from app.shared.protocols import SOCKET_EVENTS, unread_counts_message
+from app.server.rate_limit import limit_event, identify_session, forget_session
+from app.model import async_db
+from app.model.db import get_unread_breakdown
 from .base_handler import BaseSocketHandler
 
 class AuthSocketHandler(BaseSocketHandler):
@@ -17,20 +20,36 @@ class AuthSocketHandler(BaseSocketHandler):
             print("Client connected")
         
         @self.socketio.on('authenticate')
+        @limit_event('authenticate')
         def on_authenticate(data):
             """User authentication, save username to sid mapping"""
             if 'username' in data:
                 username = data['username']
                 self.user_sessions[username] = request.sid
+                identify_session()      #rate limits follow the login cookie, not payloads
                 print(f"User {username} authenticated with sid {request.sid}")
                 
                 # Join personal room
                 join_room(username)
+
+                # Current unread counts (read off the handler thread);
+                # later changes are pushed to the room by the REST routes
+                sid = request.sid
+
+                def push_counts(future):
+                    if future.exception() is None:
+                        self.socketio.emit(SOCKET_EVENTS["UNREAD_COUNTS"],
+                                           unread_counts_message(future.result()),
+                                           room=sid)
+
+                async_db.submit_read(get_unread_breakdown, username) \
+                    .add_done_callback(push_counts)
                 
         @self.socketio.on('disconnect')
         def on_disconnect():
             """Handle user disconnection, clean up mapping"""
             sid = request.sid
+            forget_session()
             # Find and remove user from mapping
             for username, session_id in list(self.user_sessions.items()):
                 if session_id == sid:
@@ -2,7 +2,9 @@
 
 from flask_socketio import emit, join_room, leave_room
 from app.shared.protocols import SOCKET_EVENTS
+from app.server.rate_limit import limit_event
 from app.server.game_logic import GameManager
+from app.model.db import get_puzzle_wire
 from .base_handler import BaseSocketHandler
 
 class GameSocketHandler(BaseSocketHandler):
@@ -13,12 +15,23 @@ class GameSocketHandler(BaseSocketHandler):
     def register_handlers(self):
         """Register game-related socket handlers"""
         @self.socketio.on(SOCKET_EVENTS["CREATE_GAME"])
+        @limit_event(SOCKET_EVENTS["CREATE_GAME"])
         def on_create_game(data):
             """Handle game creation"""
+            #deleted (or unknown) puzzle: no session on it. Usually a puzzle
+            #cache hit, the client has just fetched the puzzle
+            if get_puzzle_wire(data["puzzle_id"]) is None:
+                emit(SOCKET_EVENTS["GAME_OVER"], {"reason": "puzzle_unavailable"})
+                return
             game_id = self.game_manager.create_new_game(data)
+            if game_id is None:
+                # server is draining for shutdown
+                emit(SOCKET_EVENTS["GAME_OVER"], {"reason": "server_shutdown"})
+                return
             emit(SOCKET_EVENTS["GAME_CREATED"], {"game_id": game_id})
     
         @self.socketio.on(SOCKET_EVENTS["JOIN_GAME"])
+        @limit_event(SOCKET_EVENTS["JOIN_GAME"])
         def on_join_game(data):
             """Handle player joining a game"""
             game_id = data["game_id"]
@@ -28,11 +41,13 @@ class GameSocketHandler(BaseSocketHandler):
             emit(SOCKET_EVENTS["PLAYER_JOINED"], {"username": username}, room=game_id)
     
         @self.socketio.on(SOCKET_EVENTS["MAKE_MOVE"])
+        @limit_event(SOCKET_EVENTS["MAKE_MOVE"])
         def on_move(data):
             """Handle player moves and broadcast updates"""
             emit(SOCKET_EVENTS["GAME_UPDATE"], data, room=data["game_id"])
     
         @self.socketio.on(SOCKET_EVENTS["LEAVE_GAME"])
+        @limit_event(SOCKET_EVENTS["LEAVE_GAME"])
         def on_leave(data):
             """Handle player leaving a game"""
             leave_room(data["game_id"])
\ No newline at end of file
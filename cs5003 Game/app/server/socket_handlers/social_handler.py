@@ -3,6 +3,7 @@
 import time
 from flask_socketio import emit
 from app.shared.protocols import SOCKET_EVENTS
+from app.server.rate_limit import limit_event
 from .base_handler import BaseSocketHandler
 
 class SocialSocketHandler(BaseSocketHandler):
@@ -12,6 +13,7 @@ class SocialSocketHandler(BaseSocketHandler):
     def register_handlers(self):
         """Register social feature socket handlers"""
         @self.socketio.on(SOCKET_EVENTS["SEND_MESSAGE"])
+        @limit_event(SOCKET_EVENTS["SEND_MESSAGE"])
         def on_send_message(data):
             """Handle message sending events and notify recipient"""
             sender = data["sender"]
@@ -26,6 +28,7 @@ class SocialSocketHandler(BaseSocketHandler):
             )
             
         @self.socketio.on('friend_request')
+        @limit_event('friend_request')
         def on_friend_request(data):
             """Handle friend request events and notify recipient"""
             from_user = data["from_user"]
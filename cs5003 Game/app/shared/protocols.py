@@ -22,7 +22,8 @@ SOCKET_EVENTS = {
     "GAME_TIMER":    "game_timer",
     "GAME_OVER":     "game_over",
     "NEW_MESSAGE":   "new_message",  # receive new message
-    "FRIEND_REQUEST": "friend_request"  #receive friend request
+    "FRIEND_REQUEST": "friend_request",  #receive friend request
+    "UNREAD_COUNTS":  "unread_counts"    #{"total", "by_sender"}, pushed to the user's room
 }
 
 #REST endpoints
@@ -33,23 +34,76 @@ PUZZLE_ENDPOINT          = "/puzzle/{puzzle_id}"
 PUZZLE_ENDPOINT_FMT      = PUZZLE_ENDPOINT    # for .format(puzzle_id=…)
 ADD_PUZZLE               = "/puzzle"
 ADD_PUZZLE_ENDPOINT      = ADD_PUZZLE  #backward compatibility
+BULK_PUZZLES_ENDPOINT    = "/puzzles/bulk"   #NDJSON body, NDJSON results
+PUZZLES_BATCH_ENDPOINT   = "/puzzles/batch"  # ?ids=1,2,3 -> {"puzzles": [...], "missing": [...]}
+BOOTSTRAP_ENDPOINT       = "/bootstrap/{username}"   #menu data after login, one response
+DOWNLOAD_PUZ_ENDPOINT    = "/download-puz"   #queues a download: 202 {"job_id", "status_url"}
+JOB_STATUS_ENDPOINT      = "/jobs/{job_id}"  #state, progress, result (puzzle_id) / error
 SUBMIT_RESULT_ENDPOINT   = "/submit_result"
 STATS_ENDPOINT           = "/stats/{username}"
 STATS_ENDPOINT_FMT       = STATS_ENDPOINT     # for .formatusername
+STATS_SUMMARY_ENDPOINT   = "/stats/{username}/summary"
 GAMES_ENDPOINT           = "/games"
+RATINGS_ENDPOINT         = "/puzzle/{puzzle_id}/ratings"
+TOP_RATED_ENDPOINT       = "/puzzles/top_rated"
+SEARCH_PUZZLES_ENDPOINT  = "/puzzles/search"   # ?q=&limit=&cursor=
+LEADERBOARD_ENDPOINT     = "/leaderboard"      # ?puzzle_id=&metric=score|time|solves&limit=
+LEADERBOARD_RANK_ENDPOINT = "/leaderboard/rank/{username}"   # ?puzzle_id=&metric=
 SUBMIT_RESULT            = SUBMIT_RESULT_ENDPOINT 
 
 # Social feature API endpoints
-SEARCH_USERS_ENDPOINT    = "/users/search"
+SEARCH_USERS_ENDPOINT    = "/users/search"    # ?q=&mode=prefix|substring&limit=&cursor=
 FRIEND_REQUEST_ENDPOINT  = "/friends/request"
 ACCEPT_FRIEND_ENDPOINT   = "/friends/accept"
 REJECT_FRIEND_ENDPOINT   = "/friends/reject"  #reject friend request endpoint
 FRIENDS_LIST_ENDPOINT    = "/friends"
-MESSAGES_ENDPOINT        = "/messages/{username}"
+MESSAGES_ENDPOINT        = "/messages/{username}"   # ?since_id= / ?before_id= for incremental sync
 MESSAGES_ENDPOINT_FMT    = MESSAGES_ENDPOINT  # for .format(username=…)
 SEND_MESSAGE_ENDPOINT    = "/messages/send"
 UNREAD_COUNT_ENDPOINT    = "/messages/unread"
+MARK_READ_ENDPOINT       = "/messages/read"
 ACTIVITY_ENDPOINT        = "/activity"
+FRIEND_ACTIVITY_ENDPOINT = "/activity/friends/{username}"
+
+# Paged list endpoints take ?limit=&cursor=; the cursor for the next page
+# comes back in this response header (absent on the last page)
+NEXT_CURSOR_HEADER       = "X-Next-Cursor"
+
+# Monitoring endpoints
+DB_POOL_ENDPOINT         = "/health/db_pool"
+PUZZLE_CACHE_ENDPOINT    = "/health/puzzle_cache"
+USER_SEARCH_CACHE_ENDPOINT = "/health/user_search_cache"
+ARCHIVE_ENDPOINT         = "/health/archive"
+COMPRESSION_ENDPOINT     = "/health/compression"
+RATE_LIMIT_ENDPOINT      = "/health/rate_limits"
+JOBS_ENDPOINT            = "/health/jobs"
+READY_ENDPOINT           = "/health/ready"     # 503 while a shutdown drains games
+
+# Rate limits (app/server/rate_limit.py): (tokens per second, burst).
+# REST routes get a bucket per IP address (RATE_LIMIT_IP_FACTOR x the limit);
+# socket events one per authenticated connection user plus that IP one.
+# Over the limit: REST answers 429 + Retry-After, socket events are dropped.
+# Anything not listed here is unlimited.
+REST_RATE_LIMITS = {
+    LOGIN_ENDPOINT:          (1.0, 10),
+    REGISTER_ENDPOINT:       (0.2, 5),
+    ADD_PUZZLE:              (0.5, 10),
+    BULK_PUZZLES_ENDPOINT:   (0.1, 2),
+    SUBMIT_RESULT_ENDPOINT:  (1.0, 5),
+    SEND_MESSAGE_ENDPOINT:   (2.0, 10),
+    FRIEND_REQUEST_ENDPOINT: (0.5, 5),
+    MARK_READ_ENDPOINT:      (5.0, 20),
+    BOOTSTRAP_ENDPOINT:      (1.0, 5),
+    DOWNLOAD_PUZ_ENDPOINT:   (0.05, 3),
+}
+SOCKET_RATE_LIMITS = {
+    SOCKET_EVENTS["MAKE_MOVE"]:    (20.0, 40),
+    SOCKET_EVENTS["SEND_MESSAGE"]: (2.0, 10),
+    SOCKET_EVENTS["CREATE_GAME"]:  (0.2, 3),
+    SOCKET_EVENTS["JOIN_GAME"]:    (1.0, 5),
+    "friend_request":              (0.5, 5),
+    "authenticate":                (1.0, 5),
+}
 
 
 def create_game_message(puzzle_id, username):
@@ -64,3 +118,6 @@ def friend_request_message(from_user, to_user):
 
 def chat_message(sender, receiver, content):
     return {"sender": sender, "receiver": receiver, "content": content}
+
+def unread_counts_message(by_sender):
+    return {"total": sum(by_sender.values()), "by_sender": by_sender}
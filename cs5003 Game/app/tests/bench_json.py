@@ -0,0 +1,104 @@
+#/app/tests/bench_json.py
+
+"""
+Microbenchmark: ways of producing a GET /puzzle/<id> body
+
+    python -m app.tests.bench_json [--size 15] [--number 2000]
+
+Runs against a throwaway db (one generated size x size puzzle), not
+DB_FILE. Not collected by pytest (no test_ prefix).
+
+    decode + stdlib     old cold path: row -> PuzzleRecord -> dict -> json.dumps
+    dict + stdlib       old warm path: cached dict -> json.dumps
+    dict + orjson       cached dict -> OrjsonProvider-style orjson.dumps
+    wire from db        new cold path: SELECT wire (stored bytes)
+    wire from cache     new warm path: get_puzzle_wire() LRU hit
+"""
+
+import argparse
+import json
+import os
+import string
+import tempfile
+import timeit
+
+from app.model import db
+from app.model.puzzle_store import PuzzleRecord
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _make_puzzle(size):
+    letters = string.ascii_uppercase
+    grid = [["" if (i + j) % 7 == 0 else letters[(i * size + j) % 26]
+             for j in range(size)] for i in range(size)]
+    across = {str(n): f"Across clue number {n}, somewhat long" for n in range(1, size * 2)}
+    down = {str(n): f"Down clue number {n}" for n in range(1, size * 2)}
+    return grid, across, down
+
+
+def _stdlib(obj):
+    #what Flask's default provider does for jsonify
+    return json.dumps(obj, sort_keys=True, separators=(",", ":")).encode()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size", type=int, default=15, help="grid width/height")
+    parser.add_argument("--number", type=int, default=2000, help="calls per path")
+    args = parser.parse_args(argv)
+
+    tmp = tempfile.TemporaryDirectory()
+    db.DB_FILE = os.path.join(tmp.name, "bench.db")
+    db.init_db()
+    grid, across, down = _make_puzzle(args.size)
+    pid = db.add_puzzle("Bench", grid, across, down, {})
+
+    def decode_stdlib():
+        with db.db_connection() as conn:
+            row = conn.execute(f"""
+                SELECT {db._PUZZLE_COLUMNS} FROM puzzles WHERE id=?
+            """, (pid,)).fetchone()
+            clues = db._load_clues(conn, pid)
+        return _stdlib(PuzzleRecord(row, lambda: clues).to_dict())
+
+    def wire_from_db():
+        with db.db_connection() as conn:
+            return conn.execute("SELECT wire FROM puzzles WHERE id=?",
+                                (pid,)).fetchone()[0]
+
+    puzzle = db.get_puzzle(pid)
+    wire = db.get_puzzle_wire(pid)[0]
+    assert decode_stdlib() == _stdlib(puzzle) == wire == wire_from_db()
+
+    paths = [
+        ("decode + stdlib", decode_stdlib),
+        ("dict + stdlib", lambda: _stdlib(puzzle)),
+    ]
+    if orjson is not None:
+        option = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+        assert orjson.dumps(puzzle, option=option) == wire
+        paths.append(("dict + orjson", lambda: orjson.dumps(puzzle, option=option)))
+    paths += [
+        ("wire from db", wire_from_db),
+        ("wire from cache", lambda: db.get_puzzle_wire(pid)[0]),
+    ]
+
+    print(f"{args.size}x{args.size} puzzle, {len(wire)} byte body, "
+          f"{args.number} calls per path"
+          + ("" if orjson else " (orjson not installed)"))
+    baseline = None
+    for name, fn in paths:
+        per_call = min(timeit.repeat(fn, number=args.number, repeat=3)) / args.number
+        baseline = baseline or per_call
+        print(f"  {name:<16} {per_call * 1e6:8.1f} us   x{baseline / per_call:5.1f}")
+
+    db.get_pool().close()
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,10 @@
+#/app/tests/conftest.py
+import pytest
+
+from app.model import db
+
+
+@pytest.fixture(autouse=True)
+def _scratch_db(tmp_path):
+    """every test starts on its own db (+ archive) under tmp_path, never app/data"""
+    db.DB_FILE = str(tmp_path / "test.db")
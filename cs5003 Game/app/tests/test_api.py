@@ -18,10 +18,489 @@ https://www.youtube.com/watch?v=EgpLj86ZHFQ 'Please Learn How To Write Tests in
 """
 
 @pytest.fixture
-def client():
+def client(tmp_path):
+    from app.model import db
+    db.DB_FILE = str(tmp_path / "client.db")
     app = create_app(testing=True)
     return app.test_client()
 
 def test_login_unknown_user(client):
     rv = client.post("/login", json={"username":"ghost","password":"x"})
-    assert rv.status_code == 401
\ No newline at end of file
+    assert rv.status_code == 401
+
+def test_puzzle_list_keyset_pages(tmp_path):
+    from app.model import db
+    db.DB_FILE = str(tmp_path / "paging.db")
+    client = create_app(testing=True).test_client()
+    for i in range(5):
+        db.add_puzzle(f"P{i}", [["A"]], {}, {}, {"(0,0)": "A"})
+
+    seen, cursor = [], None
+    while True:
+        rv = client.get("/puzzles", query_string={"limit": 2, "cursor": cursor or ""})
+        assert rv.status_code == 200
+        seen += [p["name"] for p in rv.get_json()]
+        cursor = rv.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert seen == [f"P{i}" for i in range(5)]
+
+    assert client.get("/puzzles?cursor=garbage!").status_code == 400
+
+def test_bulk_puzzle_upload_reports_per_line(tmp_path):
+    import json
+    from app.model import db
+    db.DB_FILE = str(tmp_path / "bulk.db")
+    client = create_app(testing=True).test_client()
+
+    good = {"name": "P", "grid": [["A"]], "clues_across": {}, "clues_down": {},
+            "answers": {"(0,0)": "A"}}
+    lines = [json.dumps(dict(good, name=f"P{i}")) for i in range(5)]
+    lines.insert(2, "{not json")
+    lines.insert(4, json.dumps({"name": "no grid"}))
+
+    rv = client.post("/puzzles/bulk", data="\n".join(lines) + "\n",
+                     content_type="application/x-ndjson")
+    results = [json.loads(l) for l in rv.get_data(as_text=True).splitlines()]
+
+    assert [r["index"] for r in results] == list(range(7))
+    assert "error" in results[2] and results[4]["error"] == "missing field 'grid'"
+    ids = [r["id"] for r in results if "id" in r]
+    assert len(ids) == 5
+    assert [db.get_puzzle(i)["name"] for i in ids] == [f"P{i}" for i in range(5)]
+
+    #sent as application/json the stream must still reach add_puzzles unread
+    rv = client.post("/puzzles/bulk", data=lines[0] + "\n", content_type="application/json")
+    assert "id" in json.loads(rv.get_data(as_text=True))
+
+def test_user_search_prefix_and_substring(tmp_path):
+    from app.model import db
+    db.DB_FILE = str(tmp_path / "search.db")
+    client = create_app(testing=True).test_client()
+    for name in ("Bob", "bobby", "alice", "robot", "jimbo"):
+        db.create_user(name, "pw")
+
+    rv = client.get("/users/search", query_string={"q": "BO", "limit": 1})
+    assert rv.get_json()["users"] == ["Bob"]
+    rv = client.get("/users/search", query_string={
+        "q": "BO", "cursor": rv.headers["X-Next-Cursor"]})
+    assert rv.get_json()["users"] == ["bobby"]
+
+    rv = client.get("/users/search", query_string={"q": "bot", "mode": "substring"})
+    assert rv.get_json()["users"] == ["robot"]
+
+    #cached first page is dropped when someone new signs up
+    db.create_user("abbot", "pw")
+    rv = client.get("/users/search", query_string={"q": "bot", "mode": "substring"})
+    assert rv.get_json()["users"] == ["robot", "abbot"]
+
+def test_puzzle_search_ranks_and_follows_writes(tmp_path):
+    from app.model import db
+    db.DB_FILE = str(tmp_path / "fts.db")
+    client = create_app(testing=True).test_client()
+
+    grid = [["C", "A", "T"]]
+    a = db.add_puzzle("Animal Magic", grid, {"1": "Feline pet"}, {}, {}, author="Ann")
+    b = db.add_puzzle("Sunday", grid, {"1": "Magic word"}, {}, {}, author="Bob")
+    c = db.add_puzzle("Monday", grid, {"1": "Nothing here"}, {}, {})
+
+    results = client.get("/puzzles/search?q=magic").get_json()["results"]
+    assert [r["id"] for r in results] == [a, b]          #name hit ranks first
+    assert results[0]["name"] == "Animal [Magic]"
+    assert "[Magic]" in results[1]["snippet"]
+
+    assert [r["id"] for r in db.search_puzzles("fel")[0]] == [a]   #prefix of last word
+    assert db.search_puzzles("bob")[0][0]["author"] == "Bob"
+    assert db.search_puzzles('"; DROP') == ([], None)
+
+    db.delete_puzzle(a)
+    db.delete_puzzle(b, soft=True)
+    assert db.search_puzzles("magic") == ([], None)
+    assert db.search_puzzles("nothing")[0][0]["id"] == c
+
+    #bulk path: every clue of a puzzle lands in its one FTS document
+    d = db.add_puzzles([{"name": "Bulk", "grid": grid, "answers": {}, "clues_down": {"2": "Zebra crossing"},
+                         "clues_across": {"1": "Quokka smile"}}])[0]["id"]
+    assert [r["id"] for r in db.search_puzzles("quokka")[0]] == [d]
+    assert [r["id"] for r in db.search_puzzles("zebra")[0]] == [d]
+    with db.db_connection() as conn:
+        triggers = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='trigger'")}
+    assert "puzzles_fts_clue" not in triggers
+
+def test_puzzle_etags_and_conditional_get(tmp_path):
+    from app.model import db
+    db.DB_FILE = str(tmp_path / "etag.db")
+    client = create_app(testing=True).test_client()
+
+    pid = db.add_puzzle("One", [["A"]], {"1": "Letter"}, {}, {})
+    rv = client.get(f"/puzzle/{pid}")
+    etag = rv.headers["ETag"]
+    assert rv.status_code == 200 and rv.headers["Cache-Control"] == "public, max-age=300"
+    assert etag == f'"{db.get_puzzle_etag(pid)}"'
+
+    rv = client.get(f"/puzzle/{pid}", headers={"If-None-Match": etag})
+    assert rv.status_code == 304 and rv.data == b"" and rv.headers["ETag"] == etag
+    #same content stored twice -> same hash; different content -> different
+    twin = db.add_puzzle("One", [["A"]], {"1": "Letter"}, {}, {})
+    assert db.get_puzzle_etag(twin) == db.get_puzzle_etag(pid)
+    assert db.get_puzzle_etag(db.add_puzzle("Two", [["A"]], {}, {}, {})) != db.get_puzzle_etag(pid)
+
+    listing = client.get("/puzzles")
+    rv = client.get("/puzzles", headers={"If-None-Match": listing.headers["ETag"]})
+    assert rv.status_code == 304 and rv.headers["Cache-Control"] == "no-cache"
+    db.delete_puzzle(twin)
+    rv = client.get("/puzzles", headers={"If-None-Match": listing.headers["ETag"]})
+    assert rv.status_code == 200 and len(rv.get_json()) == 2
+
+    #rows inserted with raw SQL get an etag on first read
+    with db.db_connection() as conn:
+        raw = conn.execute("INSERT INTO puzzles (name, grid, clues_across, clues_down, answers)"
+                           " VALUES ('Raw', '[]', '{}', '{}', '{}')").lastrowid
+        conn.commit()
+    assert client.get(f"/puzzle/{raw}").headers["ETag"]
+    assert client.get("/puzzle/99999").status_code == 404
+
+def test_large_responses_are_gzipped(tmp_path):
+    import gzip, json
+    from app.model import db
+    from app.server.compression import compression_stats
+    db.DB_FILE = str(tmp_path / "gzip.db")
+    client = create_app(testing=True).test_client()
+
+    grid = [["A"] * 15 for _ in range(15)]
+    pid = db.add_puzzle("Big", grid, {str(i): "clue " * 5 for i in range(30)}, {}, {})
+    saved = compression_stats()["bytes_saved"]
+
+    plain = client.get(f"/puzzle/{pid}")
+    assert "Content-Encoding" not in plain.headers and "Accept-Encoding" in plain.headers["Vary"]
+    rv = client.get(f"/puzzle/{pid}", headers={"Accept-Encoding": "gzip"})
+    assert rv.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(rv.data) == plain.data
+    assert rv.headers["ETag"] == "W/" + plain.headers["ETag"]
+    assert compression_stats()["bytes_saved"] > saved
+
+    #weak tag from the gzipped copy still revalidates
+    rv = client.get(f"/puzzle/{pid}", headers={"Accept-Encoding": "gzip",
+                                                "If-None-Match": rv.headers["ETag"]})
+    assert rv.status_code == 304
+
+    #below the threshold -> untouched
+    rv = client.get("/puzzles", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in rv.headers
+
+    #streamed NDJSON is compressed on the fly
+    lines = "\n".join(json.dumps({"name": f"P{i}", "grid": [["A"]], "clues_across": {},
+                                  "clues_down": {}, "answers": {}}) for i in range(3))
+    rv = client.post("/puzzles/bulk", data=lines, content_type="application/x-ndjson",
+                     headers={"Accept-Encoding": "gzip"})
+    assert rv.headers["Content-Encoding"] == "gzip" and "Content-Length" not in rv.headers
+    assert len(gzip.decompress(rv.data).splitlines()) == 3
+
+def test_puzzle_served_from_stored_wire(tmp_path):
+    from flask.json.provider import DefaultJSONProvider
+    from app.model import db
+    from app.server.json_provider import init_json
+    db.DB_FILE = str(tmp_path / "wire.db")
+    app = create_app(testing=True)
+    client = app.test_client()
+
+    clues = {"1": "Letter", "10": 7}
+    pid = db.add_puzzle("Wire", [["A", ""]], clues, {}, {})
+    bulk = db.add_puzzles([{"name": "Bulk", "grid": [["A", ""]], "clues_across": clues,
+                            "clues_down": {}, "answers": {}}])[0]["id"]
+    with db.db_connection() as conn:
+        raw = conn.execute("INSERT INTO puzzles (name, grid, clues_across, clues_down, answers)"
+                           " VALUES ('Raw', '[[\"B\"]]', '{}', '{}', '{}')").lastrowid
+        conn.commit()
+
+    for puzzle_id in (pid, bulk, raw):
+        db.invalidate_puzzle(puzzle_id)
+        rv = client.get(f"/puzzle/{puzzle_id}")
+        #same bytes jsonify would have made from the decoded puzzle
+        with app.app_context():
+            expected = DefaultJSONProvider(app).dumps(db.get_puzzle(puzzle_id),
+                                                      separators=(",", ":"))
+        assert rv.mimetype == "application/json" and rv.data.decode() == expected
+    assert db.get_puzzle(pid)["clues_across"] == clues     #non-text clue kept as given
+    with db.db_connection() as conn:
+        assert conn.execute("SELECT wire FROM puzzles WHERE id=?", (raw,)).fetchone()[0]
+
+    #both providers encode alike
+    assert init_json(app, "stdlib") == "stdlib"
+    stdlib = client.get("/puzzles").data
+    if init_json(app) == "orjson":
+        assert client.get("/puzzles").data == stdlib
+
+def test_puzzle_batch_and_bootstrap(tmp_path):
+    from app.model import db
+    db.DB_FILE = str(tmp_path / "batch.db")
+    client = create_app(testing=True).test_client()
+
+    a = db.add_puzzle("A", [["A"]], {"1": "a"}, {}, {})
+    b = db.add_puzzle("B", [["B"]], {}, {}, {})
+    db.get_puzzle(b)        #one cached, one from the db
+    rv = client.get("/puzzles/batch", query_string={"ids": f"{b},999,{a},{b}"})
+    assert rv.status_code == 200
+    assert rv.get_json() == {"missing": [999],
+                             "puzzles": [db.get_puzzle(b), db.get_puzzle(a)]}
+    assert client.get("/puzzles/batch?ids=x").status_code == 400
+    assert client.get("/puzzles/batch").status_code == 400
+
+    for name in ("amy", "ben", "cat"):
+        db.create_user(name, "pw")
+    db.send_friend_request("ben", "amy")
+    db.accept_friend_request("ben", "amy")
+    db.send_friend_request("cat", "amy")
+    db.send_message("ben", "amy", "hi")
+    db.submit_result("amy", a, 80, 30)
+
+    before = db.pool_stats()["checkouts"]
+    boot = db.get_bootstrap("amy")
+    assert db.pool_stats()["checkouts"] == before + 1
+    assert [p["name"] for p in boot["puzzles"]] == ["A", "B"]
+    assert boot["friends"] == ["ben"] and boot["friend_requests"][0][0] == "cat"
+    assert boot["unread"] == {"count": 1, "by_sender": {"ben": 1}}
+    assert boot["stats_summary"]["solves"] == 1 and boot["active_games"] == []
+
+    rv = client.get("/bootstrap/amy")
+    assert rv.status_code == 200 and rv.get_json()["unread"]["count"] == 1
+
+def test_rate_limits_reject_rest_and_drop_events(tmp_path, monkeypatch):
+    from app.model import db
+    from app.shared import protocols
+    db.DB_FILE = str(tmp_path / "limits.db")
+    monkeypatch.setitem(protocols.REST_RATE_LIMITS, "/login", (0.001, 1))
+    monkeypatch.setitem(protocols.REST_RATE_LIMITS, "/bootstrap/{username}", (0.001, 1))
+    monkeypatch.setitem(protocols.SOCKET_RATE_LIMITS, "make_move", (0.001, 1))
+    app = create_app(testing=True)
+    client = app.test_client()
+    ip_burst = app.extensions["rate_limiter"].ip_factor
+
+    #two players behind one IP, each with their own login cookie
+    players = {}
+    for name in ("amy", "ben"):
+        db.create_user(name, "pw")
+        players[name] = app.test_client()
+        rv = players[name].post("/login", json={"username": name, "password": "pw"})
+        assert rv.status_code == 200
+
+    #anonymous REST is per IP: naming someone else in the body doesn't get a fresh bucket
+    codes = [client.post("/login", json={"username": f"user{i}", "password": "x"}).status_code
+             for i in range(ip_burst - 1)]
+    assert codes == [401] * (ip_burst - 2) + [429]
+    rv = client.post("/login", json={"username": "ben", "password": "x"})
+    assert rv.status_code == 429 and int(rv.headers["Retry-After"]) > 0
+
+    #signed in it's per user at that IP: amy running dry leaves ben (and the IP) alone
+    assert [players["amy"].get("/bootstrap/amy").status_code for _ in range(2)] == [200, 429]
+    assert players["ben"].get("/bootstrap/ben").status_code == 200
+    assert client.get("/bootstrap/amy").status_code == 200
+
+    #sockets are per logged-in user, whatever the payload claims
+    amy = app.socketio.test_client(app, flask_test_client=players["amy"])
+    amy.emit("authenticate", {"username": "amy"})       #joins room "amy"
+    for name in ("amy", "mallory", "zed"):
+        amy.emit("make_move", {"game_id": "amy", "username": name, "cell": [0, 0]})
+    assert len([m for m in amy.get_received() if m["name"] == "game_update"]) == 1
+
+    #...even one authenticating under another name
+    sneaky = app.socketio.test_client(app, flask_test_client=players["amy"])
+    sneaky.emit("authenticate", {"username": "zed"})
+    sneaky.emit("make_move", {"game_id": "zed", "username": "zed", "cell": [0, 0]})
+    assert [m for m in sneaky.get_received() if m["name"] == "game_update"] == []
+
+    ben = app.socketio.test_client(app, flask_test_client=players["ben"])
+    ben.emit("authenticate", {"username": "ben"})
+    ben.emit("make_move", {"game_id": "ben", "username": "ben", "cell": [0, 0]})
+    assert len([m for m in ben.get_received() if m["name"] == "game_update"]) == 1
+
+    stats = client.get("/health/rate_limits").get_json()
+    assert stats["by_name"] == {"/login": 2, "/bootstrap/{username}": 1, "make_move": 3}
+    assert stats["sessions"] == 3
+    amy.disconnect()
+    assert client.get("/health/rate_limits").get_json()["sessions"] == 2
+
+def test_download_runs_as_background_job(tmp_path, monkeypatch):
+    import os, time
+    from types import SimpleNamespace
+    from app.config import BASE_DIR
+    from app.model import db
+    from app.utils import puzzle_downloader
+    db.DB_FILE = str(tmp_path / "jobs.db")
+    client = create_app(testing=True).test_client()
+
+    with open(os.path.join(BASE_DIR, "app", "data", "daily.puz"), "rb") as f:
+        upstream = {"status_code": 200, "content": f.read()}
+    monkeypatch.setattr(puzzle_downloader.requests, "get",
+                        lambda url, timeout: SimpleNamespace(**upstream))
+
+    def finished(rv):
+        assert rv.status_code == 202 and rv.headers["Location"] == rv.get_json()["status_url"]
+        for _ in range(200):
+            status = client.get(rv.get_json()["status_url"]).get_json()
+            if status["state"] in ("done", "failed"):
+                return status
+            time.sleep(0.01)
+        raise AssertionError("job never finished")
+
+    status = finished(client.post("/download-puz"))
+    assert status["state"] == "done" and status["progress"] == "saving"
+    puzzle = db.get_puzzle(status["result"]["puzzle_id"])
+    assert puzzle["name"] == status["result"]["title"] and puzzle["grid"]
+
+    upstream["status_code"] = 404
+    status = finished(client.post("/download-puz"))
+    assert status["state"] == "failed" and "Failed to download" in status["error"]
+    assert client.get("/jobs/nope").status_code == 404
+    assert client.get("/health/jobs").get_json()["done"] == 1
+
+def test_drain_refuses_new_games_and_fails_readiness(tmp_path):
+    from app.model import db
+    db.DB_FILE = str(tmp_path / "drain.db")
+    app = create_app(testing=True)
+    client = app.test_client()
+    games = app.extensions["game_manager"]
+    assert client.get("/health/ready").get_json() == {"ready": True}
+
+    games.active_games["g1"] = {"players": [], "time_left": 300, "active": True}
+    games.active_games["g2"] = {"players": [], "time_left": 1, "active": True}
+
+    def sleep(seconds):
+        #g2 runs out of time while we wait, g1 never does
+        games.active_games["g2"]["active"] = False
+    games.socketio = type("FakeSocketIO", (), {
+        "sleep": staticmethod(sleep), "emit": app.socketio.emit})()
+
+    assert games.drain(0.2) == 1
+    assert not games.accepting
+    assert not games.active_games["g1"]["active"]
+    assert games.create_new_game({"puzzle_id": 1}) is None
+    rv = client.get("/health/ready")
+    assert rv.status_code == 503 and rv.get_json()["reason"] == "draining"
+
+def test_pick_async_mode():
+    from app.server import serving
+    assert serving.pick_async_mode("threading") == "threading"
+    with pytest.raises(ValueError):
+        serving.pick_async_mode("tornado")
+    #first of eventlet/gevent that imports, else threading
+    try:
+        import eventlet  # noqa: F401
+        expected = "eventlet"
+    except ImportError:
+        try:
+            import gevent  # noqa: F401
+            expected = "gevent"
+        except ImportError:
+            expected = "threading"
+    assert serving.pick_async_mode() == expected
+    if expected == "threading":
+        with pytest.raises(ImportError):
+            serving.pick_async_mode("eventlet")
+
+def test_sigterm_drains_in_background_then_stops(tmp_path):
+    import os, signal, threading
+    from flask_socketio import SocketIO
+    from app.model import db
+    from app.server import serving
+    db.DB_FILE = str(tmp_path / "serve.db")
+    app = create_app(testing=True)
+    games = app.extensions["game_manager"]
+    socketio = SocketIO(app, async_mode="threading")
+    handlers = signal.getsignal(signal.SIGINT), signal.getsignal(signal.SIGTERM)
+    exited, drained_in = [], []
+    drain = games.drain
+    def spy(timeout):
+        drained_in.append(threading.current_thread())
+        return drain(timeout)
+    games.drain = spy
+
+    threading.Timer(0.3, os.kill, (os.getpid(), signal.SIGTERM)).start()
+    try:
+        serving.serve(app, socketio, games, "127.0.0.1", 0, 2, 1,
+                      on_exit=lambda: exited.append(True))
+    finally:
+        signal.signal(signal.SIGINT, handlers[0])
+        signal.signal(signal.SIGTERM, handlers[1])
+    assert exited == [True]
+    assert not games.accepting
+    #drained off the signal handler (which runs on the main thread)
+    assert drained_in and drained_in[0] is not threading.main_thread()
+
+def test_ratings_page_through_cursor(tmp_path):
+    from app.model import db
+    db.DB_FILE = str(tmp_path / "ratings.db")
+    client = create_app(testing=True).test_client()
+    pid = db.add_puzzle("P", [["A"]], {}, {}, {})
+    raters = [f"user{i}" for i in range(5)]
+    for name in raters:
+        db.rate_puzzle(pid, name, 4)
+
+    #REST: cursor in X-Next-Cursor, like every other paged route
+    seen, cursor = [], None
+    while True:
+        rv = client.get(f"/puzzle/{pid}/ratings",
+                        query_string={"limit": 2, "cursor": cursor or ""})
+        body = rv.get_json()
+        assert set(body) == {"summary", "reviews"} and body["summary"]["count"] == 5
+        seen += [r[0] for r in body["reviews"]]
+        cursor = rv.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert sorted(seen) == raters
+
+    #db: the _page variant returns (page, next cursor) like get_puzzles_page
+    seen, cursor = [], None
+    while True:
+        ratings, cursor = db.get_puzzle_ratings_page(pid, limit=2, cursor=cursor)
+        assert ratings["count"] == 5 and "next" not in ratings
+        seen += [r[0] for r in ratings["ratings"]]
+        if not cursor:
+            break
+    assert sorted(seen) == raters
+    #...and the plain one still returns just the newest page
+    newest = db.get_puzzle_ratings(pid, limit=2)
+    assert newest["count"] == 5 and len(newest["ratings"]) == 2
+
+def test_no_games_on_deleted_puzzles(tmp_path):
+    from app.model import db
+    db.DB_FILE = str(tmp_path / "games.db")
+    app = create_app(testing=True)
+    pid = db.add_puzzle("P", [["A"]], {}, {}, {})
+    db.delete_puzzle(pid, soft=True)
+
+    sio = app.socketio.test_client(app)
+    sio.emit("create_game", {"puzzle_id": pid})
+    received = sio.get_received()
+    assert [m["name"] for m in received] == ["game_over"]
+    assert received[0]["args"][0] == {"reason": "puzzle_unavailable"}
+    assert app.extensions["game_manager"].active_games == {}
+
+def test_backed_up_write_queue_answers_503(tmp_path, monkeypatch):
+    import sqlite3
+    from app.controller import server_controller
+    from app.model import db
+    db.DB_FILE = str(tmp_path / "stalled.db")
+    client = create_app(testing=True).test_client()
+    pid = db.add_puzzle("P", [["A"]], {}, {}, {})
+    monkeypatch.setattr(server_controller, "WRITE_QUEUE_TIMEOUT", 0.1)
+
+    #another writer holds the lock: the group-commit queue can't commit
+    blocker = sqlite3.connect(db.DB_FILE)
+    blocker.execute("BEGIN IMMEDIATE")
+    try:
+        rv = client.post("/submit_result", json={"username": "amy", "puzzle_id": pid,
+                                                 "score": 5, "time": 30})
+        assert rv.status_code == 503 and rv.headers["Retry-After"]
+        assert rv.get_json()["status"] == "pending"
+        rv = client.post("/messages/send", json={"sender": "amy", "receiver": "ben",
+                                                 "content": "hi"})
+        assert rv.status_code == 503
+    finally:
+        blocker.rollback()
+        blocker.close()
+
+    #the writes were only late, not lost
+    assert db.flush_writes(10)
+    assert db.get_stat_summary("amy")["solves"] == 1
+    assert [m["content"] for m in db.get_messages("amy", "ben")] == ["hi"]
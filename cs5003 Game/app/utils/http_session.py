@@ -0,0 +1,22 @@
+#app/utils/http_session.py
+
+"""
+one requests.Session for every call the client makes to our server
+
+/login sets a signed session cookie; sending it back on REST calls and on
+the Socket.IO handshake is how the server tells players apart (rate limits
+per player, not per IP). So client code posts through `http` here rather
+than bare requests.get/post.
+"""
+
+import requests
+
+http = requests.Session()
+
+
+def cookie_header():
+    """{"Cookie": ...} for the Socket.IO handshake ({} before login)"""
+    cookies = http.cookies.get_dict()
+    if not cookies:
+        return {}
+    return {"Cookie": "; ".join(f"{k}={v}" for k, v in cookies.items())}
@@ -1,12 +1,15 @@
 import os
 import requests
 import puz
-import sqlite3
-from app.config import DB_FILE, BASE_DIR
-import json
+from app.config import BASE_DIR, DOWNLOAD_TIMEOUT
+from app.model.db import add_puzzle
 
-def download_puzzle(url=None, output_file=None):
-    """Download a puzzle from a given URL"""
+def download_puzzle(url=None, output_file=None, save_copy=True, progress=None):
+    """
+    Download a puzzle from a given URL
+    Parsed in memory; save_copy=False skips writing output_file (background
+    jobs, which may run side by side). progress(step) is told each attempt
+    """
     if url is None:
         # List of URLs to try in order
         urls = [
@@ -25,17 +28,20 @@ def download_puzzle(url=None, output_file=None):
     for current_url in urls:
         try:
             print(f"Attempting to download puzzle from {current_url}")
-            response = requests.get(current_url)
+            if progress is not None:
+                progress(f"downloading {current_url}")
+            response = requests.get(current_url, timeout=DOWNLOAD_TIMEOUT)
             
             if response.status_code != 200:
                 print(f"Failed to download from {current_url}: HTTP {response.status_code}")
                 continue
                 
-            with open(output_file, "wb") as f:
-                f.write(response.content)
+            if save_copy:
+                with open(output_file, "wb") as f:
+                    f.write(response.content)
             
             try:
-                puzzle = puz.read(output_file)
+                puzzle = puz.load(response.content)
                 print(f"Successfully downloaded and parsed puzzle from {current_url}")
                 return puzzle
             except Exception as e:
@@ -59,7 +65,7 @@ def print_puzzle_info(puzzle):
     return puzzle
 
 def save_puzzle_to_db(puzzle):
-    """Save a puzzle to the database"""
+    """Save a puzzle to the database; returns the new puzzle id"""
     try:
         title = puzzle.title
         author = puzzle.author
@@ -126,23 +132,8 @@ def save_puzzle_to_db(puzzle):
         
         print(f"Processed {len(answers)} answer cells")
         
-        # Save to database
-        conn = sqlite3.connect(DB_FILE)
-        c = conn.cursor()
-        c.execute("""
-            INSERT INTO puzzles (name, grid, clues_across, clues_down, answers)
-            VALUES (?, ?, ?, ?, ?)
-        """, (
-            title, 
-            json.dumps(grid),
-            json.dumps(clues_across),
-            json.dumps(clues_down),
-            json.dumps(answers)
-        ))
-        conn.commit()
-        conn.close()
-
-        return f"✅ Downloaded and saved: {title} by {author} ({len(puzzle.clues)} clues)"
+        # Save to database (packed grid + clue table, see model/puzzle_store.py)
+        return add_puzzle(title, grid, clues_across, clues_down, answers, author)
     except Exception as e:
         print(f"Error in save_puzzle_to_db: {e}")
         import traceback
@@ -152,4 +143,17 @@ def save_puzzle_to_db(puzzle):
 def download_and_save_puzzle(url=None, output_file=None):
     """Download a puzzle and save it to the database"""
     puzzle = download_puzzle(url, output_file)
-    return save_puzzle_to_db(puzzle)
\ No newline at end of file
+    save_puzzle_to_db(puzzle)
+    return f"✅ Downloaded and saved: {puzzle.title} by {puzzle.author} ({len(puzzle.clues)} clues)"
+
+def download_job(url=None, progress=None):
+    """
+    Background job body (POST /download-puz): download, parse and save
+    without touching the filesystem. Returns what the job status reports
+    """
+    puzzle = download_puzzle(url, save_copy=False, progress=progress)
+    if progress is not None:
+        progress("saving")
+    puzzle_id = save_puzzle_to_db(puzzle)
+    return {"puzzle_id": puzzle_id, "title": puzzle.title,
+            "author": puzzle.author, "clues": len(puzzle.clues)}
\ No newline at end of file
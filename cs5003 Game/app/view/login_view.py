@@ -33,6 +33,7 @@ from app.config import SERVER_URL
 import tkinter as tk
 from tkinter import messagebox
 import requests                       # HTTP client
+from app.utils.http_session import http   # keeps the login cookie
 
 #helper for self._clear()
 from .base_view import BaseView
@@ -99,7 +100,7 @@ class LoginView(BaseView):
         try:
             print(f"Attempting login with {username}")
             
-            resp = requests.post(
+            resp = http.post(
                 SERVER_URL + LOGIN_ENDPOINT,
                 json={"username": username, "password": password},
                 timeout=5
@@ -145,7 +146,7 @@ class LoginView(BaseView):
             return
 
         try:
-            resp = requests.post(
+            resp = http.post(
                 SERVER_URL + REGISTER_ENDPOINT,
                 json={"username": username, "password": password},
                 timeout=5
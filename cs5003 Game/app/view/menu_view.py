@@ -9,7 +9,7 @@
 #libs
 import tkinter as tk
 from tkinter import ttk, messagebox
-from app.model.db import get_friend_activities, format_activity_message
+from app.model.db import get_friend_activities, format_activity_message, get_stat_summary
 from app.utils.puzzle_downloader import download_and_save_puzzle
 
 
@@ -36,7 +36,7 @@ class MenuView:
         root,
         username,
         play_callback,          #play-puzzle
-        stats_callback,         #stats
+        stats_callback,         #stats page: (cursor=None) -> (rows, next cursor)
         add_callback,           #adv. editor
         quit_callback,          #quit app
         nyt_callback,           #daily puzzle import 
@@ -172,7 +172,7 @@ class MenuView:
             messagebox.showerror("Error", f"Could not load puzzle ID {puzzle_id}")
 
     def _enter_stats(self):
-        """get stats and show the stats screen with tabs"""
+        """get the first page of stats and show the stats screen with tabs"""
         stats = self.stats_callback()
         activities = get_friend_activities(self.username)
         self._show_stats_and_activities(stats, activities)
@@ -208,15 +208,34 @@ class MenuView:
                   command=self._build_main_menu).pack(pady=10)
 
     def _populate_stats_tab(self, parent, stats):
-        """Populate the stats tab with user statistics"""
+        """
+        Populate the stats tab: rollup summary, then the history a page at
+        a time (stats = first (rows, next cursor) page from stats_callback)
+        """
+        rows, cursor = stats
         tk.Label(parent,
                  text="Your Puzzle Statistics",
                  font=("Helvetica", 14)).pack(pady=10)
 
-        if not stats:
+        if not rows:
             tk.Label(parent,
                      text="You haven't completed any puzzles yet.").pack(pady=10)
         else:
+            # Summary from the rollup row (no scan of the history below)
+            summary = get_stat_summary(self.username)
+            if summary:
+                lines = [f"Solved: {summary['solves']}   "
+                         f"Best score: {summary['best_score']}"]
+                if summary["average_score"] is not None:
+                    lines[0] += f"   Avg score: {summary['average_score']:.1f}"
+                if summary["average_time"] is not None:
+                    lines.append(f"Best time: {summary['best_time']}s   "
+                                 f"Avg time: {summary['average_time']:.0f}s")
+                lines.append(f"Streak: {summary['current_streak']} days "
+                             f"(longest {summary['longest_streak']})")
+                tk.Label(parent, text="\n".join(lines),
+                         justify=tk.LEFT).pack(pady=5)
+
             frame = tk.Frame(parent)
             frame.pack(padx=10, pady=10, fill='both', expand=True)
 
@@ -226,12 +245,29 @@ class MenuView:
                          text=h,
                          font=("Helvetica", 10, "bold")).grid(row=0, column=col, padx=5, sticky='w')
 
-            # Table rows
-            for i, (name, score, t_taken, ts) in enumerate(stats, start=1):
-                tk.Label(frame, text=name).grid(row=i, column=0, padx=5, sticky='w')
-                tk.Label(frame, text=score).grid(row=i, column=1, padx=5)
-                tk.Label(frame, text=f"{t_taken}s").grid(row=i, column=2, padx=5)
-                tk.Label(frame, text=ts).grid(row=i, column=3, padx=5)
+            # Table rows, appended a page at a time
+            next_row = 1
+
+            def add_rows(page):
+                nonlocal next_row
+                for i, (name, score, t_taken, ts) in enumerate(page, start=next_row):
+                    tk.Label(frame, text=name).grid(row=i, column=0, padx=5, sticky='w')
+                    tk.Label(frame, text=score).grid(row=i, column=1, padx=5)
+                    tk.Label(frame, text=f"{t_taken}s").grid(row=i, column=2, padx=5)
+                    tk.Label(frame, text=ts).grid(row=i, column=3, padx=5)
+                next_row += len(page)
+
+            def load_more():
+                nonlocal cursor
+                page, cursor = self.stats_callback(cursor)
+                add_rows(page)
+                if not cursor:
+                    more_btn.pack_forget()
+
+            add_rows(rows)
+            more_btn = tk.Button(parent, text="Load more", command=load_more)
+            if cursor:
+                more_btn.pack(pady=5)
 
     def _populate_activity_tab(self, parent, activities):
         """Populate the activity tab with friend activities"""
@@ -299,14 +335,35 @@ class MenuView:
 
     # STATIC utils. (called by controller)
     @staticmethod
-    def clear_and_show_puzzles(root, puzzles, start_callback, delete_callback=None):
-        """Replace the root window with a list-of-puzzles screen."""
+    def clear_and_show_puzzles(root, puzzles, start_callback, delete_callback=None,
+                               search_callback=None):
+        """Replace the root window with a list-of-puzzles screen.
+        search_callback(query) -> [(id, name)] adds a search box."""
         for w in root.winfo_children():
             w.destroy()
 
         tk.Label(root, text="Select a Puzzle",
                  font=("Helvetica", 14)).pack(pady=10)
 
+        puzzles = list(puzzles)
+
+        # Search box (name, author or clue text)
+        if search_callback:
+            search_frame = tk.Frame(root)
+            search_frame.pack(fill=tk.X, padx=10)
+            search_entry = tk.Entry(search_frame)
+            search_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=2)
+
+            def _on_search(event=None):
+                puzzles[:] = search_callback(search_entry.get())
+                lb.delete(0, tk.END)
+                for pid, name in puzzles:
+                    lb.insert(tk.END, f"{pid}: {name}")
+
+            search_entry.bind("<Return>", _on_search)
+            tk.Button(search_frame, text="Search",
+                      command=_on_search).pack(side=tk.LEFT, padx=2)
+
         # Create a frame for the listbox and scrollbar
         list_frame = tk.Frame(root)
         list_frame.pack(pady=10, fill=tk.BOTH, expand=True)
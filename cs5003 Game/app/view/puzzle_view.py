@@ -5,7 +5,7 @@
 import tkinter as tk
 from tkinter import messagebox
 import time
-import requests
+from app.utils.http_session import http
 import pyperclip
 
 from app.config import SERVER_URL
@@ -132,7 +132,7 @@ class PuzzleView:
         
         #submit result to server
         try:
-            requests.post(
+            http.post(
                 f"{SERVER_URL}{SUBMIT_RESULT_ENDPOINT}",
                 json={
                     "username":   self.username,
@@ -2,7 +2,7 @@
 
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
-import requests
+from app.utils.http_session import http
 import datetime
 import json
 from app.config import SERVER_URL
@@ -11,9 +11,12 @@ from app.shared.protocols import (
     ACCEPT_FRIEND_ENDPOINT, REJECT_FRIEND_ENDPOINT,
     FRIENDS_LIST_ENDPOINT,
     MESSAGES_ENDPOINT, SEND_MESSAGE_ENDPOINT,
-    UNREAD_COUNT_ENDPOINT
+    UNREAD_COUNT_ENDPOINT, MARK_READ_ENDPOINT, SOCKET_EVENTS
 )
 
+MESSAGE_BATCH = 50      # messages per history fetch
+
+
 class SocialView:
     """
     Social feature main interface, includes friend management and messaging
@@ -23,6 +26,12 @@ class SocialView:
         self.username = username
         self.socketio = socketio
         self.current_chat = None
+        self.friends = []
+        self.unread = {}     # sender -> unread count, pushed by the server
+        self.oldest_id = None      # ids bounding the chat history shown
+        self.newest_id = None
+        self.has_older = False
+        self.loading_older = False
         
         # Clear existing components
         for widget in self.root.winfo_children():
@@ -64,7 +73,8 @@ class SocialView:
         right_frame.pack(side=tk.RIGHT, fill=tk.BOTH, expand=True, padx=5, pady=5)
         
         # Message area
-        self.chat_area = tk.Text(right_frame, state=tk.DISABLED, wrap=tk.WORD)
+        self.chat_area = tk.Text(right_frame, state=tk.DISABLED, wrap=tk.WORD,
+                                 yscrollcommand=self._on_chat_scroll)
         self.chat_area.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
         
         # Message input area
@@ -87,7 +97,7 @@ class SocialView:
     def _load_data(self):
         """Load friend data"""
         try:
-            response = requests.get(
+            response = http.get(
                 f"{SERVER_URL}{FRIENDS_LIST_ENDPOINT}",
                 params={"username": self.username}
             )
@@ -95,12 +105,12 @@ class SocialView:
                 data = response.json()
                 
                 # Update friends list
-                self.friends_list.delete(0, tk.END)
-                for friend in data["friends"]:
-                    self.friends_list.insert(tk.END, friend)
+                self.friends = list(data["friends"])
+                self._render_friends()
                 
-                # Check for unread messages
-                self._check_unread_messages()
+                # Unread counts arrive over the socket; REST only without one
+                if not self.socketio:
+                    self._check_unread_messages()
         except Exception as e:
             messagebox.showerror("Error", f"Failed to load friend data: {e}")
     
@@ -110,50 +120,135 @@ class SocialView:
         if not selection:
             return
             
-        friend = self.friends_list.get(selection[0])
+        friend = self.friends[selection[0]]
         self.current_chat = friend
         
         # Load chat history
         self._load_chat_history(friend)
+        self._mark_read(friend)
+    
+    def _render_friends(self):
+        """Fill the friends list, with unread counts next to names"""
+        self.friends_list.delete(0, tk.END)
+        for friend in self.friends:
+            count = self.unread.get(friend, 0)
+            self.friends_list.insert(tk.END, f"{friend} ({count})" if count else friend)
+        if self.current_chat in self.friends:
+            self.friends_list.selection_set(self.friends.index(self.current_chat))
+    
+    def _mark_read(self, friend):
+        """Tell the server we've read friend's messages (counts come back by push)"""
+        if not self.unread.get(friend):
+            return
+        try:
+            http.post(
+                f"{SERVER_URL}{MARK_READ_ENDPOINT}",
+                json={"username": self.username, "sender": friend}
+            )
+            if not self.socketio:
+                self.unread.pop(friend, None)
+                self._render_friends()
+        except Exception as e:
+            print(f"Failed to mark messages as read: {e}")
+    
+    def _fetch_messages(self, friend, **params):
+        """One batch of messages with friend, newest first ([] on failure)"""
+        response = http.get(
+            f"{SERVER_URL}{MESSAGES_ENDPOINT.format(username=friend)}",
+            params={"current_user": self.username, "limit": MESSAGE_BATCH, **params}
+        )
+        return response.json() if response.status_code == 200 else []
+    
+    def _insert_messages(self, messages, index):
+        """Render messages (oldest first) into the chat area at index"""
+        self.chat_area.config(state=tk.NORMAL)
+        # right-gravity mark: each insert lands after the previous one
+        self.chat_area.mark_set("msg_insert", index)
+        for msg in messages:
+            sender = msg["sender"]
+            content = msg["content"]
+            timestamp = msg["timestamp"]
+            
+            # Format timestamp
+            dt = datetime.datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S")
+            time_str = dt.strftime("%H:%M:%S")
+            
+            # Set different styles based on sender
+            if sender == self.username:
+                label, tag = f"Me ({time_str}): ", "me"
+            else:
+                label, tag = f"{sender} ({time_str}): ", "other"
+            
+            self.chat_area.insert("msg_insert", label, tag, f"{content}\n", ())
+        self.chat_area.config(state=tk.DISABLED)
     
     def _load_chat_history(self, friend):
-        """Load chat history with a specific friend"""
+        """Load the latest page of chat history with a specific friend"""
         # Clear chat area
         self.chat_area.config(state=tk.NORMAL)
         self.chat_area.delete(1.0, tk.END)
+        self.chat_area.config(state=tk.DISABLED)
+        self.oldest_id = self.newest_id = None
+        self.has_older = False
         
         try:
-            response = requests.get(
-                f"{SERVER_URL}{MESSAGES_ENDPOINT.format(username=friend)}",
-                params={"current_user": self.username}
-            )
-            
-            if response.status_code == 200:
-                messages = response.json()
-                
-                for msg in reversed(messages):  # Display from old to new
-                    sender = msg["sender"]
-                    content = msg["content"]
-                    timestamp = msg["timestamp"]
-                    
-                    # Format timestamp
-                    dt = datetime.datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S")
-                    time_str = dt.strftime("%H:%M:%S")
-                    
-                    # Set different styles based on sender
-                    if sender == self.username:
-                        self.chat_area.insert(tk.END, f"Me ({time_str}): ", "me")
-                    else:
-                        self.chat_area.insert(tk.END, f"{sender} ({time_str}): ", "other")
-                    
-                    self.chat_area.insert(tk.END, f"{content}\n")
+            messages = self._fetch_messages(friend)
+            if messages:
+                self.newest_id = messages[0]["id"]
+                self.oldest_id = messages[-1]["id"]
+                self.has_older = len(messages) == MESSAGE_BATCH
+            self._insert_messages(reversed(messages), tk.END)  # Display from old to new
         
         except Exception as e:
+            self.chat_area.config(state=tk.NORMAL)
             self.chat_area.insert(tk.END, f"Failed to load chat history: {e}\n")
+            self.chat_area.config(state=tk.DISABLED)
         
-        self.chat_area.config(state=tk.DISABLED)
         self.chat_area.see(tk.END)  # Scroll to bottom
     
+    def _append_new_messages(self):
+        """Append only messages newer than the last one shown"""
+        if not self.current_chat:
+            return
+        if self.newest_id is None:
+            self._load_chat_history(self.current_chat)
+            return
+        try:
+            while True:
+                messages = self._fetch_messages(self.current_chat, since_id=self.newest_id)
+                if not messages:
+                    break
+                self.newest_id = messages[0]["id"]
+                self._insert_messages(reversed(messages), tk.END)
+                if len(messages) < MESSAGE_BATCH:
+                    break
+            self.chat_area.see(tk.END)
+        except Exception as e:
+            print(f"Failed to fetch new messages: {e}")
+    
+    def _on_chat_scroll(self, first, last):
+        """Scrolled to the top of an overflowing chat -> page in older history"""
+        if float(first) > 0.0 or float(last) >= 1.0:
+            return
+        if self.has_older and not self.loading_older and self.current_chat:
+            self.loading_older = True
+            self.root.after(0, self._load_older_messages)
+    
+    def _load_older_messages(self):
+        """Prepend the page of messages before the oldest one shown"""
+        try:
+            messages = self._fetch_messages(self.current_chat, before_id=self.oldest_id)
+            self.has_older = len(messages) == MESSAGE_BATCH
+            if messages:
+                self.oldest_id = messages[-1]["id"]
+                self._insert_messages(reversed(messages), "1.0")
+                # keep the previously-top line in view
+                self.chat_area.see(f"{len(messages) + 1}.0")
+        except Exception as e:
+            print(f"Failed to load older messages: {e}")
+        finally:
+            self.loading_older = False
+    
     def _send_message(self, event=None):
         """Send message"""
         if not self.current_chat:
@@ -165,7 +260,7 @@ class SocialView:
             return
             
         try:
-            response = requests.post(
+            response = http.post(
                 f"{SERVER_URL}{SEND_MESSAGE_ENDPOINT}",
                 json={
                     "sender": self.username,
@@ -186,8 +281,8 @@ class SocialView:
                         "content": content
                     })
                 
-                # Refresh chat history
-                self._load_chat_history(self.current_chat)
+                # Append what's new (including our own message)
+                self._append_new_messages()
         
         except Exception as e:
             messagebox.showerror("Error", f"Failed to send message: {e}")
@@ -205,7 +300,7 @@ class SocialView:
             
         try:
             # Send friend request
-            response = requests.post(
+            response = http.post(
                 f"{SERVER_URL}{FRIEND_REQUEST_ENDPOINT}",
                 json={"from_user": self.username, "to_user": username}
             )
@@ -230,7 +325,7 @@ class SocialView:
     def _show_friend_requests(self):
         """Show friend requests"""
         try:
-            response = requests.get(
+            response = http.get(
                 f"{SERVER_URL}{FRIENDS_LIST_ENDPOINT}",
                 params={"username": self.username}
             )
@@ -271,7 +366,7 @@ class SocialView:
                     from_user = req_listbox.get(selection[0])
                     
                     try:
-                        response = requests.post(
+                        response = http.post(
                             f"{SERVER_URL}{ACCEPT_FRIEND_ENDPOINT}",
                             json={"from_user": from_user, "to_user": self.username}
                         )
@@ -300,7 +395,7 @@ class SocialView:
                     from_user = req_listbox.get(selection[0])
                     
                     try:
-                        response = requests.post(
+                        response = http.post(
                             f"{SERVER_URL}{REJECT_FRIEND_ENDPOINT}",
                             json={"from_user": from_user, "to_user": self.username}
                         )
@@ -325,7 +420,7 @@ class SocialView:
     def _check_unread_messages(self):
         """Check for unread messages"""
         try:
-            response = requests.get(
+            response = http.get(
                 f"{SERVER_URL}{UNREAD_COUNT_ENDPOINT}",
                 params={"username": self.username}
             )
@@ -333,6 +428,8 @@ class SocialView:
             if response.status_code == 200:
                 data = response.json()
                 count = data.get("count", 0)
+                self.unread = data.get("by_sender", {})
+                self._render_friends()
                 
                 if count > 0:
                     messagebox.showinfo("New Messages", f"You have {count} unread messages")
@@ -350,12 +447,22 @@ class SocialView:
         def on_new_message(data):
             sender = data.get("sender")
             
-            # If currently chatting with the sender, refresh chat history
+            # If currently chatting with the sender, append just the new messages
             if self.current_chat == sender:
-                self._load_chat_history(sender)
+                self.root.after(0, self._append_new_messages)
             else:
                 messagebox.showinfo("New Message", f"New message from {sender}")
         
+        # Handle unread counter updates
+        @self.socketio.on(SOCKET_EVENTS["UNREAD_COUNTS"])
+        def on_unread_counts(data):
+            self.unread = data.get("by_sender", {})
+            self.root.after(0, self._render_friends)
+            
+            # Already looking at this chat -> it's read
+            if self.current_chat in self.unread:
+                self.root.after(0, self._mark_read, self.current_chat)
+        
         # Handle friend requests
         @self.socketio.on('friend_request')
         def on_friend_request(data):
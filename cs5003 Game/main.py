@@ -3,44 +3,82 @@
 
 #import libs:
 import sys
-import tkinter as tk
-from app.controller.client_controller import launch_application
-from app.server.socket_controller import register_sockets
+import argparse
 
 """
 Entry point for the Crossword application.  
 This script will:
 
 CLA: 'server' -> start the Flask + Socket.io server  -> launch the Tkinter client GUI  
-    python main.py server   #start server on port 5001
+    python main.py server   #start server on port 5001 (dev: debug + reloader)
+    python main.py server --prod [--async-mode eventlet|gevent|threading] [--workers N]
     python main.py          #launch client app.
 
 """
-def run_server():
+def _server_args(argv):
+    from app import config
+
+    parser = argparse.ArgumentParser(prog="python main.py server")
+    parser.add_argument("--prod", dest="mode", action="store_const", const="prod",
+                        default=config.SERVER_MODE,
+                        help="debug off, async workers, graceful shutdown")
+    parser.add_argument("--dev", dest="mode", action="store_const", const="dev")
+    parser.add_argument("--async-mode", default=config.SERVER_ASYNC_MODE,
+                        choices=("eventlet", "gevent", "threading"))
+    parser.add_argument("--workers", type=int, default=config.SERVER_WORKERS)
+    parser.add_argument("--host", default=config.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=config.SERVER_PORT)
+    parser.add_argument("--drain-timeout", type=float, default=config.SERVER_DRAIN_TIMEOUT)
+    return parser.parse_args(argv)
+
+def run_server(argv=()):
     """
     config + run server
     """
+    from app.server import serving
+
+    args = _server_args(argv)
+    async_mode = None
+    if args.mode == "prod":
+        async_mode = serving.pick_async_mode(args.async_mode)
+        serving.monkey_patch(async_mode)     #before the app (and threading) is imported
+
     from flask import Flask
     from flask_socketio import SocketIO
     from app.controller.server_controller import register_routes
     from app.server.socket_controller import register_sockets
-    from app.server.game_manager import GameManager
 
     app = Flask(__name__)
     app.config.from_object('app.config')
-    socketio = SocketIO(app, cors_allowed_origins="*")
+    socketio = SocketIO(app, cors_allowed_origins="*", async_mode=async_mode)
     
     #create game manager and reg. sockets
     register_routes(app)
     socket_manager = register_sockets(socketio)  #handles game_manager creation + binding
-    
-    socketio.run(app,
-             host='0.0.0.0',
-             port=5001,
-             debug=True,)
+    app.extensions["game_manager"] = socket_manager.game_manager   #for /health/ready
+
+    print(serving.banner(args.mode, socketio.async_mode, args.host, args.port, args.workers))
+    if args.mode == "dev":
+        socketio.run(app,
+                 host=args.host,
+                 port=args.port,
+                 debug=True,)
+        return
+
+    def flush_db():
+        from app.model import async_db, db
+        app.extensions["jobs"].shutdown()    #queued downloads are dropped
+        async_db.shutdown(wait=True)
+        db.flush_writes(args.drain_timeout)
+
+    serving.serve(app, socketio, socket_manager.game_manager,
+                  args.host, args.port, args.workers, args.drain_timeout,
+                  on_exit=flush_db)
 
 def run_client():
     #config. and run the client gui
+    import tkinter as tk
+    from app.controller.client_controller import launch_application
 
     root = tk.Tk()
     root.title("Crossword Client")
@@ -50,7 +88,7 @@ def run_client():
 if __name__ == "__main__":
     #first CLI arg = 'server' start server; else = launch client GUI
     if len(sys.argv)>1 and sys.argv[1].lower()=="server":
-        run_server()
+        run_server(sys.argv[2:])
     else:
         run_client()
 #entry point for both server and client
\ No newline at end of file